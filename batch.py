@@ -0,0 +1,246 @@
+"""
+Batch dubbing from a manifest.
+
+Each manifest row names an input video and one or more target languages:
+
+    CSV   (header required; targets separated by ';' or '|'):
+        input,targets,source
+        videos/ep01.mp4,hi;ta;te,en
+        videos/ep02.mp4,hi,
+
+    JSONL:
+        {"input": "videos/ep01.mp4", "targets": ["hi", "ta"], "source": "en"}
+
+`source` is optional (default: --source, "multi" = auto-detect). Every
+(video, target) pair is one item. Items on the same input are dubbed
+together by core.pipeline.process_video_multi (extraction, separation and
+ASR once, then one branch per language); inputs run `--jobs` at a time. Finished results are recorded in the same
+result index the web app uses, so a restarted batch skips completed items
+(and the pipeline checkpoints let a half-finished item resume mid-way).
+
+A JSON summary with per-item status, timings and errors is rewritten after
+every item, so progress is visible while the batch runs.
+
+Usage:
+    python batch.py manifest.csv --jobs 2 --report output/batch_report.json
+"""
+import os
+import csv
+import sys
+import json
+import time
+import argparse
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List
+
+from core.pipeline import process_video_multi
+from core.translator import SUPPORTED_LANGUAGES
+from core.checkpoint import file_sha256
+from core.ingest import ResultIndex
+from core.telemetry import trace_job
+
+
+def _split_targets(value) -> List[str]:
+    if isinstance(value, list):
+        return [str(v).strip() for v in value if str(v).strip()]
+    return [v.strip() for v in str(value or "").replace("|", ";").replace(",", ";").split(";") if v.strip()]
+
+
+def load_manifest(path: str, default_source: str = "multi") -> List[Dict[str, str]]:
+    """Reads a CSV or JSONL manifest into one item per (input, target language)."""
+    rows: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        if path.lower().endswith((".jsonl", ".ndjson")):
+            for line_no, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    rows.append(json.loads(line))
+                except ValueError as e:
+                    raise ValueError(f"{path}:{line_no}: invalid JSON: {e}")
+        else:
+            rows.extend(csv.DictReader(f))
+
+    items = []
+    base_dir = os.path.dirname(os.path.abspath(path))
+    for row_no, row in enumerate(rows, 1):
+        input_path = (row.get("input") or "").strip()
+        if not input_path:
+            raise ValueError(f"{path}: row {row_no} has no input")
+        if not os.path.isabs(input_path) and not os.path.exists(input_path):
+            # Relative paths may be relative to the manifest itself
+            input_path = os.path.join(base_dir, input_path)
+        targets = _split_targets(row.get("targets") or row.get("target"))
+        if not targets:
+            raise ValueError(f"{path}: row {row_no} has no target languages")
+        for target in targets:
+            if target not in SUPPORTED_LANGUAGES:
+                raise ValueError(f"{path}: row {row_no}: unsupported target language '{target}'")
+            items.append({
+                "input": input_path,
+                "source_lang": (row.get("source") or "").strip() or default_source,
+                "target_lang": target,
+            })
+    return items
+
+
+class BatchReport:
+    """Per-item results, rewritten atomically to `path` after every update."""
+
+    def __init__(self, path: str, manifest: str, items: List[Dict[str, str]]):
+        self.path = path
+        self.started_at = time.time()
+        self.data: Dict[str, Any] = {
+            "manifest": os.path.abspath(manifest),
+            "started_at": self.started_at,
+            "finished_at": None,
+            "wall_sec": None,
+            "summary": {},
+            "items": [dict(item, status="pending") for item in items],
+        }
+        self._lock = threading.Lock()
+        self.write()
+
+    def update(self, index: int, **fields):
+        with self._lock:
+            self.data["items"][index].update(fields)
+        self.write()
+
+    def finish(self):
+        with self._lock:
+            self.data["finished_at"] = time.time()
+            self.data["wall_sec"] = round(self.data["finished_at"] - self.started_at, 3)
+        self.write()
+
+    def write(self):
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for item in self.data["items"]:
+                counts[item["status"]] = counts.get(item["status"], 0) + 1
+            self.data["summary"] = counts
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+
+
+def _group_items(items: List[Dict[str, str]]) -> List[List[int]]:
+    """Indices of the items that share an input (and source language), in manifest order."""
+    groups: Dict[Any, List[int]] = {}
+    for index, item in enumerate(items):
+        groups.setdefault((os.path.abspath(item["input"]), item["source_lang"]), []).append(index)
+    return list(groups.values())
+
+
+def run_group(indices: List[int], items: List[Dict[str, str]], report: BatchReport,
+              results_index: ResultIndex, force: bool):
+    """
+    Dubs one input into every target language its items ask for. Extraction,
+    separation and ASR run once; the languages branch off via process_video_multi.
+    """
+    first = items[indices[0]]
+    name = os.path.basename(first["input"])
+    labels = {i: f"[{i + 1}] {name} → {items[i]['target_lang']}" for i in indices}
+    t0 = time.time()
+    for i in indices:
+        report.update(i, status="running", started_at=t0)
+    try:
+        if not os.path.exists(first["input"]):
+            raise FileNotFoundError(f"Input not found: {first['input']}")
+        input_hash = file_sha256(first["input"])
+    except Exception as e:
+        traceback.print_exc()
+        for i in indices:
+            report.update(i, status="failed", error=str(e), seconds=round(time.time() - t0, 3))
+            print(f"❌ {labels[i]}: {e}")
+        return
+
+    pending = []
+    for i in indices:
+        item = items[i]
+        done = None if force else results_index.get(input_hash, item["source_lang"], item["target_lang"])
+        if done:
+            print(f"⏩ {labels[i]}: already done ({done['output_video_path']})")
+            report.update(i, status="skipped", input_hash=input_hash,
+                          output=done["output_video_path"], seconds=round(time.time() - t0, 3))
+        else:
+            pending.append(i)
+    if not pending:
+        return
+
+    targets = [items[i]["target_lang"] for i in pending]
+    print(f"▶️  [{', '.join(str(i + 1) for i in pending)}] {name} → {', '.join(targets)}")
+    try:
+        with trace_job(f"batch-{input_hash[:12]}-{'-'.join(targets)}"):
+            result = process_video_multi(first["input"], first["source_lang"], targets, input_hash=input_hash)
+    except Exception as e:
+        traceback.print_exc()
+        for i in pending:
+            report.update(i, status="failed", error=str(e), seconds=round(time.time() - t0, 3))
+            print(f"❌ {labels[i]}: {e}")
+        return
+
+    for i in pending:
+        item = items[i]
+        language = result["languages"][item["target_lang"]]
+        output = language.get("output_video_path")
+        seconds = round(time.time() - t0, 3)
+        if language.get("error") or not output or not os.path.exists(output):
+            error = language.get("error") or "Pipeline finished without producing an output video"
+            report.update(i, status="failed", error=error, seconds=seconds)
+            print(f"❌ {labels[i]}: {error}")
+            continue
+        timings = dict(result["timings"], **language["timings"])
+        results_index.put(input_hash, item["source_lang"], item["target_lang"], {
+            "timings": timings,
+            "transcription": result["transcription"],
+            "output_video": f"/output/{os.path.basename(output)}",
+            "output_video_path": output,
+            "source_lang": item["source_lang"],
+            "target_lang": item["target_lang"],
+        })
+        report.update(i, status="done", input_hash=input_hash, output=output, timings=timings,
+                      resumed_stages=result["resumed_stages"] + language["resumed_stages"], seconds=seconds)
+        print(f"✅ {labels[i]} in {seconds:.1f}s")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="CSV or JSONL manifest")
+    parser.add_argument("--jobs", type=int, default=int(os.getenv("DUB_WORKERS", "2")),
+                        help="items processed in parallel (default: DUB_WORKERS or 2)")
+    parser.add_argument("--source", default="multi", help="default source language (default: multi)")
+    parser.add_argument("--report", default="output/batch_report.json", help="summary report path")
+    parser.add_argument("--force", action="store_true", help="re-run items that already have a result")
+    args = parser.parse_args(argv)
+
+    items = load_manifest(args.manifest, default_source=args.source)
+    print(f"📋 {len(items)} items ({len(_group_items(items))} inputs) from {args.manifest}, {args.jobs} in parallel")
+
+    report = BatchReport(args.report, args.manifest, items)
+    results_index = ResultIndex()
+    # Items on the same input run together: one extraction / separation / ASR
+    # pass, then one branch per language (never two jobs racing on one input)
+    groups = _group_items(items)
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [
+            executor.submit(run_group, indices, items, report, results_index, args.force)
+            for indices in groups
+        ]
+        for future in as_completed(futures):
+            future.result()
+    report.finish()
+
+    summary = report.data["summary"]
+    print(f"📊 Batch finished in {report.data['wall_sec']:.1f}s: "
+          + ", ".join(f"{count} {status}" for status, count in sorted(summary.items())))
+    print(f"   Report: {args.report}")
+    return 1 if summary.get("failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
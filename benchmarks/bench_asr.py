@@ -0,0 +1,51 @@
+"""
+Offline check of the concurrent chunked ASR path using the fakes in tests/fakes.py.
+
+Usage (from the project root, requires ffmpeg on PATH):
+    python -m benchmarks.bench_asr --minutes 30 --latency 2 --in-flight 1 4 8
+"""
+import os
+import time
+import wave
+import argparse
+import tempfile
+
+from tests.fakes import FakeSpeechClient, FakeStorageClient
+from core.transcribe import transcribe_audio
+
+
+def write_silence(path: str, seconds: float, sample_rate: int = 16000):
+    """Writes a mono 16-bit WAV of silence, one second at a time."""
+    second = b"\x00\x00" * sample_rate
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        for _ in range(int(seconds)):
+            wf.writeframes(second)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=30.0)
+    parser.add_argument("--latency", type=float, default=2.0, help="Fake BatchRecognize latency per chunk (s)")
+    parser.add_argument("--in-flight", type=int, nargs="+", default=[1, 4, 8])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_asr_") as workdir:
+        audio_path = os.path.join(workdir, "input.wav")
+        write_silence(audio_path, args.minutes * 60)
+
+        print(f"{'in flight':>9} | {'wall':>8} | {'segments':>8} | {'max concurrent ops':>18} | {'polls':>5}")
+        for limit in args.in_flight:
+            storage = FakeStorageClient()
+            speech = FakeSpeechClient(storage, latency=args.latency)
+            t0 = time.perf_counter()
+            segments = transcribe_audio(audio_path, client=speech, storage_client=storage, max_in_flight=limit,
+                                        project_id="bench-project")
+            wall = time.perf_counter() - t0
+            print(f"{limit:>9} | {wall:7.2f}s | {len(segments):>8} | {speech.max_in_flight:>18} | {speech.polls:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Benchmark: single-pass ASR chunking vs. the legacy ffmpeg-per-chunk splitter.
+
+The legacy splitter put `-ss` after `-i`, so every chunk decoded the input
+from the start (O(n^2) in file length). Usage (requires ffmpeg on PATH):
+    python -m benchmarks.bench_chunking --minutes 30 120
+"""
+import os
+import time
+import argparse
+import tempfile
+import subprocess
+from typing import List, Dict
+
+from core.chunking import split_audio_into_chunks
+
+
+def make_long_mp3(path: str, seconds: float):
+    """Generates a synthetic stereo MP3 (tone + noise) of the given length."""
+    subprocess.run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}:sample_rate=44100",
+        "-f", "lavfi", "-i", f"anoisesrc=duration={seconds}:sample_rate=44100:amplitude=0.05",
+        "-filter_complex", "[0:a][1:a]amix=inputs=2,aformat=channel_layouts=stereo",
+        "-b:a", "128k", path
+    ], check=True)
+
+
+def legacy_split(audio_path: str, total_duration: float, chunk_duration: float, temp_dir: str) -> List[Dict]:
+    """The previous implementation: one ffmpeg process per chunk, output seeking."""
+    chunks = []
+    start_time = 0.0
+    index = 0
+    while start_time < total_duration:
+        chunk_path = os.path.join(temp_dir, f"legacy_{index}.wav")
+        subprocess.run([
+            "ffmpeg", "-y", "-i", audio_path,
+            "-ss", str(start_time), "-t", str(chunk_duration),
+            "-ar", "16000", "-ac", "1", "-acodec", "pcm_s16le", chunk_path
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        chunks.append({"path": chunk_path, "start_offset": start_time})
+        start_time += chunk_duration
+        index += 1
+    return chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[30.0, 120.0])
+    parser.add_argument("--chunk", type=float, default=240.0)
+    args = parser.parse_args()
+
+    print(f"{'minutes':>7} | {'chunks':>6} | {'single pass':>11} | {'legacy':>9}")
+    for minutes in args.minutes:
+        with tempfile.TemporaryDirectory(prefix="bench_chunk_") as workdir:
+            source = os.path.join(workdir, "long.mp3")
+            make_long_mp3(source, minutes * 60)
+
+            t0 = time.perf_counter()
+            chunks = split_audio_into_chunks(source, chunk_duration=args.chunk, temp_dir=os.path.join(workdir, "new"))
+            new_time = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            legacy_split(source, minutes * 60, args.chunk, workdir)
+            old_time = time.perf_counter() - t0
+
+        print(f"{minutes:>7.0f} | {len(chunks):>6} | {new_time:10.2f}s | {old_time:8.2f}s")
+
+
+if __name__ == "__main__":
+    main()
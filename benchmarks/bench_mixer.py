@@ -0,0 +1,77 @@
+"""
+Benchmark: in-process NumPy mixer vs. the legacy N-input ffmpeg filter graph.
+
+Usage (from the project root, requires ffmpeg on PATH):
+    python -m benchmarks.bench_mixer --counts 10 100 1000
+"""
+import os
+import time
+import wave
+import argparse
+import tempfile
+from typing import List, Dict, Any
+
+import numpy as np
+
+from core.mixer import SAMPLE_RATE, mix_segments, mix_with_filter_graph
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int = SAMPLE_RATE):
+    """Writes a float32 (frames, channels) array as 16-bit PCM WAV."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(samples.shape[1])
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm.tobytes())
+
+
+def make_fixture(workdir: str, count: int, spacing: float = 2.0, clip_len: float = 1.5) -> Dict[str, Any]:
+    """Creates a background track and `count` tone clips spaced `spacing` seconds apart."""
+    rng = np.random.default_rng(count)
+    total = count * spacing + 2.0
+
+    background = os.path.join(workdir, "background.wav")
+    noise = rng.standard_normal((int(total * SAMPLE_RATE), 2)).astype(np.float32) * 0.05
+    write_wav(background, noise)
+
+    t = np.arange(int(clip_len * SAMPLE_RATE), dtype=np.float32) / SAMPLE_RATE
+    clips: List[Dict[str, Any]] = []
+    for i in range(count):
+        tone = 0.2 * np.sin(2 * np.pi * (220 + (i % 12) * 20) * t)
+        path = os.path.join(workdir, f"clip_{i}.wav")
+        write_wav(path, np.stack([tone, tone], axis=1))
+        clips.append({"path": path, "start": i * spacing})
+
+    return {"background": background, "clips": clips}
+
+
+def time_call(fn, *args) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        fn(*args)
+        return {"seconds": time.perf_counter() - t0, "ok": os.path.exists(args[-1])}
+    except Exception as e:
+        return {"seconds": time.perf_counter() - t0, "ok": False, "error": str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    print(f"{'segments':>8} | {'numpy mixer':>12} | {'filter graph':>12}")
+    for count in args.counts:
+        with tempfile.TemporaryDirectory(prefix="bench_mixer_") as workdir:
+            fixture = make_fixture(workdir, count)
+            new = time_call(mix_segments, fixture["background"], fixture["clips"], os.path.join(workdir, "numpy.aac"))
+            old = time_call(mix_with_filter_graph, fixture["background"], fixture["clips"], os.path.join(workdir, "graph.aac"))
+
+        def fmt(r):
+            return f"{r['seconds']:10.2f}s" if r["ok"] else "    failed"
+
+        print(f"{count:>8} | {fmt(new):>12} | {fmt(old):>12}")
+
+
+if __name__ == "__main__":
+    main()
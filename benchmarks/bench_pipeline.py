@@ -0,0 +1,272 @@
+"""
+Benchmark: end-to-end process_video against the offline backends in tests/fakes.py.
+
+Speech/GCS, Gemini, ElevenLabs and Demucs are replaced by deterministic
+fakes with configurable latency and error rates, so what is measured is the
+pipeline's own overhead (decoding, chunking, mixing, muxing, threading).
+For each length a synthetic video is generated (a still frame plus a tone);
+the fake ASR yields about 16 segments per minute, so 1 min to 2 h covers
+roughly 15 to 2000 segments.
+
+Every case runs in a fresh process so peak RSS is per case. Reported per
+case and per pipeline stage: wall time, CPU time (this process and its
+ffmpeg children), peak RSS, and subprocesses spawned by program. Results
+are written as JSON (--output) so runs can be diffed.
+
+Usage (from the project root, requires ffmpeg on PATH and the project
+requirements installed):
+    python -m benchmarks.bench_pipeline --minutes 1 10 30 120
+    python -m benchmarks.bench_pipeline --minutes 5 --streaming --error-rate 0.05
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import subprocess
+import multiprocessing
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+
+
+def make_video(path: str, seconds: float):
+    """Writes a small H.264/AAC test video: a black frame and a 220 Hz tone."""
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"color=c=black:s=320x180:r=5:d={seconds}",
+        "-f", "lavfi", "-i", f"sine=frequency=220:sample_rate=44100:duration={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-tune", "stillimage",
+        "-c:a", "aac", "-b:a", "96k", "-shortest",
+        path
+    ]
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+
+
+class ResourceSampler(threading.Thread):
+    """Samples wall clock, CPU time (self and reaped children) and RSS every `interval` seconds."""
+
+    def __init__(self, interval: float = 0.05):
+        super().__init__(name="bench-sampler", daemon=True)
+        self.interval = interval
+        self.samples: List[Tuple[float, float, float, int]] = []
+        self._done = threading.Event()
+        self._page_size = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+    def _rss(self) -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * self._page_size
+        except OSError:
+            return 0
+
+    def sample(self):
+        t = os.times()
+        self.samples.append((time.time(), t.user + t.system, t.children_user + t.children_system, self._rss()))
+
+    def run(self):
+        while not self._done.wait(self.interval):
+            self.sample()
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        self.sample()
+
+    def window(self, start: float, end: float) -> Dict[str, float]:
+        """CPU seconds and peak RSS between two wall-clock times."""
+        data = np.array(self.samples, dtype=np.float64)
+        walls = data[:, 0]
+        cpu_self = np.interp([start, end], walls, data[:, 1])
+        cpu_children = np.interp([start, end], walls, data[:, 2])
+        inside = (walls >= start - self.interval) & (walls <= end + self.interval)
+        peak = data[inside, 3].max() if inside.any() else 0.0
+        return {
+            "cpu_sec": round(float(cpu_self[1] - cpu_self[0]), 3),
+            "children_cpu_sec": round(float(cpu_children[1] - cpu_children[0]), 3),
+            "peak_rss_mb": round(float(peak) / 2 ** 20, 1),
+        }
+
+
+def count_subprocesses() -> Counter:
+    """Counts every Popen (and so every subprocess.run) by program name from here on."""
+    counts: Counter = Counter()
+    base = subprocess.Popen
+
+    class CountingPopen(base):
+        def __init__(self, args, *rest, **kwargs):
+            program = args[0] if isinstance(args, (list, tuple)) else str(args).split()[0]
+            counts[os.path.basename(str(program))] += 1
+            super().__init__(args, *rest, **kwargs)
+
+    subprocess.Popen = CountingPopen
+    return counts
+
+
+def install_fakes(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Registers a fake for every backend client the pipeline uses and returns the fakes."""
+    from core import clients
+    from core.separator import set_engine
+    from tests.fakes import (
+        FakeStorageClient, FakeSpeechClient, FakeGeminiClient, FakeElevenLabs, FakeSeparationEngine
+    )
+
+    error_rate, seed = case["error_rate"], case["seed"]
+    fakes = {
+        "storage": FakeStorageClient(),
+        "gemini": FakeGeminiClient(latency=case["llm_latency"], error_rate=error_rate, seed=seed),
+        "elevenlabs": FakeElevenLabs(latency=case["tts_latency"], error_rate=error_rate, seed=seed),
+        "separation": FakeSeparationEngine(latency_per_minute=case["separation_latency"]),
+    }
+    fakes["speech"] = FakeSpeechClient(fakes["storage"], latency=case["asr_latency"], error_rate=error_rate, seed=seed)
+
+    os.environ.update({
+        "ELEVENLABS_RATE_PER_SEC": str(case["tts_rate"]),
+        "ELEVENLABS_BURST": str(case["tts_rate"]),
+        # Cold caches: every request reaches the fakes
+        "TTS_CACHE_DIR": "",
+        "TRANSLATION_MEMORY_PATH": "",
+        # The fakes accept any project; the pipeline still requires one
+        "GCP_PROJECT_ID": "bench-project",
+    })
+
+    for name in ("speech", "storage", "gemini", "elevenlabs"):
+        clients.install(name, fakes[name])
+    set_engine(fakes["separation"])
+    return fakes
+
+
+def backend_stats(fakes: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "speech": {"requests": fakes["speech"].requests, "failures": fakes["speech"].faults.failures},
+        "storage": {"uploads": fakes["storage"].uploads, "bytes_uploaded": fakes["storage"].bytes_uploaded},
+        "gemini": {"requests": fakes["gemini"].requests, "segments": fakes["gemini"].segments,
+                   "failures": fakes["gemini"].faults.failures},
+        "elevenlabs": {"requests": fakes["elevenlabs"].requests, "characters": fakes["elevenlabs"].characters,
+                       "failures": fakes["elevenlabs"].faults.failures},
+        "separation": {"requests": fakes["separation"].requests},
+    }
+
+
+def run_case(case: Dict[str, Any]) -> Dict[str, Any]:
+    """Runs one process_video in this (fresh) process and returns its metrics."""
+    workdir = case["workdir"]
+    os.chdir(workdir)
+    fakes = install_fakes(case)
+    subprocesses = count_subprocesses()
+
+    from core import clients
+    from core.pipeline import process_video
+    from core.telemetry import trace_job
+
+    # Same as server startup: clients are built and checked before the first job
+    health = clients.warm_up()
+
+    sampler = ResourceSampler()
+    sampler.sample()
+    sampler.start()
+    t0 = time.time()
+    result, error = None, None
+    try:
+        with trace_job(f"bench-{case['minutes']}m") as recorder:
+            result = process_video(
+                case["video"], "en", case["target_lang"],
+                work_root=os.path.join(workdir, "work"), streaming=case["streaming"]
+            )
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    wall = time.time() - t0
+    sampler.stop()
+
+    stages = {}
+    for event in recorder.events:
+        if event["name"].startswith("stage."):
+            start = event["ts"] / 1e6
+            end = start + event["dur"] / 1e6
+            stages[event["name"][len("stage."):]] = dict(wall_sec=round(event["dur"] / 1e6, 3),
+                                                        **sampler.window(start, end))
+
+    usage_self = resource.getrusage(resource.RUSAGE_SELF)
+    usage_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    transcript = result["transcription"] if result else ""
+    return {
+        "minutes": case["minutes"],
+        "segments": len(transcript.splitlines()),
+        "ok": error is None and os.path.exists(result["output_video_path"]),
+        "error": error,
+        "wall_sec": round(wall, 3),
+        "cpu_sec": round(usage_self.ru_utime + usage_self.ru_stime, 3),
+        "children_cpu_sec": round(usage_children.ru_utime + usage_children.ru_stime, 3),
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": round(usage_self.ru_maxrss / 1024, 1),
+        "children_peak_rss_mb": round(usage_children.ru_maxrss / 1024, 1),
+        "subprocesses": dict(subprocesses),
+        "stages": stages,
+        "timings": {k: round(v, 3) for k, v in (result["timings"] if result else {}).items()},
+        "backends": backend_stats(fakes),
+        "client_health": health,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10, 30, 120])
+    parser.add_argument("--target", default="hi", help="target language (default: hi)")
+    parser.add_argument("--streaming", action="store_true", help="run the overlapped streaming mode")
+    parser.add_argument("--asr-latency", type=float, default=0.5, help="fake BatchRecognize latency per chunk (s)")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="fake Gemini latency per request (s)")
+    parser.add_argument("--tts-latency", type=float, default=0.2, help="fake ElevenLabs time to first byte (s)")
+    parser.add_argument("--separation-latency", type=float, default=0.0, help="fake Demucs seconds per audio minute")
+    parser.add_argument("--tts-rate", type=float, default=1000.0, help="ElevenLabs token bucket rate (req/s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of fake requests that fail")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="output/bench_pipeline.json", help="JSON results path")
+    args = parser.parse_args()
+
+    runs = []
+    config = {k: v for k, v in vars(args).items() if k != "output"}
+    print(f"{'minutes':>7} | {'segments':>8} | {'wall':>8} | {'cpu':>8} | {'ffmpeg cpu':>10} | "
+          f"{'peak rss':>9} | {'procs':>5} | status")
+    # spawn: every case starts from a clean interpreter, so ru_maxrss is its own
+    context = multiprocessing.get_context("spawn")
+    for minutes in args.minutes:
+        with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as workdir:
+            video = os.path.join(workdir, f"synthetic_{minutes:g}m.mp4")
+            make_video(video, minutes * 60)
+            case = dict(
+                minutes=minutes, video=video, workdir=workdir, target_lang=args.target,
+                streaming=args.streaming, asr_latency=args.asr_latency, llm_latency=args.llm_latency,
+                tts_latency=args.tts_latency, separation_latency=args.separation_latency,
+                tts_rate=args.tts_rate, error_rate=args.error_rate, seed=args.seed,
+            )
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                run = executor.submit(run_case, case).result()
+        runs.append(run)
+        print(f"{minutes:>7g} | {run['segments']:>8} | {run['wall_sec']:7.1f}s | {run['cpu_sec']:7.1f}s | "
+              f"{run['children_cpu_sec']:9.1f}s | {run['peak_rss_mb']:7.0f}MB | "
+              f"{sum(run['subprocesses'].values()):>5} | {'ok' if run['ok'] else run['error'] or 'failed'}")
+
+    report = {
+        "created_at": time.time(),
+        "config": config,
+        "environment": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "runs": runs,
+    }
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Benchmark: per-file probe cost of core.media_probe vs. forking ffprobe.
+
+Creates WAV and MP3 test files and reports the mean time per probe for:
+    ffprobe - one ffprobe process per call (the previous get_audio_duration)
+    header  - header / frame parsing in-process, cold cache
+    cached  - repeat probe of an unchanged file
+
+Usage (from the project root, requires ffmpeg/ffprobe on PATH):
+    python -m benchmarks.bench_probe --files 50 --seconds 30
+"""
+import os
+import time
+import argparse
+import subprocess
+import tempfile
+from typing import Callable, List
+
+import numpy as np
+
+from benchmarks.bench_mixer import write_wav
+from core.media_probe import MediaProbe, _ffprobe
+
+
+def make_files(workdir: str, count: int, seconds: float) -> List[str]:
+    paths = []
+    for i in range(count):
+        wav = os.path.join(workdir, f"clip_{i}.wav")
+        t = np.arange(int(seconds * 44100), dtype=np.float32) / 44100
+        tone = 0.2 * np.sin(2 * np.pi * (220 + i) * t)
+        write_wav(wav, np.stack([tone, tone], axis=1))
+        mp3 = os.path.join(workdir, f"clip_{i}.mp3")
+        subprocess.run(["ffmpeg", "-y", "-v", "error", "-i", wav, "-b:a", "128k", mp3],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        paths.extend([wav, mp3])
+    return paths
+
+
+def per_file(fn: Callable[[str], object], paths: List[str]) -> float:
+    t0 = time.perf_counter()
+    for path in paths:
+        fn(path)
+    return (time.perf_counter() - t0) / len(paths)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=30.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_probe_") as workdir:
+        paths = make_files(workdir, args.files, args.seconds)
+        print(f"{'format':>6} | {'ffprobe':>10} | {'header':>10} | {'cached':>10} | max |Δ duration|")
+        for ext in (".wav", ".mp3"):
+            subset = [p for p in paths if p.endswith(ext)]
+            prober = MediaProbe()
+            slow = per_file(_ffprobe, subset)
+            cold = per_file(prober.probe, subset)
+            warm = per_file(prober.probe, subset)
+            drift = max(abs(prober.probe(p)["duration"] - _ffprobe(p)["duration"]) for p in subset)
+            print(f"{ext[1:]:>6} | {slow * 1e3:8.2f}ms | {cold * 1e3:8.3f}ms | {warm * 1e3:8.4f}ms | {drift:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
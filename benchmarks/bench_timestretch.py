@@ -0,0 +1,106 @@
+"""
+Benchmark: in-process WSOLA duration fitting vs. the legacy per-segment
+ffprobe + ffmpeg atempo subprocesses.
+
+Every synthetic clip overruns its slot (ratios spread over 1.05-1.5), so
+each one is actually stretched. Reports segments per second for:
+    legacy   - ffprobe for the duration, then ffmpeg atempo to a new MP3
+    inproc   - one ffmpeg decode, then fit_to_duration in-process
+    wsola    - fit_to_duration alone on already-decoded arrays (the cost
+               once TTS audio arrives as PCM)
+
+Usage (from the project root, requires ffmpeg on PATH):
+    python -m benchmarks.bench_timestretch --segments 50 --clip-seconds 4
+"""
+import os
+import time
+import argparse
+import subprocess
+import tempfile
+from typing import List, Tuple
+
+import numpy as np
+
+from benchmarks.bench_mixer import write_wav
+from core.mixer import SAMPLE_RATE, decode_audio
+from core.timestretch import MIN_FIT_DURATION, FIT_TOLERANCE, fit_to_duration
+
+
+def make_voice(seconds: float, seed: int) -> np.ndarray:
+    """Speech-like test signal: a gliding harmonic stack with syllable-rate envelope."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    f0 = 120 + 40 * np.sin(2 * np.pi * 0.7 * t + rng.uniform(0, np.pi))
+    phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+    voice = sum(np.sin(h * phase) / h for h in range(1, 8))
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t) ** 2
+    mono = (0.15 * voice * envelope).astype(np.float32)
+    return np.stack([mono, mono], axis=1)
+
+
+def legacy_fit(path: str, target: float) -> str:
+    """The previous implementation: ffprobe + atempo subprocesses."""
+    probe = subprocess.run([
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        path
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    current = float(probe.stdout.strip())
+    if current > target * FIT_TOLERANCE and target > MIN_FIT_DURATION:
+        factor = min(current / target, 1.3)
+        fast = path.replace(".wav", "_fast.mp3")
+        subprocess.run([
+            "ffmpeg", "-y", "-i", path, "-filter:a", f"atempo={factor}", "-vn", fast
+        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return fast
+    return path
+
+
+def make_fixture(workdir: str, count: int, clip_seconds: float) -> List[Tuple[str, np.ndarray, float]]:
+    rng = np.random.default_rng(count)
+    clips = []
+    for i in range(count):
+        samples = make_voice(clip_seconds, i)
+        path = os.path.join(workdir, f"clip_{i}.wav")
+        write_wav(path, samples)
+        clips.append((path, samples, clip_seconds / rng.uniform(1.05, 1.5)))
+    return clips
+
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:8.1f} seg/s ({seconds:6.2f}s)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, default=50)
+    parser.add_argument("--clip-seconds", type=float, default=4.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_stretch_") as workdir:
+        clips = make_fixture(workdir, args.segments, args.clip_seconds)
+
+        t0 = time.perf_counter()
+        for path, _, target in clips:
+            legacy_fit(path, target)
+        legacy = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for path, _, target in clips:
+            fit_to_duration(decode_audio(path), SAMPLE_RATE, target)
+        inproc = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        for _, samples, target in clips:
+            fit_to_duration(samples, SAMPLE_RATE, target)
+        wsola_only = time.perf_counter() - t0
+
+    print(f"{args.segments} segments of {args.clip_seconds:.1f}s")
+    print(f"  legacy ffprobe+atempo : {rate(args.segments, legacy)}")
+    print(f"  decode + wsola        : {rate(args.segments, inproc)}")
+    print(f"  wsola (arrays)        : {rate(args.segments, wsola_only)}")
+
+
+if __name__ == "__main__":
+    main()
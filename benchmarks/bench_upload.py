@@ -0,0 +1,95 @@
+"""
+Benchmark: ASR chunk upload size and time per encoding (WAV vs. FLAC vs. Opus).
+
+Builds a synthetic speech-like 16 kHz mono track (voiced syllables with
+pauses over a low noise floor), splits it the way transcribe_audio does and
+uploads every chunk through upload_to_gcs to the local GCS stand-in in
+tests/fakes.py. The stand-in charges a fixed per-request latency plus the
+request size over --bandwidth, so upload time tracks bytes the way egress does.
+
+Reported per encoding: bytes per chunk, size relative to WAV, encode time
+and upload time per chunk, upload requests (resumable parts), and the
+largest duration error of the uploaded objects.
+
+Usage (from the project root, requires ffmpeg on PATH):
+    python -m benchmarks.bench_upload --minutes 20 --bandwidth 50
+"""
+import os
+import time
+import argparse
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from tests.fakes import FakeStorageClient
+from core.pcm_store import write_pcm
+from core.transcribe import UPLOAD_FORMATS, split_audio_into_chunks, upload_to_gcs
+
+SAMPLE_RATE = 16000
+
+
+def speech_like(seconds: float, seed: int = 0) -> np.ndarray:
+    """Harmonic 'syllables' of varying pitch and length separated by pauses, plus noise."""
+    rng = np.random.default_rng(seed)
+    out = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    pos = 0
+    while pos < len(out):
+        length = int(rng.uniform(0.12, 0.35) * SAMPLE_RATE)
+        t = np.arange(length, dtype=np.float32) / SAMPLE_RATE
+        f0 = rng.uniform(90, 260) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(2, 6) * t))
+        phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+        voiced = sum(np.sin(k * phase) / k for k in range(1, 8)) * np.hanning(length)
+        end = min(pos + length, len(out))
+        out[pos:end] = 0.25 * voiced[:end - pos]
+        # Short gaps between syllables, longer ones between phrases
+        pos = end + int((rng.uniform(0.02, 0.08) if rng.random() < 0.85 else rng.uniform(0.4, 1.2)) * SAMPLE_RATE)
+    out += rng.standard_normal(len(out)).astype(np.float32) * 0.003
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=float, default=20.0)
+    parser.add_argument("--chunk", type=float, default=240.0, help="chunk length (s)")
+    parser.add_argument("--bandwidth", type=float, default=50.0, help="simulated upload bandwidth (Mbit/s)")
+    parser.add_argument("--latency", type=float, default=0.05, help="per-request latency (s)")
+    parser.add_argument("--in-flight", type=int, default=4, help="concurrent uploads")
+    parser.add_argument("--formats", nargs="+", default=list(UPLOAD_FORMATS), choices=list(UPLOAD_FORMATS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_upload_") as workdir:
+        source = write_pcm(os.path.join(workdir, "vocals_16k.f32"), speech_like(args.minutes * 60), SAMPLE_RATE)
+
+        print(f"{'format':>6} | {'chunks':>6} | {'MB/chunk':>8} | {'vs wav':>6} | {'encode/chunk':>12} | "
+              f"{'upload/chunk':>12} | {'requests':>8} | max |Δ duration|")
+        wav_bytes = None
+        for encoding in args.formats:
+            t0 = time.perf_counter()
+            chunks = split_audio_into_chunks(source, chunk_duration=args.chunk,
+                                             temp_dir=os.path.join(workdir, encoding), encoding=encoding)
+            encode = (time.perf_counter() - t0) / len(chunks)
+
+            storage = FakeStorageClient(upload_latency=args.latency, bandwidth_mbps=args.bandwidth)
+
+            def upload(item):
+                index, chunk = item
+                start = time.perf_counter()
+                uri = upload_to_gcs("bench", chunk["path"], f"chunk_{index}{UPLOAD_FORMATS[encoding][0]}",
+                                    storage_client=storage)
+                return uri, time.perf_counter() - start
+
+            with ThreadPoolExecutor(max_workers=args.in_flight) as executor:
+                results = list(executor.map(upload, enumerate(chunks)))
+
+            total_bytes = sum(os.path.getsize(c["path"]) for c in chunks)
+            wav_bytes = wav_bytes or (total_bytes if encoding == "wav" else None)
+            ratio = f"{total_bytes / wav_bytes:5.2f}x" if wav_bytes else "   n/a"
+            drift = max(abs(storage.duration_of(uri) - c["duration"]) for (uri, _), c in zip(results, chunks))
+            per_upload = sum(seconds for _, seconds in results) / len(results)
+            print(f"{encoding:>6} | {len(chunks):>6} | {total_bytes / len(chunks) / 2 ** 20:8.2f} | {ratio:>6} | "
+                  f"{encode:11.2f}s | {per_upload:11.2f}s | {storage.upload_requests:>8} | {drift:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
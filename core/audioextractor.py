@@ -1,12 +1,22 @@
 import subprocess
 import os
+from core.telemetry import span
+from core.pcm_store import DTYPES, decode_to_pcm
 
-def extract_audio(video_path: str, output_audio_path: str):
+def extract_audio(video_path: str, output_audio_path: str, sample_rate: int = 44100, channels: int = 2):
     """
     Extracts audio from a video file using FFmpeg.
+
+    If `output_audio_path` ends in `.f32` / `.s16`, the audio is written as a
+    lossless PCM artifact (see core.pcm_store) at `sample_rate` / `channels`
+    so later stages can memory-map it instead of decoding it again.
     """
     os.makedirs(os.path.dirname(output_audio_path), exist_ok=True)
 
+    if os.path.splitext(output_audio_path)[1] in DTYPES:
+        with span("ffmpeg.extract_audio", format="pcm"):
+            return decode_to_pcm(video_path, output_audio_path, sample_rate=sample_rate, channels=channels)
+
     command = [
         "ffmpeg",
         "-y",
@@ -14,11 +24,12 @@ def extract_audio(video_path: str, output_audio_path: str):
         output_audio_path
     ]
 
-    subprocess.run(
-        command,
-        stdout=subprocess.DEVNULL,
-        stderr=subprocess.DEVNULL
-    )
+    with span("ffmpeg.extract_audio"):
+        subprocess.run(
+            command,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        )
 
     if not os.path.exists(output_audio_path):
         raise RuntimeError("Audio extraction failed")
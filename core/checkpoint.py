@@ -0,0 +1,178 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # not POSIX: locks only cover threads of this process
+    fcntl = None
+
+
+def file_sha256(path: str, block_size: int = 4 * 1024 * 1024) -> str:
+    """Returns the SHA-256 hex digest of a file, read in large blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def params_hash(params: Dict[str, Any]) -> str:
+    """Stable hash of a stage's parameters."""
+    payload = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _FileLock:
+    """Exclusive lock on a lock file: across processes (flock), across threads, re-entrant per thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._fd: Optional[int] = None
+
+    def acquire(self):
+        self._thread_lock.acquire()
+        if self._depth == 0:
+            try:
+                self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_EX)
+            except BaseException:
+                if self._fd is not None:
+                    os.close(self._fd)
+                    self._fd = None
+                self._thread_lock.release()
+                raise
+        self._depth += 1
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+        self._thread_lock.release()
+
+
+_file_locks: Dict[str, _FileLock] = {}
+_file_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """Holds the exclusive lock on `path` (one _FileLock per path per process)."""
+    path = os.path.abspath(path)
+    with _file_locks_guard:
+        lock = _file_locks.setdefault(path, _FileLock(path))
+    lock.acquire()
+    try:
+        yield
+    finally:
+        lock.release()
+
+
+class StageManifest:
+    """
+    Per-job record of completed pipeline stages and their artifacts.
+
+    Lives at `<job_dir>/manifest.json`. A stage entry is valid when its
+    parameters hash matches and every artifact still exists with the size it
+    had when recorded. The job dir itself is keyed by the input's content
+    hash, so two different uploads with the same filename never share state.
+
+    Several jobs (threads or processes) may share a job dir. `locked()`
+    serializes the work on it: the language-independent stages under
+    `<job_dir>/.lock`, one target language under `<job_dir>/.lock.<lang>`
+    (always taken after the shared lock, never before). `record()`
+    re-reads the manifest and merges into it under its own short-held
+    lock, so jobs never erase each other's stage entries.
+    """
+
+    def __init__(self, job_dir: str):
+        self.job_dir = job_dir
+        self.path = os.path.join(job_dir, "manifest.json")
+        os.makedirs(job_dir, exist_ok=True)
+        self.stages: Dict[str, Dict[str, Any]] = {}
+        self.reload()
+
+    def _read(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f).get("stages", {})
+        except (ValueError, OSError) as e:
+            print(f"⚠️ Ignoring unreadable manifest {self.path}: {e}")
+            return {}
+
+    def reload(self):
+        """Picks up stages recorded by other jobs since this manifest was read."""
+        with file_lock(f"{self.path}.lock"):
+            self.stages = self._read()
+
+    @contextmanager
+    def locked(self, name: str = "") -> Iterator[None]:
+        """
+        Holds the job dir's lock (`name` = "" for the shared stages, else e.g.
+        a target language) and reloads the manifest once it is acquired, so
+        stages a concurrent job just finished are seen as valid.
+        """
+        lock_path = os.path.join(self.job_dir, f".lock.{name}" if name else ".lock")
+        with file_lock(lock_path):
+            self.reload()
+            yield
+
+    def is_valid(self, stage: str, params: Dict[str, Any]) -> bool:
+        entry = self.stages.get(stage)
+        if not entry or entry.get("params_hash") != params_hash(params):
+            return False
+        for artifact in entry.get("artifacts", {}).values():
+            path = artifact["path"]
+            if not os.path.exists(path) or os.path.getsize(path) != artifact["size"]:
+                return False
+        return True
+
+    def artifacts(self, stage: str) -> Dict[str, str]:
+        """Returns {name: path} for a recorded stage."""
+        entry = self.stages.get(stage, {})
+        return {name: a["path"] for name, a in entry.get("artifacts", {}).items()}
+
+    def record(self, stage: str, params: Dict[str, Any], artifacts: Dict[str, str]):
+        """
+        Marks a stage complete and persists the manifest atomically, merged
+        with whatever other jobs recorded in the meantime.
+        """
+        entry = {
+            "params": params,
+            "params_hash": params_hash(params),
+            "completed_at": time.time(),
+            "artifacts": {
+                name: {"path": path, "size": os.path.getsize(path)}
+                for name, path in artifacts.items()
+            },
+        }
+        with file_lock(f"{self.path}.lock"):
+            stages = self._read()
+            stages[stage] = entry
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stages": stages}, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self.stages = stages
+
+
+def save_json(path: str, data: Any):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def load_json(path: str) -> Optional[Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
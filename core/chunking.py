@@ -0,0 +1,202 @@
+"""
+Splitting of audio into (optionally overlapping) chunks for BatchRecognize.
+
+Only ffmpeg and numpy are needed here, so the splitter can be used and
+tested without the Speech SDK; core.transcribe re-exports it.
+"""
+import os
+import subprocess
+import tempfile
+import wave
+from typing import Dict, List
+
+import numpy as np
+
+from core.telemetry import span
+from core.pcm_store import is_pcm, open_pcm, ffmpeg_input_args
+
+# Chunk upload encodings: extension and ffmpeg codec arguments. FLAC is
+# lossless and roughly halves the bytes of LINEAR16 WAV; Opus is lossy but
+# far smaller. BatchRecognize auto-detects all three.
+UPLOAD_FORMATS = {
+    "wav": (".wav", None),
+    "flac": (".flac", ["-c:a", "flac", "-compression_level", "5"]),
+    "opus": (".opus", ["-c:a", "libopus", "-b:a", os.getenv("ASR_OPUS_BITRATE", "32k"), "-application", "voip"]),
+}
+
+
+class _ChunkWriter:
+    """Writes 16-bit mono PCM frames to a chunk file, encoding with ffmpeg unless it is WAV."""
+
+    def __init__(self, path: str, sample_rate: int, encoding: str):
+        self.path = path
+        self._wave = None
+        self._proc = None
+        codec_args = UPLOAD_FORMATS[encoding][1]
+        if codec_args is None:
+            self._wave = wave.open(path, "wb")
+            self._wave.setnchannels(1)
+            self._wave.setsampwidth(2)
+            self._wave.setframerate(sample_rate)
+        else:
+            cmd = [
+                "ffmpeg", "-y", "-v", "error",
+                "-f", "s16le", "-ar", str(sample_rate), "-ac", "1", "-i", "-",
+                *codec_args,
+                path
+            ]
+            self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def writeframes(self, data: bytes):
+        if self._wave is not None:
+            self._wave.writeframes(data)
+        else:
+            self._proc.stdin.write(data)
+
+    def close(self):
+        if self._wave is not None:
+            self._wave.close()
+            return
+        self._proc.stdin.close()
+        stderr = self._proc.stderr.read()
+        if self._proc.wait() != 0:
+            raise RuntimeError(f"Chunk encode failed ({self.path}): {stderr.decode(errors='ignore').strip()}")
+
+
+def split_audio_into_chunks(
+    audio_path: str,
+    chunk_duration: float = 240.0,
+    temp_dir: str = None,
+    overlap: float = 0.0,
+    sample_rate: int = 16000,
+    encoding: str = "wav"
+) -> List[Dict]:
+    """
+    Splits an audio file into chunks. 
+    Using 240s (4 mins) chunks since BatchRecognize can handle longer files more efficiently than Sync.
+
+    The input is decoded exactly once: a single ffmpeg process streams 16 kHz
+    mono LINEAR16 PCM to stdout and the frames are routed into every chunk
+    file whose window they fall in. With `overlap` > 0, consecutive chunks
+    share `overlap` seconds of audio (chunk k starts at k * (chunk_duration - overlap)).
+
+    `encoding` picks the chunk file format (see UPLOAD_FORMATS): "wav"
+    (LINEAR16), "flac" or "opus". Compressed chunks are encoded by one ffmpeg
+    process per chunk, fed while the input is still being decoded.
+    """
+    if overlap < 0 or overlap >= chunk_duration:
+        raise ValueError("overlap must be >= 0 and smaller than chunk_duration")
+    if encoding not in UPLOAD_FORMATS:
+        raise ValueError(f"Unsupported chunk encoding: {encoding}. Supported: {list(UPLOAD_FORMATS)}")
+
+    if temp_dir is None:
+        temp_dir = tempfile.mkdtemp(prefix="stt_chunks_")
+    
+    os.makedirs(temp_dir, exist_ok=True)
+
+    chunk_frames = int(chunk_duration * sample_rate)
+    step_frames = int((chunk_duration - overlap) * sample_rate)
+    bytes_per_frame = 2  # pcm_s16le, mono
+
+    extension = UPLOAD_FORMATS[encoding][0]
+
+    def chunk_path(index: int) -> str:
+        return os.path.join(temp_dir, f"chunk_{index}{extension}")
+
+    # A PCM artifact already at the ASR rate is sliced straight from its memory map
+    if is_pcm(audio_path):
+        artifact = open_pcm(audio_path)
+        if artifact.sample_rate == sample_rate and artifact.channels == 1:
+            return _split_pcm_artifact(artifact, chunk_frames, step_frames, chunk_path, encoding)
+
+    cmd = [
+        "ffmpeg", "-v", "error",
+        *ffmpeg_input_args(audio_path),
+        "-ar", str(sample_rate),
+        "-ac", "1",
+        "-f", "s16le",
+        "-acodec", "pcm_s16le",
+        "-"
+    ]
+    with span("ffmpeg.split_chunks", encoding=encoding):
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+
+        chunks = []
+        open_writers = {}  # chunk_index -> wave writer
+        position = 0       # frames read so far
+        read_size = sample_rate * bytes_per_frame * 10  # 10s of audio per read
+
+        try:
+            while True:
+                data = proc.stdout.read(read_size)
+                if not data:
+                    break
+                block_frames = len(data) // bytes_per_frame
+                block_end = position + block_frames
+
+                # Open every chunk whose window starts inside this block
+                next_index = len(chunks)
+                while next_index * step_frames < block_end:
+                    open_writers[next_index] = _ChunkWriter(chunk_path(next_index), sample_rate, encoding)
+                    chunks.append({
+                        "path": chunk_path(next_index),
+                        "start_offset": next_index * step_frames / sample_rate
+                    })
+                    next_index += 1
+
+                # Route the block into each open chunk it overlaps
+                for index in list(open_writers):
+                    chunk_start = index * step_frames
+                    chunk_end = chunk_start + chunk_frames
+                    lo = max(position, chunk_start)
+                    hi = min(block_end, chunk_end)
+                    if hi > lo:
+                        open_writers[index].writeframes(
+                            data[(lo - position) * bytes_per_frame:(hi - position) * bytes_per_frame]
+                        )
+                    if chunk_end <= block_end:
+                        open_writers.pop(index).close()
+
+                position = block_end
+        finally:
+            for writer in open_writers.values():
+                writer.close()
+            proc.stdout.close()
+            proc.wait()
+
+    # Trailing chunks that lie entirely inside the previous chunk add nothing
+    while len(chunks) > 1 and (len(chunks) - 2) * step_frames + chunk_frames >= position:
+        os.remove(chunks.pop()["path"])
+
+    for index, chunk in enumerate(chunks):
+        chunk["duration"] = min(chunk_frames, position - index * step_frames) / sample_rate
+
+    return chunks
+
+
+def _split_pcm_artifact(artifact, chunk_frames: int, step_frames: int, chunk_path, encoding: str = "wav") -> List[Dict]:
+    """Writes chunks (16-bit, in `encoding`) from zero-copy slices of a mono PCM artifact."""
+    total = artifact.frames
+    if total == 0:
+        return []
+    starts = [0]
+    while starts[-1] + chunk_frames < total:
+        starts.append(starts[-1] + step_frames)
+
+    chunks = []
+    with span("pcm.split_chunks", frames=total, encoding=encoding):
+        for index, start in enumerate(starts):
+            view = artifact.samples[start:start + chunk_frames, 0]
+            if view.dtype.kind == "f":
+                view = (np.clip(view, -1.0, 1.0) * 32767.0).astype("<i2")
+            writer = _ChunkWriter(chunk_path(index), artifact.sample_rate, encoding)
+            try:
+                writer.writeframes(np.ascontiguousarray(view, dtype="<i2").tobytes())
+            finally:
+                writer.close()
+            chunks.append({
+                "path": chunk_path(index),
+                "start_offset": start / artifact.sample_rate,
+                "duration": len(view) / artifact.sample_rate
+            })
+    return chunks
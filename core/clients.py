@@ -0,0 +1,230 @@
+"""
+Process-wide backend clients.
+
+The Speech, Cloud Storage, Gemini and ElevenLabs SDK clients are built once
+per worker process, on first use, and shared by every job and thread (the
+SDK clients are thread-safe). Auth, channel setup and TLS handshakes are
+paid once; later calls reuse the client's HTTP/gRPC connection pool.
+
+    get("speech")                 - the shared client, built lazily
+    register("speech", factory)   - replace how a client is built
+    install("speech", client)     - use a ready-made client (fakes, tests)
+    warm_up()                     - build every client and open its connection
+    health()                      - run each client's health check
+
+Clients are per process: after a fork, the child builds its own (gRPC
+channels must not be shared across processes).
+
+Metrics: dub_client_builds_total, dub_client_reuses_total and
+dub_client_healthy per client; builds and health checks are also timed as
+the client.build / client.health spans.
+"""
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from core.telemetry import span, counter, gauge
+
+CLIENT_BUILDS = counter("dub_client_builds_total", "Backend clients constructed, by client.")
+CLIENT_REUSES = counter("dub_client_reuses_total", "Lookups served by an already built client, by client.")
+CLIENT_HEALTHY = gauge("dub_client_healthy", "1 if the client's last health check passed, else 0.")
+
+RECOGNIZER_ID = "voice-dub-chirp3-diarizer-v7"
+
+
+def _build_speech():
+    from google.cloud.speech_v2 import SpeechClient
+    from google.api_core.client_options import ClientOptions
+
+    if not os.getenv("GCP_PROJECT_ID") or not os.getenv("GOOGLE_APPLICATION_CREDENTIALS"):
+        raise RuntimeError("Missing GCP_PROJECT_ID or GOOGLE_APPLICATION_CREDENTIALS.")
+    region = os.getenv("GCP_REGION", "us")
+    return SpeechClient(client_options=ClientOptions(api_endpoint=f"{region}-speech.googleapis.com"))
+
+
+def _build_storage():
+    from google.cloud import storage
+    return storage.Client()
+
+
+def _build_gemini():
+    from google import genai
+
+    gcp_project = os.getenv("GCP_PROJECT_ID")
+    credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+    if not gcp_project:
+        raise RuntimeError("GCP_PROJECT_ID not found. Please add it to your .env file.")
+    if not credentials_path:
+        raise RuntimeError("GOOGLE_APPLICATION_CREDENTIALS not found. Please add it to your .env file.")
+    if not os.path.exists(credentials_path):
+        raise RuntimeError(f"Service account key file not found at: {credentials_path}")
+    # Use GEMINI_REGION if set, otherwise fallback to us-central1 (Required for Vertex AI models)
+    # CRITICAL: Do NOT set this to 'us' (multi-region) as it causes 404 errors for prediction endpoints.
+    # The GOOGLE_APPLICATION_CREDENTIALS env var is automatically used by the client
+    return genai.Client(vertexai=True, project=gcp_project, location=os.getenv("GEMINI_REGION", "us-central1"))
+
+
+def _build_elevenlabs():
+    from elevenlabs.client import ElevenLabs
+
+    api_key = os.getenv("ELEVENLABS_API_KEY")
+    if not api_key:
+        raise RuntimeError("ELEVENLABS_API_KEY not found in .env")
+    return ElevenLabs(api_key=api_key)
+
+
+def _check_speech(client):
+    project = os.getenv("GCP_PROJECT_ID")
+    if not project:
+        raise RuntimeError("GCP_PROJECT_ID not found. Please add it to your .env file.")
+    region = os.getenv("GCP_REGION", "us")
+    try:
+        client.get_recognizer(name=f"projects/{project}/locations/{region}/recognizers/{RECOGNIZER_ID}")
+    except Exception as e:
+        # A missing recognizer still proves the endpoint and credentials work
+        if type(e).__name__ != "NotFound":
+            raise
+
+
+def _check_storage(client):
+    client.bucket(os.getenv("GCS_BUCKET_NAME", "dub_poc_bucket")).exists()
+
+
+def _check_gemini(client):
+    client.models.get(model=os.getenv("GEMINI_MODEL", "gemini-2.5-flash"))
+
+
+def _check_elevenlabs(client):
+    client.models.list()
+
+
+class ClientRegistry:
+    """Lazily built, per-process shared clients with pluggable factories and health checks."""
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._checks: Dict[str, Optional[Callable[[Any], None]]] = {}
+        self._clients: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+    def register(self, name: str, factory: Callable[[], Any], check: Optional[Callable[[Any], None]] = None):
+        """Sets how `name` is built (and health-checked); drops any client already built."""
+        with self._lock:
+            self._factories[name] = factory
+            self._checks[name] = check
+            self._locks.setdefault(name, threading.Lock())
+            self._clients.pop(name, None)
+
+    def install(self, name: str, client: Any, check: Optional[Callable[[Any], None]] = None):
+        """
+        Uses `client` as-is for `name` (e.g. a stand-in from tests/fakes.py).
+        The registered health check is kept unless `check` is given.
+        """
+        with self._lock:
+            check = check or self._checks.get(name)
+        self.register(name, lambda: client, check)
+
+    def _lock_for(self, name: str) -> threading.Lock:
+        with self._lock:
+            if os.getpid() != self._pid:
+                # Forked: connections belong to the parent, start over
+                self._pid = os.getpid()
+                self._clients.clear()
+                self._locks = {key: threading.Lock() for key in self._factories}
+            if name not in self._factories:
+                raise KeyError(f"Unknown client: {name}. Registered: {sorted(self._factories)}")
+            return self._locks[name]
+
+    def get(self, name: str) -> Any:
+        """Returns the shared client for `name`, building it on first use."""
+        lock = self._lock_for(name)
+        client = self._clients.get(name)
+        if client is not None:
+            CLIENT_REUSES.inc(client=name)
+            return client
+        with lock:
+            client = self._clients.get(name)
+            if client is None:
+                with span("client.build", client=name):
+                    client = self._factories[name]()
+                self._clients[name] = client
+                CLIENT_BUILDS.inc(client=name)
+            else:
+                CLIENT_REUSES.inc(client=name)
+        return client
+
+    def reset(self, name: Optional[str] = None):
+        """Drops built clients (all, or just `name`) so the next get() rebuilds them."""
+        with self._lock:
+            if name is None:
+                self._clients.clear()
+            else:
+                self._clients.pop(name, None)
+
+    def names(self):
+        with self._lock:
+            return sorted(self._factories)
+
+    def check(self, name: str) -> Dict[str, Any]:
+        """Builds `name` if needed and runs its health check. Never raises."""
+        t0 = time.time()
+        try:
+            with span("client.health", client=name):
+                client = self.get(name)
+                check = self._checks.get(name)
+                if check:
+                    check(client)
+            result = {"ok": True, "error": None}
+        except Exception as e:
+            result = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+        result["latency_sec"] = round(time.time() - t0, 3)
+        CLIENT_HEALTHY.set(1 if result["ok"] else 0, client=name)
+        return result
+
+    def health(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """{name: {"ok", "error", "latency_sec"}} for every (or the given) client."""
+        return {name: self.check(name) for name in (names or self.names())}
+
+    def warm_up(self, names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Builds the clients and runs one health check each, so auth and the
+        first connection are done before any job needs them.
+        """
+        report = self.health(names)
+        for name, result in report.items():
+            if result["ok"]:
+                print(f"🔌 {name} client ready ({result['latency_sec']:.2f}s)")
+            else:
+                print(f"⚠️ {name} client not ready: {result['error']}")
+        return report
+
+
+registry = ClientRegistry()
+registry.register("speech", _build_speech, _check_speech)
+registry.register("storage", _build_storage, _check_storage)
+registry.register("gemini", _build_gemini, _check_gemini)
+registry.register("elevenlabs", _build_elevenlabs, _check_elevenlabs)
+
+
+def get(name: str) -> Any:
+    """Returns the process-wide client `name` (see ClientRegistry.get)."""
+    return registry.get(name)
+
+
+def register(name: str, factory: Callable[[], Any], check: Optional[Callable[[Any], None]] = None):
+    registry.register(name, factory, check)
+
+
+def install(name: str, client: Any, check: Optional[Callable[[Any], None]] = None):
+    registry.install(name, client, check)
+
+
+def warm_up(names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    return registry.warm_up(names)
+
+
+def health(names: Optional[Iterable[str]] = None) -> Dict[str, Dict[str, Any]]:
+    return registry.health(names)
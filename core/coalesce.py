@@ -0,0 +1,109 @@
+"""
+Coalescing of short ASR segments before translation.
+
+The ASR segmenter splits on every pause over 0.7 s, so a transcript has many
+one- or two-word segments. Each one becomes its own Gemini item, ElevenLabs
+request, time-fit and mix input. Adjacent segments of the same speaker are
+merged here when the pause between them is at most COALESCE_MAX_GAP_SEC and
+the merged segment stays within COALESCE_MAX_DURATION_SEC. The merged
+segment keeps the start of its first part, the end of its last and all the
+words with their own timings. Dubbing uses them to keep the bridged pauses:
+the synthesized clip is cut at its quiet points and every spoken part is
+placed at, and fitted to, its own time span (see core.dubbing).
+
+Configuration (environment):
+    COALESCE_SEGMENTS         - "0" disables the pass (default: "1")
+    COALESCE_MAX_GAP_SEC      - longest pause bridged (default: 1.5)
+    COALESCE_MAX_DURATION_SEC - longest merged segment (default: 15)
+"""
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from core.telemetry import counter
+
+SEGMENTS_COALESCED = counter(
+    "dub_segments_coalesced_total", "ASR segments merged into their neighbour (one TTS request saved each)."
+)
+
+
+def coalesce_config() -> Dict[str, Any]:
+    """Current settings; part of the translation checkpoint params."""
+    return {
+        "enabled": os.getenv("COALESCE_SEGMENTS", "1") == "1",
+        "max_gap": float(os.getenv("COALESCE_MAX_GAP_SEC", "1.5")),
+        "max_duration": float(os.getenv("COALESCE_MAX_DURATION_SEC", "15")),
+    }
+
+
+class SegmentCoalescer:
+    """
+    Incremental coalescing for segments that arrive in timeline order.
+    `push()` returns the segments that can no longer grow (the last one is
+    held back, the next batch may continue it); `flush()` returns the rest.
+    """
+
+    def __init__(self, max_gap: Optional[float] = None, max_duration: Optional[float] = None,
+                 enabled: Optional[bool] = None):
+        config = coalesce_config()
+        self.enabled = config["enabled"] if enabled is None else enabled
+        self.max_gap = config["max_gap"] if max_gap is None else max_gap
+        self.max_duration = config["max_duration"] if max_duration is None else max_duration
+        self.segments_in = 0
+        self.segments_out = 0
+        self._open: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def _fits(self, current: Dict[str, Any], seg: Dict[str, Any]) -> bool:
+        return (
+            seg.get("speaker", 0) == current.get("speaker", 0)
+            and seg["start"] - current["end"] <= self.max_gap
+            and seg["end"] - current["start"] <= self.max_duration
+        )
+
+    def push(self, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        ready = []
+        with self._lock:
+            for seg in segments:
+                self.segments_in += 1
+                if not self.enabled:
+                    ready.append(seg)
+                    continue
+                if self._open is not None and self._fits(self._open, seg):
+                    self._open["end"] = max(self._open["end"], seg["end"])
+                    self._open["transcript"] = f"{self._open['transcript']} {seg['transcript']}".strip()
+                    self._open["words"] = self._open.get("words", []) + seg.get("words", [])
+                    SEGMENTS_COALESCED.inc()
+                    continue
+                if self._open is not None:
+                    ready.append(self._open)
+                self._open = dict(seg, words=list(seg.get("words", [])))
+            self.segments_out += len(ready)
+        return ready
+
+    def flush(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            ready = [self._open] if self._open is not None else []
+            self._open = None
+            self.segments_out += len(ready)
+        return ready
+
+    @property
+    def saved(self) -> int:
+        """Segments (and so TTS requests and mix inputs) merged away so far."""
+        return self.segments_in - self.segments_out - (1 if self._open is not None else 0)
+
+    def report(self):
+        if not self.enabled:
+            print(f"🧩 Segment coalescing disabled ({self.segments_in} segments)")
+            return
+        print(f"🧩 Coalesced {self.segments_in} → {self.segments_out} segments: {self.saved} fewer TTS requests "
+              f"(same speaker, gap ≤ {self.max_gap:g}s, ≤ {self.max_duration:g}s each)")
+
+
+def coalesce_segments(segments: List[Dict[str, Any]], **kwargs) -> List[Dict[str, Any]]:
+    """Coalesces a complete, timeline-ordered segment list (see SegmentCoalescer)."""
+    coalescer = SegmentCoalescer(**kwargs)
+    merged = coalescer.push(segments) + coalescer.flush()
+    coalescer.report()
+    return merged
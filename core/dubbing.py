@@ -1,37 +1,157 @@
 import os
-import subprocess
-import shutil
-from typing import List, Dict, Any
-from core.elevenlabs_client import ElevenLabsClient
-
-def get_audio_duration(file_path: str) -> float:
-    """Returns the duration of an audio file in seconds."""
-    cmd = [
-        "ffprobe", "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        file_path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
+from core.elevenlabs_client import ElevenLabsClient, PCM_SAMPLE_RATE
+from core.mixer import TimelineMixer
+from core.timestretch import fit_to_duration, max_ratio_from_env
+from core.telemetry import bind
+from core.stitching import PAUSE_SPLIT
+
+# A merged clip is cut at the quietest point within this fraction of its
+# length around the proportional position of each bridged pause
+SPLIT_SEARCH = 0.15
+_SPLIT_FRAME_SEC = 0.02
+
+
+def _spoken_spans(seg: Dict[str, Any]) -> List[Tuple[float, float]]:
+    """
+    The parts of a segment that were spoken, from its word timings: words
+    further apart than PAUSE_SPLIT (pauses bridged by core.coalesce) start a
+    new span. A segment without words is one span.
+    """
+    words = seg.get("words") or []
+    if len(words) < 2:
+        return [(seg.get("start", 0.0), seg.get("end", 0.0))]
+    spans = [[words[0]["start"], words[0]["end"]]]
+    for word in words[1:]:
+        if word["start"] - spans[-1][1] > PAUSE_SPLIT:
+            spans.append([word["start"], word["end"]])
+        else:
+            spans[-1][1] = max(spans[-1][1], word["end"])
+    return [(start, end) for start, end in spans]
+
+
+def _split_at_pauses(samples: np.ndarray, sample_rate: int, weights: List[float]) -> Optional[List[np.ndarray]]:
+    """
+    Cuts a clip into len(weights) pieces sized roughly in proportion to
+    `weights`, each cut at the quietest point (100 ms smoothed energy) near
+    its proportional position. Returns None if the clip is too short to split.
+    """
+    frame = max(1, int(_SPLIT_FRAME_SEC * sample_rate))
+    frames = len(samples) // frame
+    if frames < 4 * len(weights):
+        return None
+    mono = samples[:frames * frame].mean(axis=1) if samples.ndim > 1 else samples[:frames * frame]
+    energy = np.square(mono, dtype=np.float64).reshape(frames, frame).mean(axis=1)
+    energy = np.convolve(energy, np.ones(5) / 5, mode="same")
+
+    total = float(sum(weights)) or 1.0
+    radius = max(1, int(frames * SPLIT_SEARCH))
+    cuts = []
+    position = 0.0
+    previous = 0
+    for weight in weights[:-1]:
+        position += weight
+        target = int(position / total * frames)
+        lo = max(previous + 1, target - radius)
+        hi = min(frames - 1, target + radius)
+        cut = lo + int(np.argmin(energy[lo:hi + 1])) if hi >= lo else min(previous + 1, frames - 1)
+        cuts.append(cut)
+        previous = cut
+    return np.split(samples, [cut * frame + frame // 2 for cut in cuts])
+
+
+def synthesize_segment(
+    el_client: ElevenLabsClient,
+    seg: Dict[str, Any],
+    language: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Generates TTS for a single segment and fits it to the original slot.
+    The clip is streamed as raw PCM into memory, time-stretched in-process
+    if it overruns, and handed to the mixer as samples; no temp files.
+
+    A coalesced segment keeps the pauses it bridged: the clip is cut at its
+    quiet points into one piece per spoken span (see _spoken_spans), and
+    each piece is placed at and fitted to its own span.
+    Returns a list of {"samples", "start"} (empty if there was no audio).
+    """
+    start_time = seg.get("start", 0)
+    original_text = seg.get("transcript", "")
+    # Use simple mapping for speaker ID if available, else 0
+    speaker_id = seg.get("speaker", 0)
+    target_duration = seg.get("end", 0.0) - seg.get("start", 0.0)
+
+    # Skip empty segments
+    if not original_text.strip():
+        return []
+
+    # The slot length is known up front, so an overrun the stretch cap cannot
+    # absorb is reported while the audio is still downloading
+    limit = target_duration * max_ratio_from_env()
+    overrun = []
+
+    def check_duration(received: float):
+        if not overrun and target_duration > 0 and received > limit:
+            overrun.append(received)
+            print(f"  ⚠️  Segment at {start_time:.1f}s already {received:.1f}s for a {target_duration:.1f}s slot")
+
+    # Generate TTS (rate limited inside the client)
+    samples = el_client.synthesize_pcm(
+        text=original_text,
+        speaker_id=speaker_id,
+        language=language,
+        on_progress=check_duration
+    )
+    if len(samples) == 0:
+        return []
+
+    spans = _spoken_spans(seg)
+    pieces = None
+    if len(spans) > 1:
+        pieces = _split_at_pauses(samples, PCM_SAMPLE_RATE, [end - start for start, end in spans])
+    if pieces is None:
+        spans, pieces = [(start_time, start_time + target_duration)], [samples]
+
+    # Duration sync: pieces longer than their span are sped up
+    # (pitch-preserving, capped ratio)
+    return [
+        {"samples": fit_to_duration(piece, PCM_SAMPLE_RATE, end - start), "start": start}
+        for (start, end), piece in zip(spans, pieces)
+        if len(piece)
     ]
-    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-    try:
-        return float(result.stdout.strip())
-    except (ValueError, IndexError):
-        return 0.0
+
+def synthesize_into(
+    mixer: TimelineMixer,
+    el_client: ElevenLabsClient,
+    seg: Dict[str, Any],
+    language: str
+) -> bool:
+    """
+    Synthesizes one segment and adds it straight into the mix, so no clip
+    outlives its own request. Returns False if the segment produced no audio.
+    """
+    clips = synthesize_segment(el_client, seg, language)
+    for clip in clips:
+        mixer.add(clip)
+    return bool(clips)
 
 def generate_dubbed_audio(
     background_audio_path: str,
     segments: List[Dict[str, Any]],
     output_path: str,
     language: str = "hi", # Added language parameter
-    temp_dir: str = "temp_tts",
-    cleanup_temp: bool = True  # Auto-delete temp files after mixing
+    max_workers: Optional[int] = None
 ) -> str:
     """
     Generates Hindi TTS using ElevenLabs and mixes with background.
-    Processes segments SEQUENTIALLY to respect API concurrency limits.
+    Segments are synthesized concurrently; the client's shared token bucket
+    keeps the request rate within the account quota. Each clip is added
+    into the timeline as soon as it is fitted (nothing is written to disk).
     
     Args:
-        cleanup_temp: If True, deletes temp_dir after mixing to save storage.
+        max_workers: Number of concurrent TTS requests (default: ELEVENLABS_CONCURRENCY or 4).
     """
     print("=" * 50)
     print("STEP 6: Generating TTS (ElevenLabs) and Mixing")
@@ -41,8 +161,6 @@ def generate_dubbed_audio(
         print("No segments to dub.")
         return background_audio_path
 
-    os.makedirs(temp_dir, exist_ok=True)
-    
     # Initialize ElevenLabs Client
     try:
         el_client = ElevenLabsClient()
@@ -50,109 +168,41 @@ def generate_dubbed_audio(
         print(f"❌ Failed to init ElevenLabs: {e}")
         return background_audio_path
     
-    tts_audio_files = []
-    print(f"Processing {len(segments)} segments sequentially...")
-    
-    for i, seg in enumerate(segments):
-        start_time = seg.get("start", 0)
-        original_text = seg.get("transcript", "")
-        # Use simple mapping for speaker ID if available, else 0
-        speaker_id = seg.get("speaker", 0) 
-        target_duration = seg.get("end", 0.0) - seg.get("start", 0.0)
-        
-        # Skip empty segments
-        if not original_text.strip():
-            continue
-            
-        temp_file = os.path.join(temp_dir, f"segment_{i}_{start_time}.mp3")
-        
-        try:
-            # Generate TTS (blocking/sequential)
-            # Pass language and speaker_id
-            audio_path = el_client.generate_dub(
-                text=original_text, 
-                output_path=temp_file, 
-                speaker_id=speaker_id,
-                language=language
-            )
-            
-            if not os.path.exists(temp_file):
-                continue
-            
-            # Duration Sync check
-            current_duration = get_audio_duration(temp_file)
-            final_segment_path = temp_file
-            
-            # Speed up if TTS is longer than original slot
-            if current_duration > target_duration * 1.05 and target_duration > 0.5:
-                speed_factor = min(current_duration / target_duration, 1.3)
-                
-                speed_filename = temp_file.replace(".mp3", "_fast.mp3")
-                subprocess.run([
-                    "ffmpeg", "-y", "-i", temp_file,
-                    "-filter:a", f"atempo={speed_factor}",
-                    "-vn", speed_filename
-                ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-                
-                if os.path.exists(speed_filename):
-                    final_segment_path = speed_filename
-        
-            tts_audio_files.append({"path": final_segment_path, "start": start_time})
-        
-        except Exception as e:
-            print(f"  ❌ Segment {i} failed: {e}")
-
-    if not tts_audio_files:
+    max_workers = max_workers or int(os.getenv("ELEVENLABS_CONCURRENCY", "4"))
+    print(f"Processing {len(segments)} segments with {max_workers} workers...")
+
+    # Clips are added as requests finish; the fixed-point timeline makes the
+    # mix identical whatever that order is (see TimelineMixer)
+    mixer = TimelineMixer(background_audio_path)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(bind(synthesize_into), mixer, el_client, seg, language): i
+            for i, seg in enumerate(segments)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                future.result()
+            except Exception as e:
+                print(f"  ❌ Segment {i} failed: {e}")
+
+    if el_client.cache:
+        stats = el_client.cache.stats()
+        # The cache is shared by every job in the process: these are its totals
+        print(f"TTS cache (process): {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+
+    return finish_mix(mixer, background_audio_path, output_path)
+
+def finish_mix(mixer: Optional[TimelineMixer], background_audio_path: str, output_path: str) -> str:
+    """
+    Encodes the mixed timeline. Returns the background path unchanged when
+    no clip was mixed.
+    """
+    if mixer is None or not mixer.clips:
         print("No TTS generated.")
         return background_audio_path
 
-    # Build FFmpeg mix command
-    cmd = ["ffmpeg", "-y", "-i", background_audio_path]
-    for tts in tts_audio_files:
-        cmd.extend(["-i", tts["path"]])
-
-    filter_complex = []
-    dialogue_inputs = []
-    
-    filter_complex.append("[0:a]aformat=sample_rates=44100:channel_layouts=stereo[bg]")
-
-    for i, tts in enumerate(tts_audio_files):
-        delay_ms = int(tts["start"] * 1000)
-        chain = f"[{i+1}:a]aformat=sample_rates=44100:channel_layouts=stereo,adelay={delay_ms}|{delay_ms}[tts{i}]"
-        filter_complex.append(chain)
-        dialogue_inputs.append(f"[tts{i}]")
-
-    mix_str = "".join(dialogue_inputs)
-    # CRITICAL: normalize=0 prevents amix from dividing volume by number of inputs
-    # Without this, each segment's volume = 1/N where N = total segments, causing very low audio
-    # that increases as segments finish playing
-    filter_complex.append(f"{mix_str}amix=inputs={len(tts_audio_files)}:dropout_transition=0:normalize=0[dialogue]")
-    filter_complex.append("[bg]volume=0.4[bg_quiet]")  # Background slightly lower
-    filter_complex.append("[dialogue]volume=2.5[dialogue_loud]")  # Dialogue boost (normalized now, so less needed)
-    filter_complex.append("[bg_quiet][dialogue_loud]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[out]")
-
-    full_filter = ";".join(filter_complex)
-    
-    cmd.extend([
-        "-filter_complex", full_filter,
-        "-map", "[out]",
-        "-c:a", "aac",
-        "-b:a", "192k",
-        output_path
-    ])
-
-    print("Mixing audio...")
-    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    
+    print(f"Encoding mix of {mixer.clips} clips...")
+    mixer.finish(output_path)
     print(f"✅ Dubbed audio saved: {output_path}")
-    
-    # Cleanup temp TTS files to save storage
-    if cleanup_temp and os.path.exists(temp_dir):
-        try:
-            shutil.rmtree(temp_dir)
-            print(f"🧹 Cleaned up temp files: {temp_dir}")
-        except Exception as e:
-            print(f"⚠️ Could not cleanup temp dir: {e}")
-    
     return output_path
-
@@ -1,19 +1,42 @@
 import os
-import time
-from typing import Optional
-from elevenlabs.client import ElevenLabs
+from typing import Callable, Optional, Tuple
+import numpy as np
 from dotenv import load_dotenv
+from core.ratelimit import TokenBucket, bucket_from_env
+from core.tts_cache import TTSCache, cache_from_env
+from core.telemetry import span, counter
+from core import clients
 
 # Load env variables
 load_dotenv(dotenv_path=os.path.join(os.getcwd(), ".env"))
 
+OUTPUT_FORMAT = "mp3_44100_128"
+
+# Raw 16-bit little-endian mono PCM; needs no decoding before mixing
+PCM_OUTPUT_FORMAT = "pcm_44100"
+PCM_SAMPLE_RATE = 44100
+
+TTS_CACHE_LOOKUPS = counter("dub_tts_cache_lookups_total", "TTS cache lookups by result (hit/miss).")
+
+VOICE_SETTINGS = {
+    "stability": 0.5,
+    "similarity_boost": 0.75,
+    "style": 0.5,
+    "use_speaker_boost": True
+}
+
 class ElevenLabsClient:
-    def __init__(self):
-        self.api_key = os.getenv("ELEVENLABS_API_KEY")
-        if not self.api_key:
-            raise RuntimeError("ELEVENLABS_API_KEY not found in .env")
-        
-        self.client = ElevenLabs(api_key=self.api_key)
+    def __init__(self, rate_limiter: Optional[TokenBucket] = None, cache: Optional[TTSCache] = None):
+        """
+        Args:
+            rate_limiter: Shared TokenBucket pacing TTS requests. Defaults to one
+                          built from ELEVENLABS_RATE_PER_SEC / ELEVENLABS_BURST
+                          (2 req/s, the same pace as the old fixed 0.5s sleep).
+            cache: On-disk TTS cache. Defaults to one built from TTS_CACHE_DIR /
+                   TTS_CACHE_MAX_MB (set TTS_CACHE_DIR="" to disable).
+        """
+        # Shared per-process SDK client (built from ELEVENLABS_API_KEY by core.clients)
+        self.client = clients.get("elevenlabs")
         
         # Best model for dubbing: high quality + emotion + Hindi support
         self.model_id = "eleven_multilingual_v2"
@@ -21,6 +44,12 @@ class ElevenLabsClient:
         # Cache for cloned voice IDs: {speaker_id: voice_id}
         self.voice_map = {}
 
+        # Rate limiting: the process-wide ElevenLabs bucket, shared by every client
+        self.rate_limiter = rate_limiter or bucket_from_env("ELEVENLABS", default_rate=2.0)
+
+        # Persistent cache so reruns and recurring phrases are not re-billed
+        self.cache = cache if cache is not None else cache_from_env()
+
     def get_best_voice_for_language(self, lang_code: str) -> str:
         """
         Returns an optimized voice ID for the given language code.
@@ -43,16 +72,8 @@ class ElevenLabsClient:
         # Fallback to Aria (Universal V3 optimized)
         return voice_map.get(lang_code, "9BWtsRjCglG6f8yz97TT")
 
-    def generate_dub(self, text: str, output_path: str, speaker_id: int = 0, language: str = "hi") -> str:
-        """
-        Generates audio for the given text using the new v1.0+ SDK syntax.
-        Automatically selects the best model and voice for the target language.
-        """
-        if not text:
-            return ""
-
-        print(f"  🗣️  ElevenLabs | Speaker {speaker_id} | Lang: {language} | {text[:30]}...")
-        
+    def _select_voice_and_model(self, speaker_id: int, language: str) -> Tuple[str, str]:
+        """Picks the (voice_id, model_id) used for a speaker in a language."""
         # Dynamic Voice Selection
         voice_id = self.get_best_voice_for_language(language)
         
@@ -74,34 +95,124 @@ class ElevenLabsClient:
         else:
              model_to_use = "eleven_multilingual_v2"
 
+        return voice_id, model_to_use
+
+    def generate_dub(self, text: str, output_path: str, speaker_id: int = 0, language: str = "hi") -> str:
+        """
+        Generates audio for the given text using the new v1.0+ SDK syntax.
+        Automatically selects the best model and voice for the target language.
+        """
+        if not text:
+            return ""
+
+        print(f"  🗣️  ElevenLabs | Speaker {speaker_id} | Lang: {language} | {text[:30]}...")
+        voice_id, model_to_use = self._select_voice_and_model(speaker_id, language)
+
+        cache_key = None
+        if self.cache:
+            cache_key = TTSCache.make_key(text, voice_id, model_to_use, VOICE_SETTINGS, OUTPUT_FORMAT)
+            if self.cache.get(cache_key, output_path):
+                TTS_CACHE_LOOKUPS.inc(result="hit")
+                print(f"  💾 TTS cache hit | Speaker {speaker_id} | {text[:30]}...")
+                return output_path
+            TTS_CACHE_LOOKUPS.inc(result="miss")
+
         try:
-            # Replaced self.client.generate() with self.client.text_to_speech.convert()
-            audio_generator = self.client.text_to_speech.convert(
-                text=text,
-                voice_id=voice_id,
-                model_id=model_to_use, 
-                output_format="mp3_44100_128",
-                voice_settings={
-                    "stability": 0.5,
-                    "similarity_boost": 0.75,
-                    "style": 0.5,
-                    "use_speaker_boost": True
-                }
-            )
-            
-            # Save to file
-            os.makedirs(os.path.dirname(output_path), exist_ok=True)
-            
-            with open(output_path, "wb") as f:
-                for chunk in audio_generator:
-                    if chunk:
-                        f.write(chunk)
-            
-            # Rate limiting delay (Safety for Free Tier)
-            time.sleep(0.5)
+            # Wait for a token so concurrent workers stay within the account quota
+            self.rate_limiter.acquire()
+
+            # Span covers the request and the streamed download
+            with span("elevenlabs.tts", model=model_to_use, language=language, chars=len(text)):
+                # Replaced self.client.generate() with self.client.text_to_speech.convert()
+                audio_generator = self.client.text_to_speech.convert(
+                    text=text,
+                    voice_id=voice_id,
+                    model_id=model_to_use, 
+                    output_format=OUTPUT_FORMAT,
+                    voice_settings=VOICE_SETTINGS
+                )
+                
+                # Save to file
+                os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                
+                with open(output_path, "wb") as f:
+                    for chunk in audio_generator:
+                        if chunk:
+                            f.write(chunk)
+
+            if cache_key:
+                self.cache.put(cache_key, output_path)
                 
             return output_path
             
         except Exception as e:
             print(f"  ❌ ElevenLabs Failed: {e}")
-            raise e
\ No newline at end of file
+            raise e
+
+    def synthesize_pcm(
+        self,
+        text: str,
+        speaker_id: int = 0,
+        language: str = "hi",
+        on_progress: Optional[Callable[[float], None]] = None
+    ) -> np.ndarray:
+        """
+        Synthesizes `text` as raw PCM straight into memory.
+
+        The response generator is consumed chunk by chunk into one growing
+        buffer; nothing touches disk and there is no MP3 encode/decode cycle.
+        `on_progress(seconds_received)` is called after every chunk, so
+        callers can start duration checks before the download finishes.
+
+        Returns float32 samples at PCM_SAMPLE_RATE, shaped (frames, 1).
+        """
+        if not text:
+            return np.zeros((0, 1), dtype=np.float32)
+
+        print(f"  🗣️  ElevenLabs PCM | Speaker {speaker_id} | Lang: {language} | {text[:30]}...")
+        voice_id, model_to_use = self._select_voice_and_model(speaker_id, language)
+
+        cache_key = None
+        if self.cache:
+            cache_key = TTSCache.make_key(text, voice_id, model_to_use, VOICE_SETTINGS, PCM_OUTPUT_FORMAT)
+            data = self.cache.get_bytes(cache_key)
+            if data is not None:
+                TTS_CACHE_LOOKUPS.inc(result="hit")
+                print(f"  💾 TTS cache hit | Speaker {speaker_id} | {text[:30]}...")
+                return _pcm_to_float(data)
+            TTS_CACHE_LOOKUPS.inc(result="miss")
+
+        try:
+            self.rate_limiter.acquire()
+
+            buffer = bytearray()
+            with span("elevenlabs.tts", model=model_to_use, language=language, chars=len(text), format="pcm"):
+                audio_generator = self.client.text_to_speech.convert(
+                    text=text,
+                    voice_id=voice_id,
+                    model_id=model_to_use,
+                    output_format=PCM_OUTPUT_FORMAT,
+                    voice_settings=VOICE_SETTINGS
+                )
+                for chunk in audio_generator:
+                    if chunk:
+                        buffer += chunk
+                        if on_progress:
+                            on_progress(len(buffer) // 2 / PCM_SAMPLE_RATE)
+
+            # Drop a dangling half sample if the stream ended mid-frame
+            del buffer[len(buffer) & ~1:]
+            if cache_key and buffer:
+                self.cache.put_bytes(cache_key, buffer)
+
+            return _pcm_to_float(buffer)
+
+        except Exception as e:
+            print(f"  ❌ ElevenLabs Failed: {e}")
+            raise e
+
+
+def _pcm_to_float(data: bytes) -> np.ndarray:
+    """Converts s16le mono bytes to float32 (frames, 1) in [-1, 1)."""
+    samples = np.frombuffer(data, dtype="<i2", count=len(data) // 2)
+    return (samples.astype(np.float32) * np.float32(1.0 / 32768.0)).reshape(-1, 1)
@@ -0,0 +1,236 @@
+import os
+import json
+import uuid
+import hashlib
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from fastapi import UploadFile
+from starlette.concurrency import run_in_threadpool
+
+# Large blocks keep the number of event-loop round trips low
+UPLOAD_BLOCK_SIZE = 8 * 1024 * 1024
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size cap."""
+
+
+def upload_max_bytes() -> int:
+    return int(float(os.getenv("UPLOAD_MAX_MB", "2048")) * 1024 * 1024)
+
+
+def _too_large_message(max_bytes: int) -> str:
+    return f"Upload exceeds the {max_bytes // (1024 * 1024)} MB limit."
+
+
+class UploadLimitMiddleware:
+    """
+    ASGI middleware that enforces the upload cap before the request body is
+    parsed (FastAPI spools the whole multipart form to disk before the
+    handler, and so ingest_upload, ever runs).
+
+    POSTs to `paths` with a Content-Length over `max_bytes` (default
+    UPLOAD_MAX_MB) are answered 413 without reading the body; a body sent
+    without a length is counted as it arrives and cut off at the cap.
+    """
+
+    def __init__(self, app, max_bytes: Optional[int] = None, paths: Iterable[str] = ("/process",)):
+        self.app = app
+        self.max_bytes = max_bytes if max_bytes is not None else upload_max_bytes()
+        self.paths = set(paths)
+
+    async def _reject(self, send):
+        body = json.dumps({"error": _too_large_message(self.max_bytes)}).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            await self._reject(send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Answer now; the app sees a disconnected client and its
+                    # own response is dropped
+                    rejected = True
+                    await self._reject(send)
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise
+
+
+def _write_and_hash(f, digest, block: bytes):
+    # hashlib releases the GIL on large buffers, so this overlaps well in the threadpool
+    digest.update(block)
+    f.write(block)
+
+
+def _finalize(tmp_path: str, final_path: str) -> bool:
+    """Moves a finished upload into place. Returns False if the content was already stored."""
+    if os.path.exists(final_path):
+        os.remove(tmp_path)
+        os.utime(final_path, None)
+        return False
+    os.replace(tmp_path, final_path)
+    return True
+
+
+def _enforce_store_cap(store_dir: str, max_store_bytes: int, keep: str, pinned: Iterable[str] = ()):
+    """
+    Deletes the least recently used stored inputs until the store fits its cap.
+    `keep` and the `pinned` paths (inputs of queued or running jobs) are never deleted.
+    """
+    protected = {os.path.abspath(path) for path in pinned if path}
+    protected.add(os.path.abspath(keep))
+    entries = []
+    total = 0
+    for name in os.listdir(store_dir):
+        path = os.path.join(store_dir, name)
+        if name.startswith(".") or not os.path.isfile(path):
+            continue
+        st = os.stat(path)
+        entries.append((st.st_mtime, st.st_size, path))
+        total += st.st_size
+
+    for _, size, path in sorted(entries):
+        if total <= max_store_bytes:
+            break
+        if os.path.abspath(path) in protected:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+async def ingest_upload(
+    upload: UploadFile,
+    store_dir: str = "input",
+    max_bytes: Optional[int] = None,
+    max_store_bytes: Optional[int] = None,
+    pinned: Optional[Callable[[], Iterable[str]]] = None
+) -> Dict[str, Any]:
+    """
+    Streams an upload to disk in large blocks without blocking the event loop,
+    hashing it on the way so no second read is needed.
+
+    The file is stored as `<store_dir>/<sha256><ext>`; an identical re-upload
+    is discarded and the existing copy reused. Raises UploadTooLargeError when
+    the upload exceeds `max_bytes` (default UPLOAD_MAX_MB); this is a last
+    check, UploadLimitMiddleware rejects oversized requests before they are
+    spooled.
+
+    When a new file pushes the store past `max_store_bytes` (default
+    INPUT_STORE_MAX_MB), the least recently used inputs are evicted, except
+    those returned by `pinned()` (e.g. JobManager.active_values("video_path")).
+
+    Returns:
+        Dict with path, sha256, size and original filename.
+    """
+    if max_bytes is None:
+        max_bytes = upload_max_bytes()
+    if max_store_bytes is None:
+        max_store_bytes = int(float(os.getenv("INPUT_STORE_MAX_MB", "20480")) * 1024 * 1024)
+
+    os.makedirs(store_dir, exist_ok=True)
+    ext = os.path.splitext(upload.filename or "")[1].lower() or ".mp4"
+    tmp_path = os.path.join(store_dir, f".upload-{uuid.uuid4().hex}.part")
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        f = await run_in_threadpool(open, tmp_path, "wb")
+        try:
+            while True:
+                block = await upload.read(UPLOAD_BLOCK_SIZE)
+                if not block:
+                    break
+                size += len(block)
+                if size > max_bytes:
+                    raise UploadTooLargeError(_too_large_message(max_bytes))
+                await run_in_threadpool(_write_and_hash, f, digest, block)
+        finally:
+            await run_in_threadpool(f.close)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    sha256 = digest.hexdigest()
+    final_path = os.path.join(store_dir, f"{sha256}{ext}")
+    is_new = await run_in_threadpool(_finalize, tmp_path, final_path)
+    if is_new:
+        await run_in_threadpool(_enforce_store_cap, store_dir, max_store_bytes, final_path,
+                                pinned() if pinned else ())
+
+    return {"path": final_path, "sha256": sha256, "size": size, "filename": upload.filename, "is_new": is_new}
+
+
+class ResultIndex:
+    """
+    Maps (input hash, source language, target language) to a finished result,
+    so a re-upload of the same video can be answered without reprocessing.
+    Entries whose output video no longer exists are ignored.
+    """
+
+    def __init__(self, path: str = "work/results_index.json"):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (ValueError, OSError) as e:
+                print(f"⚠️ Ignoring unreadable result index {path}: {e}")
+
+    @staticmethod
+    def make_key(input_hash: str, source_lang: str, target_lang: str) -> str:
+        return f"{input_hash}:{source_lang}:{target_lang}"
+
+    def get(self, input_hash: str, source_lang: str, target_lang: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self.entries.get(self.make_key(input_hash, source_lang, target_lang))
+        if entry and os.path.exists(entry["output_video_path"]):
+            return entry
+        return None
+
+    def put(self, input_hash: str, source_lang: str, target_lang: str, result: Dict[str, Any]):
+        with self._lock:
+            self.entries[self.make_key(input_hash, source_lang, target_lang)] = result
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
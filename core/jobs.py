@@ -0,0 +1,164 @@
+import os
+import time
+import uuid
+import queue
+import threading
+import traceback
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+from core.telemetry import trace_job, gauge
+
+QUEUE_DEPTH = gauge("dub_job_queue_depth", "Jobs waiting for a worker.")
+JOBS_BY_STATUS = gauge("dub_jobs", "Tracked jobs by status.")
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the job queue is at capacity (caller should retry later)."""
+
+
+class Job:
+    """State of one dubbing job as seen by the status endpoint."""
+
+    def __init__(self, params: Dict[str, Any]):
+        self.id = uuid.uuid4().hex
+        self.params = params
+        self.status = "queued"  # queued -> running -> done | failed
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "error": self.error,
+            "result": self.result,
+        }
+
+
+class JobManager:
+    """
+    Bounded job queue drained by a fixed pool of background worker threads.
+
+    `handler(**params)` runs on a worker and its return value becomes the job
+    result. `submit` never blocks: when `max_queue` jobs are already waiting it
+    raises QueueFullError so the web layer can push back on the client.
+    Finished jobs are kept (up to `max_history`) so their status stays queryable.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[..., Dict[str, Any]],
+        num_workers: int = 2,
+        max_queue: int = 8,
+        max_history: int = 200
+    ):
+        self.handler = handler
+        self.num_workers = num_workers
+        self.max_history = max_history
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=max_queue)
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._workers = []
+
+    def start(self):
+        """Starts the worker threads (idempotent)."""
+        if self._workers:
+            return
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"dub-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        print(f"🧵 Job workers started: {self.num_workers} workers, queue size {self._queue.maxsize}")
+
+    def shutdown(self, wait: bool = False):
+        """Asks workers to exit once the jobs already queued are finished."""
+        for _ in self._workers:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                break
+        if wait:
+            for worker in self._workers:
+                worker.join()
+        self._workers = []
+
+    def submit(self, **params) -> Job:
+        job = Job(params)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                self._jobs.pop(job.id, None)
+            raise QueueFullError("Server is busy: too many queued jobs. Please try again shortly.")
+        QUEUE_DEPTH.set(self._queue.qsize())
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active_values(self, param: str) -> List[Any]:
+        """`param` of every queued or running job (e.g. the input paths still needed)."""
+        with self._lock:
+            return [
+                job.params[param] for job in self._jobs.values()
+                if job.status in ("queued", "running") and job.params.get(param)
+            ]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        for status in ("queued", "running", "done", "failed"):
+            JOBS_BY_STATUS.set(counts.get(status, 0), status=status)
+        counts["queue_depth"] = self._queue.qsize()
+        QUEUE_DEPTH.set(counts["queue_depth"])
+        return counts
+
+    def _prune(self):
+        """Drops the oldest finished jobs beyond max_history."""
+        finished = [jid for jid, job in self._jobs.items() if job.status in ("done", "failed")]
+        for jid in finished[:max(0, len(self._jobs) - self.max_history)]:
+            self._jobs.pop(jid, None)
+
+    def _worker_loop(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            job.status = "running"
+            job.started_at = time.time()
+            QUEUE_DEPTH.set(self._queue.qsize())
+            print(f"▶️  Job {job.id} started")
+            try:
+                # Spans from this job are collected into its own trace
+                with trace_job(job.id):
+                    job.result = self.handler(**job.params)
+                job.status = "done"
+            except Exception as e:
+                traceback.print_exc()
+                job.error = str(e)
+                job.status = "failed"
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+            print(f"⏹️  Job {job.id} {job.status} in {job.finished_at - job.started_at:.1f}s")
+
+
+def manager_from_env(handler: Callable[..., Dict[str, Any]]) -> JobManager:
+    """Builds a JobManager from DUB_WORKERS / DUB_QUEUE_SIZE."""
+    return JobManager(
+        handler,
+        num_workers=int(os.getenv("DUB_WORKERS", "2")),
+        max_queue=int(os.getenv("DUB_QUEUE_SIZE", "8")),
+    )
@@ -0,0 +1,328 @@
+"""
+Duration / format probing without a process per call.
+
+WAV headers, MP3 frame headers, FLAC STREAMINFO, Ogg Opus pages and PCM
+artifact sidecars are parsed directly; only other containers fall back to
+ffprobe. Results are memoized by (path, mtime, size), so probing the same
+unchanged file again is a dictionary lookup.
+"""
+import os
+import json
+import mmap
+import struct
+import threading
+import subprocess
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from core.telemetry import span, counter
+from core.pcm_store import is_pcm, read_meta
+
+PROBES = counter("dub_media_probes_total", "Media probes, by method (cache, pcm, wav, mp3, flac, opus, ffprobe).")
+
+# MPEG audio tables, indexed [version][layer]; version 3 = MPEG-1, 2 = MPEG-2, 0 = MPEG-2.5
+_BITRATES_V1 = {
+    3: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),   # Layer I
+    2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),      # Layer II
+    1: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),       # Layer III
+}
+_BITRATES_V2 = {
+    3: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    1: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+CACHE_SIZE = 4096
+
+
+def _parse_wav(path: str) -> Optional[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        header = f.read(12)
+        if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+            return None
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size)
+                if len(fmt) < 16:
+                    return None
+                f.seek(chunk_size & 1, os.SEEK_CUR)
+            elif chunk_id == b"data":
+                if fmt is None:
+                    return None
+                _, channels, sample_rate, _, block_align, bits = struct.unpack("<HHIIHH", fmt[:16])
+                # Streamed WAVs (e.g. ffmpeg writing to a pipe) leave the size unset
+                available = os.path.getsize(path) - f.tell()
+                if chunk_size in (0, 0xFFFFFFFF) or chunk_size > available:
+                    chunk_size = available
+                if not sample_rate or not block_align:
+                    return None
+                return {
+                    "duration": (chunk_size // block_align) / float(sample_rate),
+                    "sample_rate": sample_rate,
+                    "channels": channels,
+                    "format": "wav",
+                }
+            else:
+                f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+
+
+def _mp3_frame(data, pos: int) -> Optional[Tuple[int, int, int, int]]:
+    """Parses the MPEG audio frame header at `pos`: (frame_bytes, samples, sample_rate, channels)."""
+    if pos + 4 > len(data):
+        return None
+    b0, b1, b2, b3 = data[pos], data[pos + 1], data[pos + 2], data[pos + 3]
+    if b0 != 0xFF or (b1 & 0xE0) != 0xE0:
+        return None
+    version = (b1 >> 3) & 3
+    layer = (b1 >> 1) & 3
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 3
+    if version == 1 or layer == 0 or bitrate_index in (0, 15) or rate_index == 3:
+        return None  # reserved values, or free-format bitrate we cannot size
+    bitrate = (_BITRATES_V1 if version == 3 else _BITRATES_V2)[layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 1
+    channels = 1 if (b3 >> 6) == 3 else 2
+
+    if layer == 3:  # Layer I
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate, channels
+    if layer == 1 and version != 3:  # Layer III, MPEG-2/2.5
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate, channels
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate, channels
+
+
+def _vbr_frame_count(data, pos: int, channels: int, version: int) -> Optional[int]:
+    """Total frame count from a Xing/Info or VBRI header in the first frame, if present."""
+    if version == 3:
+        side_info = 32 if channels == 2 else 17
+    else:
+        side_info = 17 if channels == 2 else 9
+    xing = pos + 4 + side_info
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = struct.unpack(">I", data[xing + 4:xing + 8])[0]
+        if flags & 1:
+            return struct.unpack(">I", data[xing + 8:xing + 12])[0]
+    vbri = pos + 36
+    if data[vbri:vbri + 4] == b"VBRI":
+        return struct.unpack(">I", data[vbri + 14:vbri + 18])[0]
+    return None
+
+
+def _parse_mp3(path: str) -> Optional[Dict[str, Any]]:
+    size = os.path.getsize(path)
+    if size < 4:
+        return None
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        pos = 0
+        # Skip an ID3v2 tag (syncsafe size)
+        if data[:3] == b"ID3" and size >= 10:
+            tag_size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+            pos = 10 + tag_size + (10 if data[5] & 0x10 else 0)
+        end = size - 128 if size >= 128 and data[size - 128:size - 125] == b"TAG" else size
+
+        # First frame: require the following header to line up too, so a stray
+        # 0xFF in leftover tag data is not mistaken for audio
+        first = None
+        while pos < end - 4:
+            pos = data.find(b"\xff", pos, end)
+            if pos < 0:
+                return None
+            frame = _mp3_frame(data, pos)
+            if frame and (pos + frame[0] >= end or _mp3_frame(data, pos + frame[0])):
+                first = frame
+                break
+            pos += 1
+        if first is None:
+            return None
+
+        _, samples_per_frame, sample_rate, channels = first
+        version = (data[pos + 1] >> 3) & 3
+        frames = _vbr_frame_count(data, pos, channels, version)
+        if frames is not None:
+            total_samples = frames * samples_per_frame
+        else:
+            # Frame scan: hop from header to header, resyncing past garbage
+            total_samples = 0
+            while pos < end:
+                frame = _mp3_frame(data, pos)
+                if frame is None:
+                    next_sync = data.find(b"\xff", pos + 1, end)
+                    if next_sync < 0:
+                        break
+                    pos = next_sync
+                    continue
+                total_samples += frame[1]
+                pos += frame[0]
+
+    return {
+        "duration": total_samples / float(sample_rate),
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "format": "mp3",
+    }
+
+
+def flac_info(header: bytes) -> Optional[Dict[str, Any]]:
+    """Duration etc. from the STREAMINFO block at the start of a FLAC stream (first 42 bytes)."""
+    # "fLaC", a 4-byte block header, then STREAMINFO; sample rate, channels,
+    # bit depth and the 36-bit sample count are packed from byte 18 on
+    if len(header) < 42 or header[:4] != b"fLaC" or header[4] & 0x7F != 0:
+        return None
+    sample_rate = (header[18] << 12) | (header[19] << 4) | (header[20] >> 4)
+    channels = ((header[20] >> 1) & 7) + 1
+    total_samples = ((header[21] & 0x0F) << 32) | struct.unpack(">I", header[22:26])[0]
+    if not sample_rate or not total_samples:
+        return None  # streamed encoders may leave the count unset
+    return {
+        "duration": total_samples / float(sample_rate),
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "format": "flac",
+    }
+
+
+def opus_info(head: bytes, tail: bytes) -> Optional[Dict[str, Any]]:
+    """
+    Duration etc. of an Ogg Opus stream from its first page (`head`, holding
+    OpusHead) and its last bytes (`tail`, holding the final page's granule).
+    """
+    if head[:4] != b"OggS":
+        return None
+    opus_head = head.find(b"OpusHead")
+    last_page = tail.rfind(b"OggS")
+    if opus_head < 0 or last_page < 0 or len(tail) < last_page + 14 or len(head) < opus_head + 16:
+        return None
+    channels = head[opus_head + 9]
+    pre_skip = struct.unpack("<H", head[opus_head + 10:opus_head + 12])[0]
+    input_rate = struct.unpack("<I", head[opus_head + 12:opus_head + 16])[0]
+    # Granule positions count 48 kHz samples regardless of the input rate
+    granule = struct.unpack("<q", tail[last_page + 6:last_page + 14])[0]
+    return {
+        "duration": max(0, granule - pre_skip) / 48000.0,
+        "sample_rate": input_rate or 48000,
+        "channels": channels,
+        "format": "opus",
+    }
+
+
+def _parse_flac(path: str) -> Optional[Dict[str, Any]]:
+    with open(path, "rb") as f:
+        return flac_info(f.read(42))
+
+
+def _parse_opus(path: str) -> Optional[Dict[str, Any]]:
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(4096)
+        # An Ogg page is at most ~64 KiB, so the last one starts in this window
+        f.seek(max(0, size - 65536))
+        tail = f.read()
+    return opus_info(head, tail)
+
+
+def _parse_pcm(path: str) -> Dict[str, Any]:
+    meta = read_meta(path)
+    return {
+        "duration": meta["frames"] / float(meta["sample_rate"]),
+        "sample_rate": meta["sample_rate"],
+        "channels": meta["channels"],
+        "format": "pcm",
+    }
+
+
+def _ffprobe(path: str) -> Optional[Dict[str, Any]]:
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-select_streams", "a:0",
+        "-show_entries", "format=duration,format_name:stream=sample_rate,channels",
+        "-of", "json",
+        path
+    ]
+    with span("ffprobe.duration"):
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    try:
+        info = json.loads(result.stdout)
+        stream = (info.get("streams") or [{}])[0]
+        return {
+            "duration": float(info["format"]["duration"]),
+            "sample_rate": int(stream.get("sample_rate", 0)),
+            "channels": int(stream.get("channels", 0)),
+            "format": info["format"].get("format_name", ""),
+        }
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+_PARSERS = {".wav": _parse_wav, ".mp3": _parse_mp3, ".flac": _parse_flac, ".opus": _parse_opus}
+
+
+class MediaProbe:
+    """
+    Memoizing prober. Entries are keyed by (path, mtime, size), so a file
+    rewritten in place is probed afresh; the cache holds at most `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = CACHE_SIZE):
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[Tuple[str, int, int], Optional[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def probe(self, path: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns {"duration", "sample_rate", "channels", "format"} for an audio
+        file, or None if it cannot be read.
+        """
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        key = (os.path.abspath(path), st.st_mtime_ns, st.st_size)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                PROBES.inc(method="cache")
+                return self._cache[key]
+
+        info, method = None, "ffprobe"
+        try:
+            if is_pcm(path):
+                info, method = _parse_pcm(path), "pcm"
+            else:
+                parser = _PARSERS.get(os.path.splitext(path)[1].lower())
+                if parser:
+                    info, method = parser(path), parser.__name__[len("_parse_"):]
+        except (OSError, ValueError, KeyError, struct.error):
+            info = None
+        if info is None:
+            info, method = _ffprobe(path), "ffprobe"
+        PROBES.inc(method=method)
+
+        with self._lock:
+            self._cache[key] = info
+            while len(self._cache) > self.max_entries:
+                self._cache.popitem(last=False)
+        return info
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+
+_probe = MediaProbe()
+
+
+def probe(path: str) -> Optional[Dict[str, Any]]:
+    """Probes `path` through the process-wide cache (see MediaProbe.probe)."""
+    return _probe.probe(path)
+
+
+def get_audio_duration(file_path: str) -> float:
+    """Returns the duration of an audio file in seconds (0.0 if unreadable)."""
+    info = probe(file_path)
+    return info["duration"] if info else 0.0
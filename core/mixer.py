@@ -0,0 +1,210 @@
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any
+
+import numpy as np
+
+from core.telemetry import span, bind
+from core.pcm_store import is_pcm, open_pcm, ffmpeg_input_args
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+
+# Gains used by the original ffmpeg graph (volume=0.4 / volume=2.5)
+BACKGROUND_GAIN = 0.4
+DIALOGUE_GAIN = 2.5
+
+# Samples written to the encoder per pipe write (~1.5s of stereo audio)
+ENCODE_BLOCK_FRAMES = 65536
+
+# The mix timeline is 32-bit fixed point with this many steps per unit
+# (float32 resolution at full scale, headroom up to +/-128): integer sums do
+# not depend on the order clips are added in
+MIX_SCALE = 2 ** 24
+
+
+def decode_audio(path: str, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS) -> np.ndarray:
+    """
+    Decodes any ffmpeg-readable file to a float32 array of shape (frames, channels).
+    """
+    cmd = [
+        "ffmpeg", "-v", "error",
+        *ffmpeg_input_args(path),
+        "-f", "f32le",
+        "-acodec", "pcm_f32le",
+        "-ac", str(channels),
+        "-ar", str(sample_rate),
+        "-"
+    ]
+    with span("ffmpeg.decode"):
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise RuntimeError(f"Failed to decode {path}: {result.stderr.decode(errors='ignore').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, channels)
+
+
+def load_audio(path: str, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS) -> np.ndarray:
+    """
+    Like decode_audio, but a float32 PCM artifact in the requested layout is
+    returned as its read-only memory map instead of being decoded.
+    """
+    if is_pcm(path):
+        artifact = open_pcm(path)
+        if (artifact.sample_rate == sample_rate and artifact.channels == channels
+                and artifact.samples.dtype == np.float32):
+            return artifact.samples
+    return decode_audio(path, sample_rate, channels)
+
+
+def encode_aac(samples: np.ndarray, output_path: str, sample_rate: int = SAMPLE_RATE, bitrate: str = "192k",
+               scale: float = 1.0):
+    """
+    Encodes a (frames, channels) array to AAC in a single ffmpeg pass,
+    streaming the buffer through stdin block by block. Samples are divided
+    by `scale` as each block is converted to float32 (fixed-point input).
+    """
+    channels = samples.shape[1]
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "f32le",
+        "-ar", str(sample_rate),
+        "-ac", str(channels),
+        "-i", "-",
+        "-c:a", "aac",
+        "-b:a", bitrate,
+        output_path
+    ]
+    with span("ffmpeg.encode_aac", frames=len(samples)):
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        try:
+            for start in range(0, len(samples), ENCODE_BLOCK_FRAMES):
+                block = np.ascontiguousarray(samples[start:start + ENCODE_BLOCK_FRAMES], dtype=np.float32)
+                if scale != 1.0:
+                    block *= np.float32(1.0 / scale)
+                proc.stdin.write(block.tobytes())
+            proc.stdin.close()
+        except BrokenPipeError:
+            pass
+        stderr = proc.stderr.read()
+        returncode = proc.wait()
+    if returncode != 0:
+        raise RuntimeError(f"AAC encode failed: {stderr.decode(errors='ignore').strip()}")
+
+
+def _clip_samples(clip: Dict[str, Any]) -> np.ndarray:
+    if clip.get("samples") is not None:
+        return clip["samples"]
+    return load_audio(clip["path"])
+
+
+class TimelineMixer:
+    """
+    Incremental in-process mix: the background (times its gain) becomes the
+    timeline, and every clip is added into it at its start sample the moment
+    `add()` receives it, so the caller can drop the clip right away. Output
+    length follows the background (same as amix duration=first).
+    Thread-safe; `finish()` encodes to AAC in one pass.
+
+    The timeline is int32 fixed point (see MIX_SCALE), the same size as
+    float32: each clip is rounded once, and because integer addition is
+    exact the mix is bit-identical whatever order concurrent workers add
+    overlapping clips in.
+    """
+
+    def __init__(self, background_audio_path: str, background_gain: float = BACKGROUND_GAIN,
+                 dialogue_gain: float = DIALOGUE_GAIN):
+        # Gain is applied while copying out of the (possibly memory-mapped)
+        # source, a block at a time to keep temporaries small
+        background = load_audio(background_audio_path)
+        self.timeline = np.empty(background.shape, dtype=np.int32)
+        gain = np.float32(background_gain * MIX_SCALE)
+        step = ENCODE_BLOCK_FRAMES * 16
+        for start in range(0, len(background), step):
+            block = np.multiply(background[start:start + step], gain, dtype=np.float32)
+            self.timeline[start:start + step] = np.rint(block)
+        self.dialogue_gain = np.float32(dialogue_gain * MIX_SCALE)
+        self.clips = 0
+        self._lock = threading.Lock()
+
+    def add(self, clip: Dict[str, Any]):
+        """Adds one clip ({"path", "start"}, or {"samples", "start"} at SAMPLE_RATE;
+        mono clips shaped (frames, 1) are spread to both channels)."""
+        samples = _clip_samples(clip)
+        start = int(round(clip["start"] * SAMPLE_RATE))
+        total_frames = len(self.timeline)
+        if start >= total_frames or len(samples) == 0:
+            return
+        end = min(start + len(samples), total_frames)
+        scaled = np.rint(np.multiply(samples[:end - start], self.dialogue_gain, dtype=np.float32)).astype(np.int32)
+        with self._lock:
+            self.timeline[start:end] += scaled
+            self.clips += 1
+
+    def finish(self, output_path: str) -> str:
+        with span("mixer.encode", clips=self.clips):
+            encode_aac(self.timeline, output_path, scale=MIX_SCALE)
+        return output_path
+
+
+def mix_segments(
+    background_audio_path: str,
+    clips: List[Dict[str, Any]],
+    output_path: str,
+    background_gain: float = BACKGROUND_GAIN,
+    dialogue_gain: float = DIALOGUE_GAIN,
+    max_workers: int = 8
+) -> str:
+    """
+    Mixes a list of dialogue clips over the background track in-process
+    (see TimelineMixer). Clips given by path are decoded exactly once, a
+    few at a time, so memory stays at one timeline buffer plus the clips
+    being placed; clips given as samples are already held by the caller.
+    """
+    mixer = TimelineMixer(background_audio_path, background_gain, dialogue_gain)
+    # Decoding is subprocess-bound, so threads overlap well here
+    window = max_workers * 2
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for batch_start in range(0, len(clips), window):
+            batch = clips[batch_start:batch_start + window]
+            for future in [executor.submit(bind(mixer.add), clip) for clip in batch]:
+                future.result()
+    return mixer.finish(output_path)
+
+
+def mix_with_filter_graph(background_audio_path: str, clips: List[Dict[str, Any]], output_path: str) -> str:
+    """
+    Legacy mixer: one ffmpeg process with an input and an adelay chain per clip,
+    summed with amix. Kept for benchmarking against mix_segments.
+    """
+    cmd = ["ffmpeg", "-y", *ffmpeg_input_args(background_audio_path)]
+    for clip in clips:
+        cmd.extend(["-i", clip["path"]])
+
+    filter_complex = []
+    dialogue_inputs = []
+
+    filter_complex.append("[0:a]aformat=sample_rates=44100:channel_layouts=stereo[bg]")
+
+    for i, clip in enumerate(clips):
+        delay_ms = int(clip["start"] * 1000)
+        chain = f"[{i+1}:a]aformat=sample_rates=44100:channel_layouts=stereo,adelay={delay_ms}|{delay_ms}[tts{i}]"
+        filter_complex.append(chain)
+        dialogue_inputs.append(f"[tts{i}]")
+
+    mix_str = "".join(dialogue_inputs)
+    # normalize=0 prevents amix from dividing volume by number of inputs
+    filter_complex.append(f"{mix_str}amix=inputs={len(clips)}:dropout_transition=0:normalize=0[dialogue]")
+    filter_complex.append(f"[bg]volume={BACKGROUND_GAIN}[bg_quiet]")
+    filter_complex.append(f"[dialogue]volume={DIALOGUE_GAIN}[dialogue_loud]")
+    filter_complex.append("[bg_quiet][dialogue_loud]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[out]")
+
+    cmd.extend([
+        "-filter_complex", ";".join(filter_complex),
+        "-map", "[out]",
+        "-c:a", "aac",
+        "-b:a", "192k",
+        output_path
+    ])
+    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return output_path
@@ -0,0 +1,129 @@
+"""
+Lossless PCM artifacts shared between pipeline stages.
+
+An artifact is a raw little-endian sample file (`<name>.f32` for float32,
+`<name>.s16` for int16, interleaved, shape frames x channels) plus a JSON
+sidecar (`<name>.f32.json`) holding sample rate, channel count, frame count
+and dtype. Stages open artifacts as read-only memory maps, so slicing a
+time range is zero-copy and nothing is re-decoded or re-encoded between
+extraction, separation, ASR chunking and mixing.
+"""
+import os
+import json
+import subprocess
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from core.telemetry import span
+
+DTYPES = {".f32": np.dtype("<f4"), ".s16": np.dtype("<i2")}
+FFMPEG_FORMATS = {".f32": "f32le", ".s16": "s16le"}
+
+
+def sidecar_path(path: str) -> str:
+    return f"{path}.json"
+
+
+def is_pcm(path: str) -> bool:
+    """True for a raw PCM artifact with its metadata sidecar."""
+    return os.path.splitext(path)[1] in DTYPES and os.path.exists(sidecar_path(path))
+
+
+def read_meta(path: str) -> Dict:
+    with open(sidecar_path(path), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_meta(path: str, sample_rate: int, channels: int, frames: int):
+    ext = os.path.splitext(path)[1]
+    meta = {
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "frames": frames,
+        "dtype": DTYPES[ext].str,
+    }
+    with open(sidecar_path(path), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+class PCMArtifact:
+    """Read-only memory-mapped view of a PCM artifact."""
+
+    def __init__(self, path: str):
+        self.path = path
+        meta = read_meta(path)
+        self.sample_rate = int(meta["sample_rate"])
+        self.channels = int(meta["channels"])
+        self.frames = int(meta["frames"])
+        if self.frames:
+            self.samples = np.memmap(path, dtype=np.dtype(meta["dtype"]), mode="r",
+                                     shape=(self.frames, self.channels))
+        else:
+            self.samples = np.zeros((0, self.channels), dtype=np.dtype(meta["dtype"]))
+
+    @property
+    def duration(self) -> float:
+        return self.frames / float(self.sample_rate)
+
+    def slice_seconds(self, start: float, end: Optional[float] = None) -> np.ndarray:
+        """Zero-copy view of [start, end) seconds."""
+        lo = max(0, int(round(start * self.sample_rate)))
+        hi = self.frames if end is None else min(self.frames, int(round(end * self.sample_rate)))
+        return self.samples[lo:hi]
+
+
+def open_pcm(path: str) -> PCMArtifact:
+    return PCMArtifact(path)
+
+
+def write_pcm(path: str, samples: np.ndarray, sample_rate: int) -> str:
+    """Writes a (frames, channels) array as a PCM artifact. Returns `path`."""
+    ext = os.path.splitext(path)[1]
+    if ext not in DTYPES:
+        raise ValueError(f"PCM artifact path must end with one of {list(DTYPES)}: {path}")
+    if samples.ndim == 1:
+        samples = samples[:, None]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    np.ascontiguousarray(samples, dtype=DTYPES[ext]).tofile(path)
+    _write_meta(path, sample_rate, samples.shape[1], samples.shape[0])
+    return path
+
+
+def decode_to_pcm(source_path: str, path: str, sample_rate: int = 44100, channels: int = 2) -> str:
+    """
+    Decodes any ffmpeg-readable file (or another PCM artifact) straight into a
+    PCM artifact (one pass, streamed to disk, never held in memory). Returns `path`.
+    """
+    ext = os.path.splitext(path)[1]
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    cmd = [
+        "ffmpeg", "-y", "-v", "error",
+        *ffmpeg_input_args(source_path),
+        "-vn",
+        "-ac", str(channels),
+        "-ar", str(sample_rate),
+        "-f", FFMPEG_FORMATS[ext],
+        path
+    ]
+    with span("ffmpeg.decode_to_pcm"):
+        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    if not os.path.exists(path):
+        raise RuntimeError(f"Failed to decode {source_path} to PCM")
+    frames = os.path.getsize(path) // (DTYPES[ext].itemsize * channels)
+    _write_meta(path, sample_rate, channels, frames)
+    return path
+
+
+def ffmpeg_input_args(path: str) -> List[str]:
+    """ffmpeg input arguments for a path, describing the raw format for PCM artifacts."""
+    if is_pcm(path):
+        meta = read_meta(path)
+        ext = os.path.splitext(path)[1]
+        return [
+            "-f", FFMPEG_FORMATS[ext],
+            "-ar", str(meta["sample_rate"]),
+            "-ac", str(meta["channels"]),
+            "-i", path
+        ]
+    return ["-i", path]
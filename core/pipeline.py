@@ -1,107 +1,487 @@
 import time
 import os
-import shutil
-from typing import Dict, Any, List
+import subprocess
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional
 
 # Core modules (assuming these exist from previous Context)
 from core.audioextractor import extract_audio
-from core.separator import separate_audio
+from core.separator import separate_audio, asr_view_path
 from core.transcribe import transcribe_audio
+from core.coalesce import coalesce_segments, coalesce_config
 from core.translator import Translator, SUPPORTED_LANGUAGES
 from core.dubbing import generate_dubbed_audio
+from core.streaming import run_streaming_dub
+from core.checkpoint import StageManifest, file_sha256, save_json, load_json
+from core.telemetry import span, bind
 
-def process_video(video_path: str, source_lang: str, target_lang: str) -> Dict[str, Any]:
+# ISO 639-2 codes for audio track language tags
+ISO_639_2 = {
+    "en": "eng", "hi": "hin", "ta": "tam", "te": "tel", "kn": "kan", "ml": "mal",
+    "mr": "mar", "bn": "ben", "gu": "guj", "pa": "pan", "or": "ori", "as": "asm",
+}
+
+
+class _StageRunner:
     """
-    Orchestrates the video dubbing process with timing.
-    
-    Returns:
-        Dict containing:
-        - output_video_path (str)
-        - transcription (str or list)
-        - timings (dict)
+    Checkpoint bookkeeping for one chain of stages.
+
+    Once a stage is invalid, every later stage in the chain is recomputed.
+    `branch()` starts a dependent chain (e.g. one target language) that
+    inherits the current resume state but tracks its own stages and timings.
     """
-    timings = {}
-    
-    # Generate paths
-    video_basename = os.path.splitext(os.path.basename(video_path))[0]
-    
-    # Ensure directories exist
-    os.makedirs("audio", exist_ok=True)
-    os.makedirs("output", exist_ok=True)
-    
-    original_audio = f"audio/{video_basename}_original.wav"
-    dubbed_audio = f"audio/{video_basename}_dubbed_{target_lang}.aac"
-    output_video = f"output/{video_basename}_{target_lang}.mp4"
-    
-    start_total = time.time()
-    
+
+    def __init__(self, manifest: StageManifest, resuming: bool = True):
+        self.manifest = manifest
+        self.resuming = resuming
+        self.resumed_stages: List[str] = []
+        self.timings: Dict[str, float] = {}
+
+    def can_skip(self, stage: str, params: Dict[str, Any]) -> bool:
+        self.resuming = self.resuming and self.manifest.is_valid(stage, params)
+        if self.resuming:
+            print(f"⏩ Skipping {stage} (checkpoint valid)")
+            self.resumed_stages.append(stage)
+            self.timings[stage.split(":")[0]] = 0.0
+        return self.resuming
+
+    def branch(self) -> "_StageRunner":
+        return _StageRunner(self.manifest, self.resuming)
+
+
+def _prepare_job(video_path: str, work_root: str, input_hash: Optional[str], timings: Dict[str, float]):
+    # Key all intermediate state by input content, not filename
+    if not input_hash:
+        t0 = time.time()
+        input_hash = file_sha256(video_path)
+        timings["hash_input"] = time.time() - t0
+    job_dir = os.path.join(work_root, input_hash[:16])
+    print(f"--- Job dir: {job_dir} ---")
+    return input_hash, job_dir
+
+
+def _separate_stages(runner: _StageRunner, video_path: str, job_dir: str, input_hash: str) -> Dict[str, str]:
+    """STEPS 1-2: extraction and separation. Returns the audio artifact paths."""
+    manifest = runner.manifest
+    # Audio intermediates are lossless float32 PCM artifacts (core.pcm_store)
+    original_audio = os.path.join(job_dir, "original.f32")
+
     # STEP 1: Extract Audio
     print(f"--- Step 1: Extracting Audio ---")
-    t0 = time.time()
-    extract_audio(video_path, original_audio)
-    timings["extract_audio"] = time.time() - t0
-    
+    params = {"input": input_hash, "format": "pcm_f32"}
+    if not runner.can_skip("extract_audio", params):
+        t0 = time.time()
+        with span("stage.extract_audio"):
+            extract_audio(video_path, original_audio)
+        manifest.record("extract_audio", params, {"audio": original_audio})
+        runner.timings["extract_audio"] = time.time() - t0
+
     # STEP 2: Separate Audio
     print(f"--- Step 2: Separating Audio ---")
-    # We allow this to run but maybe separation isn't strictly needing independent timing 
-    # if it's not a primary "blocking" user step? But let's track it implicitly or explicitly.
-    # The original main.py separated vocals/bg. Let's include that in "extract_audio" or separate.
-    # I'll add a 'separation' timing for clarity if desired, or bundle it.
-    # The separator.py uses demucs.
-    t0 = time.time()
-    vocals_path, background_path = separate_audio(original_audio)
-    timings["separation"] = time.time() - t0
-    
-    # STEP 3: Transcribe
+    params = {"input": input_hash, "model": "htdemucs", "two_stems": "vocals", "format": "pcm_f32"}
+    if runner.can_skip("separation", params):
+        stems = manifest.artifacts("separation")
+    else:
+        t0 = time.time()
+        with span("stage.separation"):
+            vocals_path, background_path = separate_audio(
+                original_audio, output_dir=os.path.join(job_dir, "separated"), force=True
+            )
+        stems = {"vocals": vocals_path, "background": background_path, "vocals_asr": asr_view_path(vocals_path)}
+        manifest.record("separation", params, stems)
+        runner.timings["separation"] = time.time() - t0
+    return stems
+
+
+def _transcribe_params(input_hash: str, source_lang: str) -> Dict[str, Any]:
+    return {"input": input_hash, "source_lang": source_lang}
+
+
+def _translate_params(input_hash: str, source_lang: str, target_lang: str) -> Dict[str, Any]:
+    return {
+        "input": input_hash,
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        "model": os.getenv("GEMINI_MODEL", "gemini-2.5-flash"),
+        # Translation runs on the coalesced segments
+        "coalesce": coalesce_config(),
+    }
+
+
+def _output_params(input_hash: str, target_lang: str, **outputs: str) -> Dict[str, Any]:
+    # Output paths are part of the params: the same content uploaded under
+    # another name (or work root) must not reuse a checkpoint for a file it
+    # never wrote
+    return {"input": input_hash, "target_lang": target_lang, **outputs}
+
+
+def _record_transcribe(manifest: StageManifest, job_dir: str, params: Dict[str, Any], utterances: List[Dict]):
+    utterances_json = os.path.join(job_dir, "utterances.json")
+    save_json(utterances_json, utterances)
+    # An empty transcript usually means ASR failed; don't checkpoint it
+    if utterances:
+        manifest.record("transcribe", params, {"utterances": utterances_json})
+
+
+def _record_translate(manifest: StageManifest, job_dir: str, target_lang: str, params: Dict[str, Any],
+                      translated_segments: List[Dict]):
+    translated_json = os.path.join(job_dir, f"translated_{target_lang}.json")
+    save_json(translated_json, translated_segments)
+    # Only checkpoint when every segment came back translated
+    if translated_segments and all("emotion" in seg for seg in translated_segments):
+        manifest.record(f"translate:{target_lang}", params, {"segments": translated_json})
+
+
+def _record_synthesize(manifest: StageManifest, target_lang: str, params: Dict[str, Any],
+                       result_audio: str, dubbed_audio: str):
+    if result_audio == dubbed_audio and os.path.exists(dubbed_audio):
+        manifest.record(f"synthesize:{target_lang}", params, {"audio": dubbed_audio})
+
+
+def _transcribe_stage(runner: _StageRunner, job_dir: str, input_hash: str, source_lang: str,
+                      asr_vocals_path: str) -> List[Dict]:
+    """
+    STEP 3: transcription (serial mode). The checkpoint keeps the raw ASR
+    segments; the coalesced ones (core.coalesce) are returned.
+    """
     print(f"--- Step 3: Transcribing ---")
+    params = _transcribe_params(input_hash, source_lang)
+    if runner.can_skip("transcribe", params):
+        return coalesce_segments(load_json(os.path.join(job_dir, "utterances.json")))
     t0 = time.time()
-    utterances = transcribe_audio(vocals_path, source_language=source_lang)
-    timings["transcribe"] = time.time() - t0
-    
-    # Prepare transcription text for return
+    with span("stage.transcribe", source_lang=source_lang):
+        utterances = transcribe_audio(asr_vocals_path, source_language=source_lang)
+    _record_transcribe(runner.manifest, job_dir, params, utterances)
+    runner.timings["transcribe"] = time.time() - t0
+    return coalesce_segments(utterances)
+
+
+def _format_transcript(utterances: List[Dict]) -> str:
     full_transcript = []
     for utt in utterances:
         full_transcript.append(f"[Speaker {utt.get('speaker', 0)}] {utt['transcript']}")
-    transcription_text = "\n".join(full_transcript)
+    return "\n".join(full_transcript)
+
+
+def _dub_stages(
+    runner: _StageRunner,
+    video_path: str,
+    job_dir: str,
+    input_hash: str,
+    source_lang: str,
+    target_lang: str,
+    utterances: List[Dict],
+    background_path: str,
+    translated_segments: Optional[List[Dict]] = None
+) -> Dict[str, str]:
+    """
+    STEPS 4-6 for one target language: translate, synthesize & mix, merge.
+    Pass `translated_segments` when translation and synthesis already ran
+    (streaming mode) to go straight to the merge.
+    """
+    # Another job on this input may be dubbing the same language: take turns
+    with runner.manifest.locked(target_lang):
+        return _dub_stages_locked(runner, video_path, job_dir, input_hash, source_lang, target_lang,
+                                  utterances, background_path, translated_segments)
+
+
+def _dub_stages_locked(
+    runner: _StageRunner,
+    video_path: str,
+    job_dir: str,
+    input_hash: str,
+    source_lang: str,
+    target_lang: str,
+    utterances: List[Dict],
+    background_path: str,
+    translated_segments: Optional[List[Dict]]
+) -> Dict[str, str]:
+    manifest = runner.manifest
+    video_basename = os.path.splitext(os.path.basename(video_path))[0]
+    translated_json = os.path.join(job_dir, f"translated_{target_lang}.json")
+    dubbed_audio = os.path.join(job_dir, f"dubbed_{target_lang}.aac")
+    output_video = f"output/{video_basename}_{input_hash[:8]}_{target_lang}.mp4"
+
+    if translated_segments is None:
+        # STEP 4: Translate
+        print(f"--- Step 4: Translating ({target_lang}) ---")
+        params = _translate_params(input_hash, source_lang, target_lang)
+        if runner.can_skip(f"translate:{target_lang}", params):
+            translated_segments = load_json(translated_json)
+        else:
+            t0 = time.time()
+            with span("stage.translate", target_lang=target_lang, segments=len(utterances)):
+                translator = Translator(target_language=target_lang)
+                translated_segments = translator.translate_segments(utterances)
+            _record_translate(manifest, job_dir, target_lang, params, translated_segments)
+            runner.timings["translate"] = time.time() - t0
+
+        # STEP 5: Synthesize & Mix
+        print(f"--- Step 5: Synthesizing & Mixing ({target_lang}) ---")
+        params = _output_params(input_hash, target_lang, audio=dubbed_audio)
+        if not runner.can_skip(f"synthesize:{target_lang}", params):
+            t0 = time.time()
+            with span("stage.synthesize", target_lang=target_lang, segments=len(translated_segments)):
+                result_audio = generate_dubbed_audio(
+                    background_path, translated_segments, dubbed_audio, language=target_lang
+                )
+            _record_synthesize(manifest, target_lang, params, result_audio, dubbed_audio)
+            runner.timings["synthesize"] = time.time() - t0
 
-    # STEP 4: Translate
-    print(f"--- Step 4: Translating ---")
-    t0 = time.time()
-    # Translator expects target_language in constructor or method?
-    # Checking previous main.py: Translator(target_language=TARGET_LANGUAGE)
-    translator = Translator(target_language=target_lang)
-    translated_segments = translator.translate_segments(utterances)
-    timings["translate"] = time.time() - t0
-    
-    # STEP 5: Synthesize & Mix
-    print(f"--- Step 5: Synthesizing & Mixing ---")
-    t0 = time.time()
-    # dubbing.py: generate_dubbed_audio(background_path, segments, output_path, language=...)
-    generate_dubbed_audio(background_path, translated_segments, dubbed_audio, language=target_lang)
-    timings["synthesize"] = time.time() - t0
-    
     # STEP 6: Merge Video
-    print(f"--- Step 6: Merging Video ---")
-    t0 = time.time()
-    import subprocess
-    cmd = [
-        "ffmpeg", "-y",
-        "-i", video_path,
-        "-i", dubbed_audio,
-        "-map", "0:v:0",
-        "-map", "1:a:0",
-        "-c:v", "copy",
-        "-c:a", "copy",
-        "-shortest",
-        output_video
-    ]
-    subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    timings["merge_video"] = time.time() - t0
-    
+    print(f"--- Step 6: Merging Video ({target_lang}) ---")
+    params = _output_params(input_hash, target_lang, audio=dubbed_audio, video=output_video)
+    if not runner.can_skip(f"merge_video:{target_lang}", params):
+        t0 = time.time()
+        cmd = [
+            "ffmpeg", "-y",
+            "-i", video_path,
+            "-i", dubbed_audio,
+            "-map", "0:v:0",
+            "-map", "1:a:0",
+            "-c:v", "copy",
+            "-c:a", "copy",
+            "-shortest",
+            output_video
+        ]
+        with span("stage.merge_video"), span("ffmpeg.merge_video"):
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if os.path.exists(output_video):
+            manifest.record(f"merge_video:{target_lang}", params, {"video": output_video})
+        runner.timings["merge_video"] = time.time() - t0
+
+    return {"dubbed_audio": dubbed_audio, "output_video_path": output_video}
+
+
+def process_video(
+    video_path: str,
+    source_lang: str,
+    target_lang: str,
+    work_root: str = "work",
+    input_hash: Optional[str] = None,
+    streaming: Optional[bool] = None
+) -> Dict[str, Any]:
+    """
+    Orchestrates the video dubbing process with timing.
+
+    Every stage is checkpointed in a manifest under `work/<input hash>/`. On a
+    rerun, stages whose parameters and artifacts are still valid are skipped,
+    and work resumes from the first invalid stage (everything after it is
+    recomputed). This avoids repeating ASR, LLM and TTS calls after a
+    late-stage failure. Pass `input_hash` when the caller already hashed the
+    file (e.g. during upload) to skip re-reading it.
+
+    With `streaming` (default: DUB_STREAMING=1), transcription, translation
+    and synthesis run as one overlapped stage (see core.streaming) whenever
+    transcription has to be redone; each of the three is still checkpointed
+    separately, so a later rerun resumes the same way in either mode.
+
+    Returns:
+        Dict containing:
+        - output_video_path (str)
+        - transcription (str or list)
+        - timings (dict)
+        - resumed_stages (list of skipped stage names)
+        - input_hash (str)
+        - utilization (per-stage report, streaming mode only)
+    """
+    if streaming is None:
+        streaming = os.getenv("DUB_STREAMING", "0") == "1"
+
+    # Ensure directories exist
+    os.makedirs("output", exist_ok=True)
+
+    start_total = time.time()
+    timings: Dict[str, float] = {}
+    input_hash, job_dir = _prepare_job(video_path, work_root, input_hash, timings)
+    runner = _StageRunner(StageManifest(job_dir))
+    runner.timings = timings
+
+    # Jobs on the same input share the job dir: one at a time runs (or
+    # resumes) the language-independent stages, the others then reuse them
+    with runner.manifest.locked():
+        stems = _separate_stages(runner, video_path, job_dir, input_hash)
+
+        # STEP 3: Transcribe
+        translated_segments = None
+        utilization = None
+        transcribe_params = _transcribe_params(input_hash, source_lang)
+        if streaming and not (runner.resuming and runner.manifest.is_valid("transcribe", transcribe_params)):
+            # STEPS 3-5 fused: translation and TTS start while ASR is still running
+            runner.can_skip("transcribe", transcribe_params)
+            print(f"--- Steps 3-5: Streaming transcribe → translate → synthesize ---")
+            dubbed_audio = os.path.join(job_dir, f"dubbed_{target_lang}.aac")
+            with runner.manifest.locked(target_lang), \
+                    span("stage.streaming", source_lang=source_lang, target_lang=target_lang):
+                stream = run_streaming_dub(
+                    stems["vocals_asr"], stems["background"], dubbed_audio,
+                    source_lang=source_lang, target_lang=target_lang
+                )
+            utterances = stream["segments"]
+            translated_segments = stream["translated_segments"]
+            _record_transcribe(runner.manifest, job_dir, transcribe_params, stream["utterances"])
+            _record_translate(runner.manifest, job_dir, target_lang,
+                              _translate_params(input_hash, source_lang, target_lang), translated_segments)
+            _record_synthesize(runner.manifest, target_lang, _output_params(input_hash, target_lang, audio=dubbed_audio),
+                               stream["audio_path"], dubbed_audio)
+            utilization = stream["utilization"]
+            timings.update({
+                "transcribe": stream["timings"]["transcribe"],
+                "translate": stream["timings"]["translate"],
+                "synthesize": stream["timings"]["synthesize"] + stream["timings"]["mix"],
+                "streaming": stream["timings"]["streaming"] + stream["timings"]["mix"],
+            })
+        else:
+            utterances = _transcribe_stage(runner, job_dir, input_hash, source_lang, stems["vocals_asr"])
+
+    # STEPS 4-6
+    outputs = _dub_stages(
+        runner, video_path, job_dir, input_hash, source_lang, target_lang,
+        utterances, stems["background"], translated_segments=translated_segments
+    )
+
     timings["total_dubbing"] = time.time() - start_total
-    
+
+    return {
+        "output_video_path": outputs["output_video_path"],
+        "transcription": _format_transcript(utterances),
+        "timings": timings,
+        "resumed_stages": runner.resumed_stages,
+        "input_hash": input_hash,
+        "utilization": utilization
+    }
+
+
+def mux_audio_tracks(video_path: str, tracks: List[Dict[str, str]], output_path: str) -> str:
+    """
+    Writes one MP4 with the source video and every dubbed track, each tagged
+    with its ISO 639-2 language and a title, in a single stream-copy pass.
+    `tracks` is a list of {"lang", "audio"}; the first track is the default.
+    """
+    cmd = ["ffmpeg", "-y", "-i", video_path]
+    for track in tracks:
+        cmd.extend(["-i", track["audio"]])
+    cmd.extend(["-map", "0:v:0"])
+    for i in range(len(tracks)):
+        cmd.extend(["-map", f"{i + 1}:a:0"])
+    cmd.extend(["-c:v", "copy", "-c:a", "copy"])
+    for i, track in enumerate(tracks):
+        lang = track["lang"]
+        cmd.extend([
+            f"-metadata:s:a:{i}", f"language={ISO_639_2.get(lang, 'und')}",
+            f"-metadata:s:a:{i}", f"title={SUPPORTED_LANGUAGES.get(lang, lang)}",
+            f"-disposition:a:{i}", "default" if i == 0 else "0",
+        ])
+    cmd.extend(["-shortest", output_path])
+    # A file left by an earlier run must not pass for this run's output
+    if os.path.exists(output_path):
+        os.remove(output_path)
+    with span("ffmpeg.mux_tracks", tracks=len(tracks)):
+        proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if proc.returncode != 0 or not os.path.exists(output_path):
+        raise RuntimeError(f"Multi-track mux failed: {proc.stderr.decode(errors='ignore').strip()[-500:]}")
+    return output_path
+
+
+def process_video_multi(
+    video_path: str,
+    source_lang: str,
+    target_langs: List[str],
+    work_root: str = "work",
+    input_hash: Optional[str] = None,
+    multi_track: bool = False,
+    max_parallel: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Dubs one video into several languages.
+
+    Extraction, separation and transcription do not depend on the target
+    language, so they run (or resume from their checkpoints) once. The job
+    then branches into translate / synthesize & mix / merge per language, run
+    in parallel (up to `max_parallel`, default DUB_LANG_PARALLEL or all
+    languages). A failure in one language does not stop the others.
+
+    With `multi_track`, also writes `output/<name>_<hash>_multi.mp4` carrying
+    every successfully dubbed language as a tagged audio track (one mux pass).
+
+    Returns:
+        Dict containing:
+        - input_hash, transcription, timings (shared stages), resumed_stages (shared)
+        - languages: {lang: {output_video_path, timings, resumed_stages, error}}
+        - multi_track_video_path (str or None)
+        - multi_track_error (str or None; a failed mux does not fail the job)
+    """
+    target_langs = list(dict.fromkeys(target_langs))
+    for lang in target_langs:
+        if lang not in SUPPORTED_LANGUAGES:
+            raise ValueError(f"Unsupported language: {lang}. Supported: {list(SUPPORTED_LANGUAGES.keys())}")
+    max_parallel = max_parallel or int(os.getenv("DUB_LANG_PARALLEL", "0")) or len(target_langs)
+
+    os.makedirs("output", exist_ok=True)
+    start_total = time.time()
+    timings: Dict[str, float] = {}
+    input_hash, job_dir = _prepare_job(video_path, work_root, input_hash, timings)
+    runner = _StageRunner(StageManifest(job_dir))
+    runner.timings = timings
+
+    with runner.manifest.locked():
+        stems = _separate_stages(runner, video_path, job_dir, input_hash)
+        utterances = _transcribe_stage(runner, job_dir, input_hash, source_lang, stems["vocals_asr"])
+
+    def run_language(lang: str) -> Dict[str, Any]:
+        branch = runner.branch()
+        t0 = time.time()
+        outputs = _dub_stages(
+            branch, video_path, job_dir, input_hash, source_lang, lang, utterances, stems["background"]
+        )
+        branch.timings["total_dubbing"] = time.time() - t0
+        return dict(outputs, timings=branch.timings, resumed_stages=branch.resumed_stages, error=None)
+
+    print(f"--- Branching into {len(target_langs)} languages ({max_parallel} in parallel) ---")
+    languages: Dict[str, Dict[str, Any]] = {}
+    with ThreadPoolExecutor(max_workers=max_parallel) as executor:
+        futures = {
+            executor.submit(bind(run_language), lang): lang
+            for lang in target_langs
+        }
+        for future in as_completed(futures):
+            lang = futures[future]
+            try:
+                languages[lang] = future.result()
+            except Exception as e:
+                print(f"❌ Dubbing into {lang} failed: {e}")
+                languages[lang] = {"output_video_path": None, "timings": {}, "resumed_stages": [], "error": str(e)}
+
+    multi_track_path = None
+    multi_track_error = None
+    if multi_track:
+        # Tracks in the requested language order; only languages that produced audio
+        tracks = [
+            {"lang": lang, "audio": languages[lang]["dubbed_audio"]}
+            for lang in target_langs
+            if languages[lang].get("dubbed_audio") and os.path.exists(languages[lang]["dubbed_audio"])
+        ]
+        if tracks:
+            video_basename = os.path.splitext(os.path.basename(video_path))[0]
+            t0 = time.time()
+            try:
+                # The per-language results stand even if the combined file fails
+                multi_track_path = mux_audio_tracks(
+                    video_path, tracks, f"output/{video_basename}_{input_hash[:8]}_multi.mp4"
+                )
+            except Exception as e:
+                print(f"❌ Multi-track mux failed: {e}")
+                multi_track_error = str(e)
+            timings["mux_tracks"] = time.time() - t0
+
+    timings["total_dubbing"] = time.time() - start_total
+
     return {
-        "output_video_path": output_video,
-        "transcription": transcription_text,
-        "timings": timings
+        "input_hash": input_hash,
+        "transcription": _format_transcript(utterances),
+        "timings": timings,
+        "resumed_stages": runner.resumed_stages,
+        "languages": {lang: languages[lang] for lang in target_langs},
+        "multi_track_video_path": multi_track_path,
+        "multi_track_error": multi_track_error,
     }
@@ -0,0 +1,61 @@
+import os
+import threading
+import time
+from typing import Dict
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket used to pace calls to rate-limited APIs.
+
+    `rate` tokens are added per second up to `capacity`. Each call to
+    `acquire()` takes one token, blocking until one is available. A single
+    bucket is meant to be shared by every worker that talks to the same
+    account, so the combined request rate never exceeds the quota.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        if rate <= 0:
+            raise ValueError("rate must be > 0")
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, tokens: float = 1.0):
+        """Blocks until `tokens` are available, then consumes them."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait_time = (tokens - self._tokens) / self.rate
+            time.sleep(wait_time)
+
+
+# One bucket per account (env prefix), so every job and language branch in
+# this process draws from the same quota
+_shared: Dict[str, TokenBucket] = {}
+_shared_lock = threading.Lock()
+
+
+def bucket_from_env(prefix: str, default_rate: float, default_burst: float = 1.0) -> TokenBucket:
+    """
+    Returns the process-wide TokenBucket for `prefix`, built on first use
+    from `<PREFIX>_RATE_PER_SEC` and `<PREFIX>_BURST` (falling back to the
+    given defaults). Every client on the same account shares it, however
+    many jobs or language branches run at once.
+    """
+    with _shared_lock:
+        if prefix not in _shared:
+            rate = float(os.getenv(f"{prefix}_RATE_PER_SEC", default_rate))
+            burst = float(os.getenv(f"{prefix}_BURST", default_burst))
+            _shared[prefix] = TokenBucket(rate=rate, capacity=burst)
+        return _shared[prefix]
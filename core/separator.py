@@ -1,7 +1,202 @@
 import os
-import sys
-import subprocess
-from typing import Tuple
+import queue
+import threading
+from concurrent.futures import Future
+import numpy as np
+from typing import Optional, Tuple
+from core.telemetry import span
+from core.pcm_store import is_pcm, open_pcm, write_pcm, DTYPES
+
+MODEL_NAME = "htdemucs"
+
+# 16 kHz mono copy of the vocals stem, written next to PCM stems so the ASR
+# chunker can slice it without resampling
+ASR_SAMPLE_RATE = 16000
+ASR_VIEW_NAME = "vocals_16k.f32"
+
+
+def asr_view_path(vocals_path: str) -> str:
+    """Path of the 16 kHz ASR view for a PCM vocals stem."""
+    return os.path.join(os.path.dirname(vocals_path), ASR_VIEW_NAME)
+
+
+class SeparationEngine:
+    """
+    Long-lived, in-process Demucs separator.
+
+    The htdemucs weights are loaded once (lazily, or up front via `start(preload=True)`)
+    and reused for every job. Requests are served one at a time by a dedicated
+    thread, so concurrent jobs share a single warm model instead of each
+    spawning `python -m demucs` and oversubscribing the CPU.
+
+    Configuration (environment):
+        DEMUCS_THREADS  - torch intra-op threads (default: all cores)
+        DEMUCS_DEVICE   - "cpu" / "cuda" (default: cuda if available)
+        DEMUCS_SEGMENT  - segment length in seconds for long inputs (default: model's own;
+                          htdemucs accepts at most ~7.8)
+        DEMUCS_OVERLAP  - overlap between segments (default: 0.25)
+        DEMUCS_SHIFTS   - random shift averaging passes (default: 1)
+    """
+
+    def __init__(
+        self,
+        model_name: str = MODEL_NAME,
+        num_threads: Optional[int] = None,
+        device: Optional[str] = None,
+        segment: Optional[float] = None,
+        overlap: float = 0.25,
+        shifts: int = 1
+    ):
+        self.model_name = model_name
+        self.num_threads = num_threads
+        self.device = device
+        self.segment = segment
+        self.overlap = overlap
+        self.shifts = shifts
+        self.model = None
+        self._requests: "queue.Queue[Tuple[str, str, str, Future]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def start(self, preload: bool = False):
+        """Starts the engine thread (idempotent). With `preload`, loads the model right away."""
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="demucs-engine", daemon=True)
+                self._thread.start()
+        if preload:
+            self._requests.put(None)
+
+    def _load(self):
+        import torch
+        from demucs.pretrained import get_model
+
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        if not self.device:
+            self.device = "cuda" if torch.cuda.is_available() else "cpu"
+
+        with span("demucs.load_model", model=self.model_name):
+            model = get_model(self.model_name)
+            model.to(self.device)
+            model.eval()
+        self.model = model
+        print(f"🎛️  Demucs engine ready: {self.model_name} on {self.device} "
+              f"({torch.get_num_threads()} threads)")
+
+    def _run(self):
+        while True:
+            request = self._requests.get()
+            try:
+                if self.model is None:
+                    self._load()
+            except Exception as e:
+                if request is not None:
+                    request[3].set_exception(e)
+                print(f"❌ Failed to load Demucs model: {e}")
+                continue
+            if request is None:
+                continue
+
+            audio_path, vocals_path, background_path, future = request
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                self._separate(audio_path, vocals_path, background_path)
+                future.set_result((vocals_path, background_path))
+            except Exception as e:
+                future.set_exception(e)
+
+    def _separate(self, audio_path: str, vocals_path: str, background_path: str):
+        import torch
+        from demucs.apply import apply_model
+        from demucs.audio import AudioFile, convert_audio, save_audio
+
+        model = self.model
+        if is_pcm(audio_path):
+            # Lossless input: take the samples straight from the memory map
+            artifact = open_pcm(audio_path)
+            wav = torch.from_numpy(np.ascontiguousarray(artifact.samples.T, dtype=np.float32))
+            wav = convert_audio(wav, artifact.sample_rate, model.samplerate, model.audio_channels)
+        else:
+            wav = AudioFile(audio_path).read(streams=0, samplerate=model.samplerate, channels=model.audio_channels)
+
+        # Same normalization as the demucs CLI
+        ref = wav.mean(0)
+        mean, std = ref.mean(), ref.std()
+        wav = (wav - mean) / (std + 1e-8)
+
+        with torch.no_grad():
+            sources = apply_model(
+                model, wav[None],
+                device=self.device,
+                shifts=self.shifts,
+                split=True,
+                overlap=self.overlap,
+                segment=self.segment,
+                progress=False,
+                num_workers=0
+            )[0]
+        sources = sources * (std + 1e-8) + mean
+
+        # --two-stems vocals: background is everything that is not vocals
+        vocals_index = model.sources.index("vocals")
+        vocals = sources[vocals_index]
+        background = sources.sum(0) - vocals
+
+        os.makedirs(os.path.dirname(vocals_path), exist_ok=True)
+        if os.path.splitext(vocals_path)[1] in DTYPES:
+            import julius
+            write_pcm(vocals_path, vocals.cpu().numpy().T, model.samplerate)
+            write_pcm(background_path, background.cpu().numpy().T, model.samplerate)
+            asr_view = julius.resample_frac(vocals.mean(0), model.samplerate, ASR_SAMPLE_RATE)
+            write_pcm(asr_view_path(vocals_path), asr_view.cpu().numpy(), ASR_SAMPLE_RATE)
+        else:
+            save_audio(vocals.cpu(), vocals_path, samplerate=model.samplerate)
+            save_audio(background.cpu(), background_path, samplerate=model.samplerate)
+
+    def submit(self, audio_path: str, vocals_path: str, background_path: str) -> Future:
+        """Queues a separation. The future resolves to (vocals_path, background_path)."""
+        self.start()
+        future: Future = Future()
+        self._requests.put((audio_path, vocals_path, background_path, future))
+        return future
+
+    def pending(self) -> int:
+        return self._requests.qsize()
+
+
+_engine: Optional[SeparationEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_engine() -> SeparationEngine:
+    """Returns the process-wide SeparationEngine, built from DEMUCS_* settings."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            threads = os.getenv("DEMUCS_THREADS")
+            segment = os.getenv("DEMUCS_SEGMENT")
+            _engine = SeparationEngine(
+                num_threads=int(threads) if threads else None,
+                device=os.getenv("DEMUCS_DEVICE") or None,
+                segment=float(segment) if segment else None,
+                overlap=float(os.getenv("DEMUCS_OVERLAP", "0.25")),
+                shifts=int(os.getenv("DEMUCS_SHIFTS", "1")),
+            )
+        return _engine
+
+
+def set_engine(engine: Optional[SeparationEngine]) -> Optional[SeparationEngine]:
+    """
+    Replaces the process-wide engine (e.g. with a stand-in from tests/fakes.py)
+    and returns the previous one. `None` resets to a lazily built default.
+    """
+    global _engine
+    with _engine_lock:
+        previous, _engine = _engine, engine
+    return previous
+
 
 def separate_audio(audio_path: str, output_dir: str = "audio/separated", force: bool = False) -> Tuple[str, str]:
     """
@@ -9,16 +204,24 @@ def separate_audio(audio_path: str, output_dir: str = "audio/separated", force:
     If the separation has already been performed and the output files exist,
     the function will skip re-running Demucs unless `force=True`.
 
+    Runs on the shared in-process engine (see SeparationEngine); concurrent
+    callers queue behind each other on the same warm model.
+
+    When `audio_path` is a PCM artifact, the stems are written as float32 PCM
+    artifacts too (`vocals.f32` / `no_vocals.f32`, plus a 16 kHz mono ASR view,
+    see `asr_view_path`) instead of MP3, so no stage downstream decodes them.
+
     Returns:
         Tuple of (vocals_path, background_path)
     """
     os.makedirs(output_dir, exist_ok=True)
 
-    # Determine expected output paths (Demucs creates .mp3 files)
+    # Determine expected output paths (same layout as the demucs CLI)
     audio_basename = os.path.splitext(os.path.basename(audio_path))[0]
-    demucs_output = os.path.join(output_dir, "htdemucs", audio_basename)
-    vocals_path = os.path.join(demucs_output, "vocals.mp3")
-    background_path = os.path.join(demucs_output, "no_vocals.mp3")
+    demucs_output = os.path.join(output_dir, MODEL_NAME, audio_basename)
+    stem_ext = ".f32" if is_pcm(audio_path) else ".mp3"
+    vocals_path = os.path.join(demucs_output, f"vocals{stem_ext}")
+    background_path = os.path.join(demucs_output, f"no_vocals{stem_ext}")
 
     # If files already exist and not forced, skip processing
     if not force and os.path.exists(vocals_path) and os.path.exists(background_path):
@@ -31,18 +234,19 @@ def separate_audio(audio_path: str, output_dir: str = "audio/separated", force:
     print("STEP 2: Separating vocals from background (Demucs)")
     print("=" * 50)
     print(f"Input: {audio_path}")
-    print("⏳ This may take several minutes...")
 
-    # Run Demucs with MP3 output (bypasses torchaudio WAV issue on Python 3.13)
-    cmd = [
-        sys.executable, "-m", "demucs",
-        "--two-stems", "vocals",
-        "--mp3",  # Save as MP3 to bypass torchcodec
-        "-o", output_dir,
-        audio_path
-    ]
+    engine = get_engine()
+    if engine.pending():
+        print(f"⏳ Waiting for {engine.pending()} queued separation(s)...")
+    print("⏳ This may take several minutes...")
 
-    subprocess.run(cmd)
+    with span("demucs.separate"):
+        future = engine.submit(audio_path, vocals_path, background_path)
+        try:
+            future.result()
+        except Exception as e:
+            print(f"❌ Separation failed: {e}")
+            raise
 
     # Verify files exist after processing
     if os.path.exists(vocals_path) and os.path.exists(background_path):
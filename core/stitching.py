@@ -0,0 +1,284 @@
+"""
+Stitching of overlapping ASR chunks into one timeline.
+
+transcribe_audio cuts the audio into chunks that overlap by a few seconds,
+so every word near a chunk boundary is heard whole by at least one chunk.
+ChunkStitcher merges the per-chunk words back together:
+
+- the cut between two chunks is placed in a pause near the middle of their
+  overlap (where both chunks have full context); words are taken from the
+  earlier chunk before it and from the later chunk after it, and a word
+  both chunks report at the same time is kept once
+- speaker tags restart in every chunk, so each chunk's tags are mapped onto
+  the running speaker ids by majority vote over the words both chunks heard
+  in the overlap (tags with no votes take the most recently heard free id)
+- segments are rebuilt from the merged words with the same speaker / pause
+  rules the chunk parser uses, so an utterance cut in two by a chunk
+  boundary comes back as one segment
+
+Chunks may be added in any order; pop_ready() returns the segments that no
+later chunk can change, in timeline order, so streaming consumers can start
+on them early.
+"""
+import re
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+# Segment boundaries (seconds): a pause longer than PAUSE_SPLIT always splits,
+# and a segment longer than MAX_SEGMENT splits at the next pause over SOFT_PAUSE_SPLIT
+PAUSE_SPLIT = 0.7
+MAX_SEGMENT = 30.0
+SOFT_PAUSE_SPLIT = 0.3
+
+# Words this close to a cut are checked for duplicates / gaps
+_CUT_WINDOW = 1.0
+
+
+def words_to_segments(words: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Groups time-ordered words ({"word", "start", "end", "speaker"}) into
+    segments: {"start", "end", "speaker", "transcript", "words"}. A new
+    segment starts on a speaker change or a pause (see PAUSE_SPLIT).
+    """
+    segments = []
+    current_speaker = 0
+    segment_words: List[Dict[str, Any]] = []
+    segment_start = words[0]["start"] if words else 0.0
+    prev_word_end = segment_start
+
+    def close():
+        segments.append({
+            "start": segment_start,
+            "end": prev_word_end,
+            "speaker": current_speaker,
+            "transcript": " ".join(w["word"] for w in segment_words),
+            "words": [{"word": w["word"], "start": round(w["start"], 3), "end": round(w["end"], 3)}
+                      for w in segment_words],
+        })
+
+    for word in words:
+        # Split Condition 1: Speaker Change
+        speaker_changed = word["speaker"] != current_speaker
+        # Split Condition 2: Silence Gap > 0.7s (Natural Pause)
+        silence_gap = (word["start"] - prev_word_end) if prev_word_end > 0 else 0
+        is_pause = silence_gap > PAUSE_SPLIT
+        # Split Condition 3: Segment too long (> 30s) AND pause > 0.3s (Soft split)
+        is_too_long = (word["start"] - segment_start) > MAX_SEGMENT and silence_gap > SOFT_PAUSE_SPLIT
+
+        if (speaker_changed or is_pause or is_too_long) and segment_words:
+            close()
+            segment_words = []
+        if not segment_words:
+            current_speaker = word["speaker"]
+            segment_start = word["start"]
+        segment_words.append(word)
+        prev_word_end = word["end"]
+
+    if segment_words:
+        close()
+    return segments
+
+
+def _midpoint(word: Dict[str, Any]) -> float:
+    return (word["start"] + word["end"]) / 2
+
+
+def _overlap_ratio(a: Dict[str, Any], b: Dict[str, Any]) -> float:
+    """Time overlap of two words as a fraction of the shorter one."""
+    shared = min(a["end"], b["end"]) - max(a["start"], b["start"])
+    shortest = max(min(a["end"] - a["start"], b["end"] - b["start"]), 1e-3)
+    return max(shared, 0.0) / shortest
+
+
+def _normalize(text: str) -> str:
+    return re.sub(r"[^\w]", "", text.lower())
+
+
+class ChunkStitcher:
+    """
+    Merges the words of overlapping chunks (dicts with "start_offset" and
+    "duration", as returned by split_audio_into_chunks) into one segment list.
+    Thread-safe.
+    """
+
+    def __init__(self, chunks: List[Dict[str, Any]]):
+        self.chunks = chunks
+        self.cuts: List[float] = []
+        self.duplicates_dropped = 0
+        self.speakers_remapped = 0
+        self._pending: Dict[int, List[Dict[str, Any]]] = {}
+        self._merged = 0
+        self._words: List[Dict[str, Any]] = []
+        self._last_words: List[Dict[str, Any]] = []
+        self._emitted = 0
+        self._lock = threading.Lock()
+
+    def add(self, index: int, segments: List[Dict[str, Any]]):
+        """Takes chunk `index`'s segments (absolute timestamps, with "words")."""
+        words = []
+        for seg in segments:
+            for word in seg.get("words") or []:
+                words.append(dict(word, speaker=seg.get("speaker", 0)))
+        words.sort(key=lambda w: w["start"])
+        with self._lock:
+            self._pending[index] = words
+            while self._merged in self._pending:
+                self._merge(self._pending.pop(self._merged))
+                self._merged += 1
+
+    def _window(self, index: int):
+        chunk = self.chunks[index]
+        return chunk["start_offset"], chunk["start_offset"] + chunk.get("duration", 0.0)
+
+    def _merge(self, words: List[Dict[str, Any]]):
+        index = self._merged
+        if index == 0:
+            self._words = list(words)
+            self._last_words = self._words
+            return
+
+        start, _ = self._window(index)
+        _, prev_end = self._window(index - 1)
+        previous = self._last_words
+        words = self._map_speakers(previous, words, start, prev_end)
+        cut = self._choose_cut(previous, words, start, prev_end)
+        self.cuts.append(cut)
+
+        kept = [w for w in self._words if _midpoint(w) < cut]
+        dropped = [w for w in self._words if _midpoint(w) >= cut]
+        incoming = [w for w in words if _midpoint(w) >= cut]
+        dropped += [w for w in words if _midpoint(w) < cut]
+
+        # The same word heard by both chunks, assigned to both sides of the cut
+        near = [w for w in kept if w["end"] > cut - _CUT_WINDOW]
+        unique = []
+        for word in incoming:
+            if word["start"] < cut + _CUT_WINDOW and any(
+                _overlap_ratio(word, other) > 0.5 and _normalize(word["word"]) == _normalize(other["word"])
+                for other in near
+            ):
+                self.duplicates_dropped += 1
+                continue
+            unique.append(word)
+
+        # A word whose two timings fall on opposite sides of the cut would be
+        # dropped by both chunks: keep one copy
+        merged = kept + unique
+        boundary = [w for w in merged if abs(_midpoint(w) - cut) < _CUT_WINDOW]
+        for word in dropped:
+            if abs(_midpoint(word) - cut) < _CUT_WINDOW and not any(
+                _overlap_ratio(word, other) > 0.5 for other in boundary
+            ):
+                merged.append(word)
+                boundary.append(word)
+        merged.sort(key=lambda w: w["start"])
+
+        self._words = merged
+        self._last_words = words
+
+    def _map_speakers(self, previous, words, start: float, prev_end: float) -> List[Dict[str, Any]]:
+        """Renames the chunk's speaker tags to the ids used so far."""
+        votes: Dict[int, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+        earlier = [w for w in previous if w["end"] > start]
+        for word in words:
+            if word["start"] >= prev_end:
+                break
+            for other in earlier:
+                ratio = _overlap_ratio(word, other)
+                if ratio > 0.5:
+                    same_text = _normalize(word["word"]) == _normalize(other["word"])
+                    votes[word["speaker"]][other["speaker"]] += 1.0 if same_text else 0.5
+
+        # Strongest agreements first; every global id is claimed once per chunk
+        mapping: Dict[int, int] = {}
+        taken = set()
+        pairs = sorted(((n, local, known) for local, row in votes.items() for known, n in row.items()), reverse=True)
+        for _, local, known in pairs:
+            if local not in mapping and known not in taken:
+                mapping[local] = known
+                taken.add(known)
+
+        # Speakers silent in the overlap: most recently heard ids first, new ids
+        # only once every known speaker is matched
+        recent = []
+        for word in reversed(self._words):
+            if word["speaker"] not in recent:
+                recent.append(word["speaker"])
+        free = [known for known in recent if known not in taken]
+        next_id = max(set(recent) | taken | {0}) + 1
+        for local in sorted({w["speaker"] for w in words}, key=lambda tag: min(w["start"] for w in words if w["speaker"] == tag)):
+            if local in mapping:
+                continue
+            if free:
+                mapping[local] = free.pop(0)
+            else:
+                mapping[local] = next_id
+                next_id += 1
+            taken.add(mapping[local])
+
+        self.speakers_remapped += sum(1 for local, known in mapping.items() if local != known)
+        return [dict(w, speaker=mapping[w["speaker"]]) for w in words]
+
+    def _choose_cut(self, previous, words, start: float, prev_end: float) -> float:
+        """A point in the overlap [start, prev_end] where neither chunk is mid-word, if possible."""
+        if not words:
+            # Nothing from the later chunk (silence or a failed chunk): keep the earlier one whole
+            return prev_end
+        if not any(w["end"] > start for w in previous):
+            return start
+
+        middle = (start + prev_end) / 2
+        margin = min(_CUT_WINDOW, (prev_end - start) / 4)
+        lo, hi = start + margin, prev_end - margin
+        best: Optional[float] = None
+        best_score = 0.0
+        edges = sorted(
+            [(w["start"], w["end"]) for w in previous if w["end"] > start and w["start"] < prev_end]
+            + [(w["start"], w["end"]) for w in words if w["start"] < prev_end]
+        )
+        covered = lo
+        for word_start, word_end in edges:
+            if word_start > covered:
+                gap_lo, gap_hi = max(covered, lo), min(word_start, hi)
+                if gap_hi > gap_lo:
+                    # Prefer long pauses close to the middle of the overlap
+                    center = (gap_lo + gap_hi) / 2
+                    score = (gap_hi - gap_lo) / (1.0 + abs(center - middle))
+                    if score > best_score:
+                        best, best_score = center, score
+            covered = max(covered, word_end)
+        if covered < hi:
+            center = (max(covered, lo) + hi) / 2
+            score = (hi - max(covered, lo)) / (1.0 + abs(center - middle))
+            if score > best_score:
+                best = center
+        return best if best is not None else middle
+
+    def _final_until(self) -> float:
+        """Words starting before this time can no longer change."""
+        if self._merged >= len(self.chunks):
+            return float("inf")
+        return self._window(self._merged)[0]
+
+    def pop_ready(self) -> List[Dict[str, Any]]:
+        """Segments that are final and were not returned before, in timeline order."""
+        with self._lock:
+            limit = self._final_until()
+            segments = words_to_segments([w for w in self._words if w["start"] < limit])
+            if limit != float("inf") and segments:
+                # The last segment may still continue into the next chunk
+                segments.pop()
+            ready = segments[self._emitted:]
+            self._emitted = max(self._emitted, len(segments))
+            return ready
+
+    def segments(self) -> List[Dict[str, Any]]:
+        """All segments from the chunks merged so far."""
+        with self._lock:
+            return words_to_segments(self._words)
+
+    def rejoined(self) -> int:
+        """Segments that span a chunk cut (utterances that would have been split)."""
+        segments = self.segments()
+        return sum(1 for cut in self.cuts for seg in segments if seg["start"] < cut < seg["end"])
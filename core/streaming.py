@@ -0,0 +1,251 @@
+"""
+Overlapped transcribe -> translate -> synthesize.
+
+The serial pipeline waits for every ASR chunk before translating and for
+every translation before synthesizing, so the external services mostly sit
+idle. Here the stages run concurrently as producer/consumer threads joined
+by bounded queues:
+
+    ASR chunk done  -> coalesce -> translate queue (one item per chunk)
+    chunk translated -> TTS queue (one item per segment)
+    segment synthesized -> added into the mix timeline
+    all TTS done    -> one final encode
+
+A full queue blocks its producer, so a slow stage applies backpressure
+instead of letting work pile up in memory. Wall time approaches that of the
+slowest stage instead of the sum of all three.
+
+Configuration (environment):
+    STREAM_QUEUE_SIZE         - capacity of each inter-stage queue (default: 64)
+    STREAM_TRANSLATE_WORKERS  - chunks translated concurrently (default: 2); Gemini
+                                requests stay capped at TRANSLATE_MAX_IN_FLIGHT overall
+    ELEVENLABS_CONCURRENCY    - TTS workers (default: 4)
+    COALESCE_*                - segment coalescing, see core.coalesce
+"""
+import os
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from core.transcribe import transcribe_audio
+from core.coalesce import SegmentCoalescer
+from core.translator import Translator
+from core.elevenlabs_client import ElevenLabsClient
+from core.dubbing import synthesize_into, finish_mix
+from core.mixer import TimelineMixer
+from core.telemetry import span, bind
+
+_DONE = object()
+
+
+class StageStats:
+    """Busy time, idle (starved) time and throughput of one pipeline stage."""
+
+    def __init__(self, name: str, workers: int):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.busy = 0.0
+        self.starved = 0.0
+        self.first_start: Optional[float] = None
+        self.last_end: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def working(self, items: int = 1) -> Iterator[None]:
+        start = time.time()
+        try:
+            yield
+        finally:
+            end = time.time()
+            with self._lock:
+                self.items += items
+                self.busy += end - start
+                self.first_start = start if self.first_start is None else min(self.first_start, start)
+                self.last_end = end if self.last_end is None else max(self.last_end, end)
+
+    def get(self, source: "queue.Queue") -> Any:
+        """Takes the next item from `source`, counting the wait as starvation."""
+        start = time.time()
+        item = source.get()
+        with self._lock:
+            self.starved += time.time() - start
+        return item
+
+    def report(self, wall: float) -> Dict[str, Any]:
+        active = (self.last_end - self.first_start) if self.first_start is not None else 0.0
+        capacity = wall * self.workers
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "busy_sec": round(self.busy, 3),
+            "starved_sec": round(self.starved, 3),
+            "active_sec": round(active, 3),
+            "utilization": round(self.busy / capacity, 3) if capacity > 0 else 0.0,
+        }
+
+
+def _print_report(report: Dict[str, Dict[str, Any]], wall: float):
+    print(f"  Stage utilization over {wall:.1f}s wall:")
+    print(f"    {'stage':<11} {'workers':>7} {'items':>6} {'busy':>9} {'starved':>9} {'active':>9} {'util':>6}")
+    for name, r in report.items():
+        print(f"    {name:<11} {r['workers']:>7} {r['items']:>6} {r['busy_sec']:>8.1f}s "
+              f"{r['starved_sec']:>8.1f}s {r['active_sec']:>8.1f}s {r['utilization']:>6.0%}")
+
+
+def _start_workers(count: int, target: Callable, name: str) -> List[threading.Thread]:
+    threads = []
+    for i in range(count):
+        # One bind() per thread: each needs its own copy of the job context
+        thread = threading.Thread(target=bind(target), name=f"{name}-{i}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+def run_streaming_dub(
+    asr_audio_path: str,
+    background_audio_path: str,
+    output_path: str,
+    source_lang: str,
+    target_lang: str,
+    queue_size: Optional[int] = None,
+    translate_workers: Optional[int] = None,
+    tts_workers: Optional[int] = None,
+    translator: Optional[Translator] = None,
+    el_client: Optional[ElevenLabsClient] = None,
+    transcribe_kwargs: Optional[Dict[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Runs ASR, translation and TTS as overlapping stages, mixing each clip as it
+    arrives, then encodes once.
+
+    Returns:
+        Dict containing:
+        - utterances (ASR segments, timeline order)
+        - segments (the coalesced segments that were translated, timeline order)
+        - translated_segments (timeline order)
+        - audio_path (the mixed output, or the background path if nothing was dubbed)
+        - timings (active seconds per stage, plus the final encode as "mix")
+        - utilization (per-stage report, see StageStats.report)
+    """
+    queue_size = queue_size or int(os.getenv("STREAM_QUEUE_SIZE", "64"))
+    translate_workers = translate_workers or int(os.getenv("STREAM_TRANSLATE_WORKERS", "2"))
+    tts_workers = tts_workers or int(os.getenv("ELEVENLABS_CONCURRENCY", "4"))
+
+    translator = translator or Translator(target_language=target_lang)
+    if el_client is None:
+        try:
+            el_client = ElevenLabsClient()
+        except Exception as e:
+            print(f"❌ Failed to init ElevenLabs: {e}")
+    # Clips go into the timeline as they are synthesized; only the encode waits for the end
+    mixer = TimelineMixer(background_audio_path) if el_client is not None else None
+
+    translate_q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+    tts_q: "queue.Queue" = queue.Queue(maxsize=queue_size)
+
+    stats = {
+        "transcribe": StageStats("transcribe", 1),
+        "translate": StageStats("translate", translate_workers),
+        "synthesize": StageStats("synthesize", tts_workers),
+    }
+    coalescer = SegmentCoalescer()
+    segments_sent: List[Dict[str, Any]] = []
+    translated: List[Dict[str, Any]] = []
+    errors: List[Exception] = []
+    results_lock = threading.Lock()
+
+    def translate_worker():
+        stage = stats["translate"]
+        while True:
+            chunk = stage.get(translate_q)
+            if chunk is _DONE:
+                break
+            try:
+                with stage.working(len(chunk)):
+                    segments = translator.translate_segments(chunk)
+                with results_lock:
+                    translated.extend(segments)
+                for seg in segments:
+                    tts_q.put(seg)
+            except Exception as e:
+                print(f"  ❌ Translation of a chunk failed: {e}")
+                with results_lock:
+                    errors.append(e)
+
+    def tts_worker():
+        stage = stats["synthesize"]
+        while True:
+            seg = stage.get(tts_q)
+            if seg is _DONE:
+                break
+            if mixer is None:
+                continue
+            try:
+                with stage.working():
+                    synthesize_into(mixer, el_client, seg, target_lang)
+            except Exception as e:
+                print(f"  ❌ Segment at {seg.get('start', 0):.1f}s failed: {e}")
+
+    def send(segments: List[Dict[str, Any]]):
+        if segments:
+            segments_sent.extend(segments)
+            translate_q.put(segments)
+
+    def on_chunk(index: int, segments: List[Dict[str, Any]]):
+        stats["transcribe"].items += 1
+        # The last segment is held back: the next chunk may continue it
+        send(coalescer.push(segments))
+
+    print(f"🌊 Streaming ASR → translate ({translate_workers}) → TTS ({tts_workers}), queue size {queue_size}")
+    start = time.time()
+    translators = _start_workers(translate_workers, translate_worker, "stream-translate")
+    synthesizers = _start_workers(tts_workers, tts_worker, "stream-tts")
+
+    # ASR is the producer and runs on this thread
+    try:
+        asr_stage = stats["transcribe"]
+        with span("stream.transcribe", source_lang=source_lang), asr_stage.working(0):
+            utterances = transcribe_audio(
+                asr_audio_path, source_language=source_lang, on_chunk=on_chunk, **(transcribe_kwargs or {})
+            )
+    finally:
+        send(coalescer.flush())
+        coalescer.report()
+        # Drain in order: translators finish before TTS is told to stop
+        for _ in translators:
+            translate_q.put(_DONE)
+        for thread in translators:
+            thread.join()
+        for _ in synthesizers:
+            tts_q.put(_DONE)
+        for thread in synthesizers:
+            thread.join()
+    stream_wall = time.time() - start
+
+    if errors:
+        raise errors[0]
+
+    translated.sort(key=lambda seg: seg.get("start", 0.0))
+
+    utilization = {name: stage.report(stream_wall) for name, stage in stats.items()}
+    _print_report(utilization, stream_wall)
+
+    t0 = time.time()
+    with span("stream.mix", clips=mixer.clips if mixer else 0):
+        audio_path = finish_mix(mixer, background_audio_path, output_path)
+    timings = {name: report["active_sec"] for name, report in utilization.items()}
+    timings["mix"] = time.time() - t0
+    timings["streaming"] = stream_wall
+
+    return {
+        "utterances": utterances,
+        "segments": segments_sent,
+        "translated_segments": translated,
+        "audio_path": audio_path,
+        "timings": timings,
+        "utilization": utilization,
+    }
@@ -0,0 +1,235 @@
+"""
+Lightweight tracing and metrics for the dubbing pipeline.
+
+- `span(name, **attrs)` times a block. Every span feeds the
+  `dub_span_duration_seconds` histogram (labelled by span name and status)
+  and, when a job trace is active, is appended to that trace.
+- `trace_job(job_id)` collects the spans of one job and writes them as a
+  Chrome trace-event JSON file (loadable in chrome://tracing or Perfetto)
+  under DUB_TRACE_DIR, if that variable is set.
+- `render_prometheus()` returns all metrics in the Prometheus text format
+  for the /metrics endpoint.
+
+Spans started in worker threads only join the job trace if the task was
+submitted through `bind()`, which carries the caller's context over.
+"""
+import os
+import json
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Seconds; spans range from sub-second API calls to multi-minute stages
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items) + "}"
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self._series: Dict[LabelKey, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', repr(float(bound))))} {cumulative}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {series['count']}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {series['sum']}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {series['count']}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, kind: str = "counter"):
+        self.name = name
+        self.help_text = help_text
+        self.kind = kind
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+_registry: Dict[str, Any] = {}
+_registry_lock = threading.Lock()
+
+
+def histogram(name: str, help_text: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Histogram(name, help_text, buckets)
+        return _registry[name]
+
+
+def counter(name: str, help_text: str) -> Counter:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Counter(name, help_text)
+        return _registry[name]
+
+
+def gauge(name: str, help_text: str) -> Counter:
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = Counter(name, help_text, kind="gauge")
+        return _registry[name]
+
+
+def render_prometheus() -> str:
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines: List[str] = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+SPAN_SECONDS = histogram("dub_span_duration_seconds", "Wall time of pipeline stages and external calls.")
+RETRIES = counter("dub_retries_total", "Retries of external calls, by component.")
+
+
+class TraceRecorder:
+    """Collects trace events for one job."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+
+    def add(self, name: str, start: float, duration: float, attrs: Dict[str, Any]):
+        event = {
+            "name": name,
+            "cat": name.split(".")[0],
+            "ph": "X",
+            "ts": int(start * 1e6),
+            "dur": int(duration * 1e6),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {k: str(v) for k, v in attrs.items()},
+        }
+        with self._lock:
+            self.events.append(event)
+
+    def write(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._lock:
+            events = sorted(self.events, key=lambda e: e["ts"])
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "otherData": {"job_id": self.job_id}}, f)
+
+
+_current_trace: "contextvars.ContextVar[Optional[TraceRecorder]]" = contextvars.ContextVar("dub_trace", default=None)
+
+
+@contextmanager
+def span(name: str, **attrs) -> Iterator[Dict[str, Any]]:
+    """
+    Times the enclosed block as `name`. Yields the attrs dict so callers can
+    attach results (e.g. byte counts) before the span closes.
+    """
+    start_wall = time.time()
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield attrs
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        SPAN_SECONDS.observe(duration, span=name, status=status)
+        recorder = _current_trace.get()
+        if recorder is not None:
+            recorder.add(name, start_wall, duration, dict(attrs, status=status))
+
+
+def record_retry(component: str):
+    RETRIES.inc(component=component)
+
+
+def bind(fn: Callable) -> Callable:
+    """
+    Returns `fn` wrapped to run in a copy of the current context, so spans
+    from executor threads land in the submitting job's trace.
+    """
+    ctx = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return ctx.run(fn, *args, **kwargs)
+    return run
+
+
+@contextmanager
+def trace_job(job_id: str, trace_dir: Optional[str] = None) -> Iterator[TraceRecorder]:
+    """
+    Collects spans for one job. If `trace_dir` (default DUB_TRACE_DIR) is set,
+    writes `<trace_dir>/<job_id>.json` when the block exits.
+    """
+    trace_dir = trace_dir if trace_dir is not None else os.getenv("DUB_TRACE_DIR", "")
+    recorder = TraceRecorder(job_id)
+    token = _current_trace.set(recorder)
+    try:
+        with span("job", job_id=job_id):
+            yield recorder
+    finally:
+        _current_trace.reset(token)
+        if trace_dir:
+            path = os.path.join(trace_dir, f"{job_id}.json")
+            try:
+                recorder.write(path)
+                print(f"🧭 Trace written: {path}")
+            except OSError as e:
+                print(f"⚠️ Could not write trace {path}: {e}")
@@ -0,0 +1,194 @@
+"""
+In-process, pitch-preserving time-stretch for fitting dubbed clips into
+their original slots.
+
+Uses WSOLA (waveform-similarity overlap-add): the output is built from
+Hann-windowed frames at a fixed hop, and each frame is taken from near its
+nominal input position at the offset whose waveform best continues the
+previous frame (found by FFT cross-correlation). Pitch is untouched because
+frames are copied, not resampled. Durations come from sample counts, so no
+ffprobe / ffmpeg process is needed per segment.
+
+Configuration (environment):
+    TIMESTRETCH_MAX_RATIO - largest speed-up applied to a clip (default: 1.3)
+"""
+import os
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from core.telemetry import span
+
+# Same thresholds the atempo path used
+FIT_TOLERANCE = 1.05      # only stretch clips more than 5% over their slot
+MIN_FIT_DURATION = 0.5    # slots shorter than this are left alone
+DEFAULT_MAX_RATIO = 1.3
+
+FRAME_MS = 40.0           # analysis frame; hop is half of it
+SEARCH_MS = 10.0          # +/- tolerance when looking for the best-matching frame
+SEARCH_RATE = 11025       # the coarse similarity search runs at roughly this rate
+
+
+def max_ratio_from_env() -> float:
+    return float(os.getenv("TIMESTRETCH_MAX_RATIO", str(DEFAULT_MAX_RATIO)))
+
+
+def duration_of(samples: np.ndarray, sample_rate: int) -> float:
+    return len(samples) / float(sample_rate)
+
+
+class _Plan:
+    """Padded input and frame geometry for stretching one clip."""
+
+    def __init__(self, samples: np.ndarray, rate: float, sample_rate: int):
+        if samples.ndim == 1:
+            samples = samples[:, None]
+        self.rate = rate
+        self.target_frames = int(round(len(samples) / rate))
+        self.frame = max(2, int(sample_rate * FRAME_MS / 1000.0)) & ~1
+        self.hop = self.frame // 2
+        self.search = int(sample_rate * SEARCH_MS / 1000.0)
+        hop_in = self.hop * rate
+
+        # Enough output frames to cover the target plus the leading half frame
+        self.num_frames = int(np.ceil((self.target_frames + self.hop) / self.hop)) + 1
+
+        # Front padding of `hop` lets the first output sample sit at full window
+        # gain; `search` on both sides keeps every candidate window in bounds.
+        lead = self.search + self.hop
+        needed = 2 * self.search + int(np.ceil((self.num_frames - 1) * hop_in)) + self.frame + self.hop
+        tail = max(0, needed - lead - len(samples))
+        self.padded = np.pad(np.asarray(samples, dtype=np.float32), ((lead, tail), (0, 0)))
+        self.nominal = self.search + np.round(np.arange(self.num_frames) * hop_in).astype(np.int64)
+
+
+def _search(plans: List[_Plan], sample_rate: int) -> List[np.ndarray]:
+    """
+    Picks the start of every output frame for all clips at once. Step k runs
+    one batched FFT cross-correlation over frame k of every clip on a
+    decimated mono signal, then refines the best lag at full rate.
+    """
+    frame, hop, search = plans[0].frame, plans[0].hop, plans[0].search
+    count = len(plans)
+    steps = max(plan.num_frames for plan in plans)
+    factor = max(1, sample_rate // SEARCH_RATE)
+
+    # Mono copies side by side, so each step is a single gather
+    width = max(len(plan.padded) for plan in plans)
+    width += -width % factor
+    mono = np.zeros((count, width), dtype=np.float32)
+    nominal = np.zeros((count, steps), dtype=np.int64)
+    for i, plan in enumerate(plans):
+        mono[i, :len(plan.padded)] = plan.padded.mean(axis=1)
+        nominal[i, :plan.num_frames] = plan.nominal
+        # Clips with fewer frames keep repeating their last position (ignored later)
+        nominal[i, plan.num_frames:] = plan.nominal[-1]
+    coarse = mono.reshape(count, -1, factor).mean(axis=2)
+
+    rows = np.arange(count)[:, None]
+    c_frame, c_search = frame // factor, search // factor
+    ref_offsets = np.arange(c_frame)
+    region_offsets = np.arange(c_frame + 2 * c_search)
+    fft_size = 1 << int(np.ceil(np.log2(c_frame + 2 * c_search)))
+    lags = 2 * c_search + 1
+    full_offsets = np.arange(frame)
+    reach = 2 * factor - 1
+    refine_offsets = np.arange(frame + 2 * reach)
+
+    starts = np.empty((count, steps), dtype=np.int64)
+    starts[:, 0] = nominal[:, 0]
+    for k in range(1, steps):
+        # What the previous frame would naturally continue with...
+        follow = starts[:, k - 1] + hop
+        reference = coarse[rows, (follow // factor)[:, None] + ref_offsets]
+        # ...matched against every candidate around the nominal position
+        low = (nominal[:, k] - search) // factor
+        region = coarse[rows, low[:, None] + region_offsets]
+        corr = np.fft.irfft(
+            np.fft.rfft(region, fft_size) * np.conj(np.fft.rfft(reference, fft_size)), fft_size
+        )[:, :lags]
+        best = (low + np.argmax(corr, axis=1)) * factor
+
+        if factor > 1:
+            # Full-rate refinement: coarse rounding of both the reference and
+            # the region can each be off by up to one decimation step
+            full_ref = mono[rows, follow[:, None] + full_offsets]
+            around = mono[rows, (best - reach)[:, None] + refine_offsets]
+            windows = np.lib.stride_tricks.sliding_window_view(around, frame, axis=1)
+            scores = np.einsum("cln,cn->cl", windows, full_ref)
+            best = np.clip(best - reach + np.argmax(scores, axis=1),
+                           nominal[:, k] - search, nominal[:, k] + search)
+        starts[:, k] = best
+
+    return [starts[i, :plan.num_frames] for i, plan in enumerate(plans)]
+
+
+def _overlap_add(plan: _Plan, starts: np.ndarray) -> np.ndarray:
+    """
+    Gathers all frames at once and overlap-adds them; with a hop of half a
+    frame, even and odd frames each tile the output without overlapping.
+    """
+    frame, hop = plan.frame, plan.hop
+    window = (0.5 - 0.5 * np.cos(2 * np.pi * np.arange(frame) / frame)).astype(np.float32)
+    frames = plan.padded[starts[:, None] + np.arange(frame)] * window[None, :, None]
+
+    channels = plan.padded.shape[1]
+    out = np.zeros(((plan.num_frames + 2) * hop, channels), dtype=np.float32)
+    even = frames[0::2].reshape(-1, channels)
+    odd = frames[1::2].reshape(-1, channels)
+    out[:len(even)] += even
+    out[hop:hop + len(odd)] += odd
+    return out[hop:hop + plan.target_frames]
+
+
+def wsola_batch(clips: Sequence[np.ndarray], rates: Sequence[float], sample_rate: int) -> List[np.ndarray]:
+    """
+    Time-stretches each float32 (frames, channels) clip by its rate (>1 is
+    faster / shorter) without changing pitch; clip i comes back with
+    round(frames_i / rate_i) frames. All clips share one frame search loop.
+    """
+    results: List[Optional[np.ndarray]] = [None] * len(clips)
+    plans: List[_Plan] = []
+    indices: List[int] = []
+    for i, (samples, rate) in enumerate(zip(clips, rates)):
+        if rate == 1.0 or len(samples) == 0:
+            results[i] = np.asarray(samples, dtype=np.float32)
+        else:
+            plans.append(_Plan(samples, rate, sample_rate))
+            indices.append(i)
+
+    if plans:
+        for i, plan, starts in zip(indices, plans, _search(plans, sample_rate)):
+            results[i] = _overlap_add(plan, starts)
+    return results
+
+
+def wsola(samples: np.ndarray, rate: float, sample_rate: int) -> np.ndarray:
+    """Time-stretches one clip by `rate`; see wsola_batch."""
+    return wsola_batch([samples], [rate], sample_rate)[0]
+
+
+def _fit_ratio(samples: np.ndarray, sample_rate: int, target_duration: float, max_ratio: float) -> float:
+    current_duration = duration_of(samples, sample_rate)
+    if current_duration <= target_duration * FIT_TOLERANCE or target_duration <= MIN_FIT_DURATION:
+        return 1.0
+    return min(current_duration / target_duration, max_ratio)
+
+
+def fit_to_duration(
+    samples: np.ndarray,
+    sample_rate: int,
+    target_duration: float,
+    max_ratio: Optional[float] = None
+) -> np.ndarray:
+    """
+    Speeds a clip up to fit `target_duration` when it overruns by more than
+    FIT_TOLERANCE, capped at `max_ratio` (default TIMESTRETCH_MAX_RATIO).
+    Clips that already fit, or slots under MIN_FIT_DURATION, are returned unchanged.
+    """
+    ratio = _fit_ratio(samples, sample_rate, target_duration, max_ratio or max_ratio_from_env())
+    if ratio == 1.0:
+        return samples
+    with span("timestretch.wsola", ratio=round(ratio, 3), seconds=round(duration_of(samples, sample_rate), 2)):
+        return wsola(samples, ratio, sample_rate)
+
@@ -1,79 +1,36 @@
 import os
-import subprocess
-import tempfile
+import asyncio
 import uuid
-import time
-from typing import List, Dict, Any, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Dict, Any, Union, Optional
 from dotenv import load_dotenv
 from google.cloud.speech_v2 import SpeechClient
 from google.cloud.speech_v2.types import cloud_speech
-from google.api_core.client_options import ClientOptions
 import google.api_core.exceptions
-from google.cloud import storage
+from core.telemetry import span, bind, counter
+from core import clients
+from core.clients import RECOGNIZER_ID
+from core.stitching import ChunkStitcher, words_to_segments
+from core.chunking import UPLOAD_FORMATS, split_audio_into_chunks
 
 # Load .env from project root safely
 load_dotenv(dotenv_path=os.path.join(os.getcwd(), ".env"))
 
+# BatchRecognize operations are polled quickly at first, then less often
+ASR_POLL_INITIAL = float(os.getenv("ASR_POLL_INITIAL_SEC", "0.5"))
+ASR_POLL_MAX = float(os.getenv("ASR_POLL_MAX_SEC", "10"))
+ASR_POLL_MULTIPLIER = 1.5
+ASR_CHUNK_TIMEOUT = float(os.getenv("ASR_CHUNK_TIMEOUT_SEC", "900"))  # 15 min per chunk
+ASR_POLLS = counter("dub_asr_operation_polls_total", "done() checks on BatchRecognize operations.")
 
-def get_audio_duration(file_path: str) -> float:
-    """Returns the duration of an audio file in seconds using ffprobe."""
-    cmd = [
-        "ffprobe", "-v", "error",
-        "-show_entries", "format=duration",
-        "-of", "default=noprint_wrappers=1:nokey=1",
-        file_path
-    ]
-    try:
-        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        return float(result.stdout.strip())
-    except (ValueError, IndexError, Exception):
-        return 0.0
-
-
-def split_audio_into_chunks(audio_path: str, chunk_duration: float = 240.0, temp_dir: str = None) -> List[Dict]:
-    """
-    Splits an audio file into chunks. 
-    Using 240s (4 mins) chunks since BatchRecognize can handle longer files more efficiently than Sync.
-    """
-    total_duration = get_audio_duration(audio_path)
-    if total_duration == 0:
-        return []
-    
-    if temp_dir is None:
-        temp_dir = tempfile.mkdtemp(prefix="stt_chunks_")
-    
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    chunks = []
-    start_time = 0.0
-    chunk_index = 0
-    
-    while start_time < total_duration:
-        chunk_path = os.path.join(temp_dir, f"chunk_{chunk_index}.wav")
-        
-        # Use ffmpeg to extract chunk and convert to LINEAR16 WAV
-        cmd = [
-            "ffmpeg", "-y",
-            "-i", audio_path,
-            "-ss", str(start_time),
-            "-t", str(chunk_duration),
-            "-ar", "16000",
-            "-ac", "1",
-            "-acodec", "pcm_s16le",
-            chunk_path
-        ]
-        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        
-        if os.path.exists(chunk_path):
-            chunks.append({
-                "path": chunk_path,
-                "start_offset": start_time
-            })
-        
-        start_time += chunk_duration
-        chunk_index += 1
-    
-    return chunks
+# GCS upload requests are sent in parts of this size (a multiple of 256 KiB);
+# each part is retried on its own, so a dropped connection resumes instead
+# of restarting the upload
+_RESUMABLE_GRANULARITY = 256 * 1024
+UPLOAD_CHUNK_BYTES = max(
+    _RESUMABLE_GRANULARITY,
+    int(float(os.getenv("GCS_UPLOAD_CHUNK_MB", "4")) * 1024 * 1024) // _RESUMABLE_GRANULARITY * _RESUMABLE_GRANULARITY,
+)
 
 
 def create_recognizer_if_missing(
@@ -121,192 +78,372 @@ def create_recognizer_if_missing(
         raise e
 
 
-def upload_to_gcs(bucket_name: str, source_file_name: str, destination_blob_name: str) -> str:
-    """Uploads a file to the bucket and returns the GS URI."""
-    storage_client = storage.Client()
+def upload_to_gcs(bucket_name: str, source_file_name: str, destination_blob_name: str, storage_client=None) -> str:
+    """
+    Uploads a file to the bucket and returns the GS URI.
+
+    Files larger than UPLOAD_CHUNK_BYTES (GCS_UPLOAD_CHUNK_MB, default 4) go
+    up as a resumable upload in parts of that size. The upload is made
+    conditional on the object not existing yet (blob names are unique), which
+    lets the client retry it safely on transient errors.
+    """
+    storage_client = storage_client or clients.get("storage")
     bucket = storage_client.bucket(bucket_name)
     blob = bucket.blob(destination_blob_name)
-    blob.upload_from_filename(source_file_name)
+    size = os.path.getsize(source_file_name)
+    if size > UPLOAD_CHUNK_BYTES:
+        blob.chunk_size = UPLOAD_CHUNK_BYTES
+    with span("gcs.upload", bytes=size):
+        blob.upload_from_filename(source_file_name, if_generation_match=0)
     return f"gs://{bucket_name}/{destination_blob_name}"
 
 
-def delete_from_gcs(bucket_name: str, blob_name: str):
+def delete_from_gcs(bucket_name: str, blob_name: str, storage_client=None):
     """Deletes a blob from the bucket."""
     try:
-        storage_client = storage.Client()
+        storage_client = storage_client or clients.get("storage")
         bucket = storage_client.bucket(bucket_name)
         blob = bucket.blob(blob_name)
-        blob.delete()
+        with span("gcs.delete"):
+            blob.delete()
     except Exception as e:
         print(f"  [!] Failed to delete GCS blob {blob_name}: {e}")
 
 
-def transcribe_chunk_batch(
-    client: SpeechClient, 
-    local_audio_path: str, 
+def _batch_request(recognizer_path: str, gcs_uri: str) -> cloud_speech.BatchRecognizeRequest:
+    """BatchRecognize request for one uploaded chunk, with inline results."""
+    # Explicitly include features in the request config to ensure they are active
+    # and not disabled by the override.
+    diarization_config = cloud_speech.SpeakerDiarizationConfig(
+        min_speaker_count=2, # Force at least 2 speakers to encourage splitting
+        max_speaker_count=7,
+    )
+    features = cloud_speech.RecognitionFeatures(
+        diarization_config=diarization_config,
+        enable_word_time_offsets=True,
+        enable_automatic_punctuation=True,
+    )
+    
+    config = cloud_speech.RecognitionConfig(
+        auto_decoding_config=cloud_speech.AutoDetectDecodingConfig(),
+        language_codes=["auto"],
+        model="chirp_3",
+        features=features,
+    )
+    
+    return cloud_speech.BatchRecognizeRequest(
+        recognizer=recognizer_path,
+        config=config,
+        files=[cloud_speech.BatchRecognizeFileMetadata(uri=gcs_uri)],
+        recognition_output_config=cloud_speech.RecognitionOutputConfig(
+            inline_response_config=cloud_speech.InlineOutputConfig()
+        ),
+    )
+
+
+async def wait_for_operation(operation, deadline: Optional[float] = None, label: str = ""):
+    """
+    Awaits a long-running operation without holding a thread for it.
+
+    `operation.done()` (a GetOperation call on real clients) runs via
+    asyncio.to_thread, first immediately, then after ASR_POLL_INITIAL_SEC
+    (default 0.5), backing off 1.5x per poll up to ASR_POLL_MAX_SEC (default 10).
+    `deadline` is a loop.time() value. If it passes, or the awaiting task is
+    cancelled, the server-side operation is cancelled as well; a missed
+    deadline raises TimeoutError. Returns `operation.result()`.
+    """
+    loop = asyncio.get_running_loop()
+    delay = ASR_POLL_INITIAL
+    try:
+        while True:
+            ASR_POLLS.inc()
+            if await asyncio.to_thread(operation.done):
+                break
+            if deadline is not None and loop.time() >= deadline:
+                print(f"      {label}[!] Timeout reached.")
+                raise TimeoutError("BatchRecognize operation did not finish before its deadline")
+            pause = delay if deadline is None else min(delay, deadline - loop.time())
+            await asyncio.sleep(max(pause, 0.0))
+            delay = min(delay * ASR_POLL_MULTIPLIER, ASR_POLL_MAX)
+    except (asyncio.CancelledError, TimeoutError):
+        try:
+            await asyncio.shield(asyncio.to_thread(operation.cancel))
+        except Exception as e:
+            print(f"      {label}[!] Could not cancel operation: {e}")
+        raise
+    return await asyncio.to_thread(operation.result)
+
+
+async def transcribe_chunk_batch_async(
+    client: SpeechClient,
+    local_audio_path: str,
     recognizer_path: str,
-    bucket_name: str
+    bucket_name: str,
+    storage_client=None,
+    label: str = "",
+    deadline: Optional[float] = None
 ) -> List[Dict]:
     """
     Transcribes a chunk by uploading to GCS, running BatchRecognize, and parsing inline results.
+
+    Blocking SDK calls (upload, submit, delete) run in worker threads; the
+    wait for the operation is a coroutine (see wait_for_operation), so many
+    chunks can be awaited together from one event loop. The chunk gives up
+    ASR_CHUNK_TIMEOUT_SEC (default 900) after submission, or at `deadline`
+    (a loop.time() value) if that comes first.
     """
-    # 1. Upload to GCS
-    blob_name = f"temp_chunks/{uuid.uuid4()}.wav"
-    gcs_uri = upload_to_gcs(bucket_name, local_audio_path, blob_name)
+    loop = asyncio.get_running_loop()
+    # 1. Upload to GCS (keeping the chunk's extension: WAV, FLAC or Opus)
+    blob_name = f"temp_chunks/{uuid.uuid4()}{os.path.splitext(local_audio_path)[1] or '.wav'}"
+    gcs_uri = await asyncio.to_thread(
+        upload_to_gcs, bucket_name, local_audio_path, blob_name, storage_client=storage_client
+    )
     # print(f"      Uploaded to {gcs_uri}")
     
     try:
         # 2. Batch Recognize
-        # Explicitly include features in the request config to ensure they are active
-        # and not disabled by the override.
-        diarization_config = cloud_speech.SpeakerDiarizationConfig(
-            min_speaker_count=2, # Force at least 2 speakers to encourage splitting
-            max_speaker_count=7,
-        )
-        features = cloud_speech.RecognitionFeatures(
-            diarization_config=diarization_config,
-            enable_word_time_offsets=True,
-            enable_automatic_punctuation=True,
-        )
+        batch_request = _batch_request(recognizer_path, gcs_uri)
         
-        config = cloud_speech.RecognitionConfig(
-            auto_decoding_config=cloud_speech.AutoDetectDecodingConfig(),
-            language_codes=["auto"],
-            model="chirp_3",
-            features=features,
-        )
-        
-        batch_request = cloud_speech.BatchRecognizeRequest(
-            recognizer=recognizer_path,
-            config=config,
-            files=[cloud_speech.BatchRecognizeFileMetadata(uri=gcs_uri)],
-            recognition_output_config=cloud_speech.RecognitionOutputConfig(
-                inline_response_config=cloud_speech.InlineOutputConfig()
-            ),
-        )
-        
-        operation = client.batch_recognize(request=batch_request)
-        print(f"      Job started (Async). Waiting for completion...")
-        
-        # Poll for completion with feedback
-        start_wait = time.time()
-        while not operation.done():
-            elapsed = int(time.time() - start_wait)
-            print(f"\r      ... {elapsed}s elapsed", end="", flush=True)
-            time.sleep(5)
-            if elapsed > 900: # 15 min timeout per chunk
-                 print("\n      [!] Timeout reached.")
-                 operation.cancel()
-                 break
-        print("") # Newline
-        
-        # Get result
-        response = operation.result()
-        
-        segments = []
+        # Span covers submission, server-side processing and the wait
+        with span("speech.batch_recognize"):
+            operation = await asyncio.to_thread(client.batch_recognize, request=batch_request)
+            print(f"      {label}Job started (Async). Waiting for completion...")
+            start_wait = loop.time()
+            chunk_deadline = start_wait + ASR_CHUNK_TIMEOUT
+            if deadline is not None:
+                chunk_deadline = min(chunk_deadline, deadline)
+            response = await wait_for_operation(operation, deadline=chunk_deadline, label=label)
+            print(f"      {label}Job finished in {loop.time() - start_wait:.1f}s")
         
         # 3. Parse Results
-        # Response contains results keyed by URI
-        if gcs_uri in response.results:
-            file_result = response.results[gcs_uri]
-            
-            # Check for errors
-            if file_result.error and file_result.error.code != 0:
-                print(f"      [!] Batch Error for chunk: {file_result.error.message}")
-                return []
-            
-            # Parse transcript
-            if file_result.transcript and file_result.transcript.results:
-                for result in file_result.transcript.results:
-                    if result.alternatives:
-                        alternative = result.alternatives[0]
-                        # transcript = alternative.transcript # Not used directly if we parse words
-                        
-                        if alternative.words:
-                            current_speaker = 0
-                            segment_words = []
-                            segment_start = alternative.words[0].start_offset.total_seconds()
-                            prev_word_end = segment_start # Initialize
-                            
-                            # DEBUG: Check first word attributes for speaker tags
-                            first_word = alternative.words[0]
-                            print(f"      [DEBUG] First word: '{first_word.word}', Speaker Tag: {getattr(first_word, 'speaker_tag', 'Missing')}, Label: {getattr(first_word, 'speaker_label', 'Missing')}")
-
-                            for word in alternative.words:
-                                speaker_tag = getattr(word, 'speaker_tag', 0)
-                                speaker_id = int(speaker_tag) if speaker_tag else 0
-                                
-                                word_start = word.start_offset.total_seconds()
-                                word_end = word.end_offset.total_seconds()
-                                
-                                # Split Condition 1: Speaker Change
-                                speaker_changed = (speaker_id != current_speaker)
-                                
-                                # Split Condition 2: Silence Gap > 0.7s (Natural Pause)
-                                silence_gap = (word_start - prev_word_end) if prev_word_end > 0 else 0
-                                is_pause = silence_gap > 0.7
-                                
-                                # Split Condition 3: Segment too long (> 30s) AND pause > 0.3s (Soft split)
-                                is_too_long = (word_start - segment_start) > 30.0 and silence_gap > 0.3
-                                
-                                if (speaker_changed or is_pause or is_too_long) and segment_words:
-                                     # End previous segment
-                                     segments.append({
-                                         "start": segment_start,
-                                         "end": prev_word_end,
-                                         "speaker": current_speaker,
-                                         "transcript": " ".join(segment_words)
-                                     })
-                                     # Start new segment
-                                     current_speaker = speaker_id
-                                     segment_words = [word.word]
-                                     segment_start = word_start
-                                     prev_word_end = word_end
-                                else:
-                                    if not segment_words:
-                                        current_speaker = speaker_id
-                                        segment_start = word_start
-                                    segment_words.append(word.word)
-                                    prev_word_end = word_end
-                            
-                            if segment_words:
-                                 # Use the last word end
-                                 segments.append({
-                                     "start": segment_start,
-                                     "end": prev_word_end,
-                                     "speaker": current_speaker,
-                                     "transcript": " ".join(segment_words)
-                                 })
-            else:
-                 print(f"      [!] No transcript found in response.")
-
-        return segments
+        return _segments_from_response(response, gcs_uri, label)
 
     finally:
         # 4. cleanup GCS
-        delete_from_gcs(bucket_name, blob_name)
+        await asyncio.shield(asyncio.to_thread(
+            delete_from_gcs, bucket_name, blob_name, storage_client=storage_client
+        ))
+
+
+def transcribe_chunk_batch(
+    client: SpeechClient, 
+    local_audio_path: str, 
+    recognizer_path: str,
+    bucket_name: str,
+    storage_client=None,
+    label: str = ""
+) -> List[Dict]:
+    """
+    Blocking form of transcribe_chunk_batch_async for one chunk.
+    Safe to call from several threads at once (one chunk per call).
+    """
+    return run_sync(transcribe_chunk_batch_async(
+        client, local_audio_path, recognizer_path, bucket_name,
+        storage_client=storage_client, label=label
+    ))
+
+
+def _segments_from_response(response, gcs_uri: str, label: str = "") -> List[Dict]:
+    """Segments (with per-word timings, see words_to_segments) from one file's BatchRecognize result."""
+    words = []
+    
+    # Response contains results keyed by URI
+    if gcs_uri in response.results:
+        file_result = response.results[gcs_uri]
+        
+        # Check for errors
+        if file_result.error and file_result.error.code != 0:
+            print(f"      {label}[!] Batch Error for chunk: {file_result.error.message}")
+            return []
+        
+        # Parse transcript
+        if file_result.transcript and file_result.transcript.results:
+            for result in file_result.transcript.results:
+                if result.alternatives:
+                    alternative = result.alternatives[0]
+                    # transcript = alternative.transcript # Not used directly if we parse words
+                    
+                    if alternative.words:
+                        # DEBUG: Check first word attributes for speaker tags
+                        first_word = alternative.words[0]
+                        print(f"      {label}[DEBUG] First word: '{first_word.word}', Speaker Tag: {getattr(first_word, 'speaker_tag', 'Missing')}, Label: {getattr(first_word, 'speaker_label', 'Missing')}")
+
+                        for word in alternative.words:
+                            speaker_tag = getattr(word, 'speaker_tag', 0)
+                            words.append({
+                                "word": word.word,
+                                "start": word.start_offset.total_seconds(),
+                                "end": word.end_offset.total_seconds(),
+                                "speaker": int(speaker_tag) if speaker_tag else 0,
+                            })
+        else:
+             print(f"      {label}[!] No transcript found in response.")
+
+    return words_to_segments(words)
+
+
+async def _transcribe_chunk(
+    client: SpeechClient,
+    chunk: Dict,
+    index: int,
+    total: int,
+    recognizer_path: str,
+    bucket_name: str,
+    storage_client=None,
+    deadline: Optional[float] = None
+) -> List[Dict]:
+    """
+    Runs one chunk end to end (upload, recognize, offset timestamps, cleanup).
+    Returns the chunk's segments with absolute timestamps.
+    """
+    label = f"[chunk {index+1}/{total}] "
+    print(f"  --> {label}Submitting (start: {chunk['start_offset']:.1f}s)...")
+
+    chunk_segments = []
+    try:
+        if deadline is not None and asyncio.get_running_loop().time() >= deadline:
+            raise TimeoutError("ASR deadline passed before the chunk was submitted")
+        chunk_segments = await transcribe_chunk_batch_async(
+            client=client,
+            local_audio_path=chunk["path"],
+            recognizer_path=recognizer_path,
+            bucket_name=bucket_name,
+            storage_client=storage_client,
+            label=label,
+            deadline=deadline
+        )
+
+        # Adjust timestamps
+        for seg in chunk_segments:
+            seg["start"] += chunk["start_offset"]
+            seg["end"] += chunk["start_offset"]
+            for word in seg["words"]:
+                word["start"] += chunk["start_offset"]
+                word["end"] += chunk["start_offset"]
+        if chunk_segments:
+            print(f"      {label}Got {len(chunk_segments)} segments.")
+
+    except Exception as e:
+        print(f"      [!] Error processing chunk {index+1}: {e}")
+
+    # Cleanup local chunk
+    try:
+        os.remove(chunk["path"])
+    except:
+        pass
+
+    return chunk_segments
+
+
+async def transcribe_chunks_async(
+    client: SpeechClient,
+    chunks: List[Dict],
+    recognizer_path: str,
+    bucket_name: str,
+    storage_client=None,
+    max_in_flight: int = 4,
+    on_chunk: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None,
+    timeout: Optional[float] = None
+) -> Dict[int, List[Dict]]:
+    """
+    Transcribes `chunks` concurrently from one event loop, at most
+    `max_in_flight` at a time. Returns {chunk index: segments}.
+
+    `timeout` (seconds) is an overall deadline passed down to every chunk: a
+    chunk still waiting when it passes is cancelled server-side and counts as
+    failed (no segments). Cancelling the awaiting task cancels every chunk's
+    operation. `on_chunk(index, segments)` runs in a worker thread, one call
+    at a time in completion order, so a slow consumer never stalls polling.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout else None
+    slots = asyncio.Semaphore(max_in_flight)
+    callbacks = asyncio.Lock()
+    results: Dict[int, List[Dict]] = {}
+
+    async def run(index: int, chunk: Dict):
+        async with slots:
+            segments = await _transcribe_chunk(
+                client, chunk, index, len(chunks), recognizer_path, bucket_name, storage_client, deadline
+            )
+        results[index] = segments
+        if on_chunk:
+            async with callbacks:
+                await asyncio.to_thread(on_chunk, index, segments)
+
+    await asyncio.gather(*(run(i, chunk) for i, chunk in enumerate(chunks)))
+    return results
+
+
+def run_sync(coro):
+    """
+    Runs `coro` to completion from blocking code. If this thread already runs
+    an event loop, the coroutine gets its own loop on a helper thread.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(coro)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(bind(asyncio.run), coro).result()
 
 
 def transcribe_audio(
     audio_path: str, 
     source_language: str = "multi", 
-    enable_diarization: bool = True
+    enable_diarization: bool = True,
+    client: Optional[SpeechClient] = None,
+    storage_client=None,
+    max_in_flight: Optional[int] = None,
+    on_chunk: Optional[Callable[[int, List[Dict[str, Any]]], None]] = None,
+    upload_format: Optional[str] = None,
+    timeout: Optional[float] = None,
+    overlap: Optional[float] = None,
+    project_id: Optional[str] = None
 ) -> List[Dict[str, Any]]:
     """
     Transcribes audio using Google Cloud Speech-to-Text v2 API (Chirp 3) via BatchRecognize.
     Uses a temporary GCS bucket for upload/processing.
+
+    Chunks are submitted concurrently (at most `max_in_flight` at a time, default
+    ASR_MAX_IN_FLIGHT or 4). Consecutive chunks overlap by `overlap` seconds
+    (default ASR_CHUNK_OVERLAP_SEC or 5) and are merged by core.stitching:
+    words in the overlap are kept once, utterances split by a chunk boundary
+    are rejoined and speaker ids are made consistent across chunks. Every
+    segment carries its words ({"word", "start", "end"}).
+    `client` / `storage_client` can be passed to use specific backends;
+    otherwise the process-wide clients from core.clients are used.
+    `project_id` defaults to GCP_PROJECT_ID; one of them is required.
+
+    Chunks are uploaded as `upload_format` (default ASR_UPLOAD_FORMAT or
+    "flac"; "wav" and "opus" are also accepted), see split_audio_into_chunks.
+
+    `on_chunk(index, segments)` is called as each chunk finishes (in completion
+    order) with the stitched segments that became final, in timeline order
+    and with absolute timestamps, so callers can start downstream work
+    before the whole file is transcribed.
+
+    `timeout` (default ASR_TIMEOUT_SEC, unset = none) bounds the whole
+    transcription; chunks still running then are cancelled and dropped.
+    See transcribe_chunks_async for the awaitable form.
     """
     print(f"Transcribing audio (Batch Mode) with Google Cloud Speech-to-Text (Source: {source_language})...")
     
-    project_id = os.getenv("GCP_PROJECT_ID")
+    project_id = project_id or os.getenv("GCP_PROJECT_ID")
+    if not project_id:
+        print("[-] Error: Missing GCP_PROJECT_ID.")
+        return []
     gcp_region = os.getenv("GCP_REGION", "us")
-    credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
     # Get Bucket Name (Env or Fallback)
     bucket_name = os.getenv("GCS_BUCKET_NAME", "dub_poc_bucket")
     
-    if not project_id or not credentials_path:
-        print("[-] Error: Missing GCP_PROJECT_ID or GOOGLE_APPLICATION_CREDENTIALS.")
-        return []
+    if client is None:
+        # Shared per-process client: channel and auth are set up once, not per job
+        try:
+            client = clients.get("speech")
+        except RuntimeError as e:
+            print(f"[-] Error: {e}")
+            return []
         
     if not os.path.exists(audio_path):
         print(f"[-] Audio file not found: {audio_path}")
@@ -333,12 +470,8 @@ def transcribe_audio(
         print(f"  Language set to: {lang_code}")
     
     try:
-        client_options = ClientOptions(api_endpoint=f"{gcp_region}-speech.googleapis.com")
-        client = SpeechClient(client_options=client_options)
-        
         print(f"  Using GCS Bucket: {bucket_name}")
         
-        RECOGNIZER_ID = "voice-dub-chirp3-diarizer-v7"
         print(f"  --> Ensuring Recognizer '{RECOGNIZER_ID}' exists...")
         recognizer_path = create_recognizer_if_missing(
             client=client,
@@ -348,44 +481,37 @@ def transcribe_audio(
             language_codes=language_codes
         )
         
-        total_duration = get_audio_duration(audio_path)
+        # Split into chunks (Can use longer chunks now, e.g., 240s)
+        # The splitter decodes the file once, so the duration comes from it too.
+        upload_format = upload_format or os.getenv("ASR_UPLOAD_FORMAT", "flac")
+        overlap = overlap if overlap is not None else float(os.getenv("ASR_CHUNK_OVERLAP_SEC", "5"))
+        chunks = split_audio_into_chunks(audio_path, chunk_duration=240.0, overlap=overlap, encoding=upload_format)
+        total_duration = chunks[-1]["start_offset"] + chunks[-1]["duration"] if chunks else 0.0
         print(f"  Audio duration: {total_duration:.1f} seconds")
+        max_in_flight = max_in_flight or int(os.getenv("ASR_MAX_IN_FLIGHT", "4"))
+        print(f"  --> Processing {len(chunks)} {upload_format} chunks via BatchRecognize ({max_in_flight} in flight)...")
         
-        all_segments = []
-        
-        # Split into chunks (Can use longer chunks now, e.g., 240s)
-        # We process chunks sequentially to update user (could be parallelized)
-        chunks = split_audio_into_chunks(audio_path, chunk_duration=240.0)
-        print(f"  --> Processing {len(chunks)} chunks via BatchRecognize...")
+        # BatchRecognize is asynchronous server-side: every operation is awaited
+        # from one event loop, threads are only used for the blocking calls.
+        timeout = timeout if timeout is not None else float(os.getenv("ASR_TIMEOUT_SEC", "0")) or None
+        stitcher = ChunkStitcher(chunks)
+
+        def on_chunk_done(index: int, segments: List[Dict]):
+            stitcher.add(index, segments)
+            if on_chunk:
+                on_chunk(index, stitcher.pop_ready())
+
+        run_sync(transcribe_chunks_async(
+            client, chunks, recognizer_path, bucket_name, storage_client,
+            max_in_flight=max_in_flight, on_chunk=on_chunk_done, timeout=timeout
+        ))
         
-        for i, chunk in enumerate(chunks):
-            print(f"  --> Processing chunk {i+1}/{len(chunks)} (start: {chunk['start_offset']:.1f}s)...")
-            
-            try:
-                chunk_segments = transcribe_chunk_batch(
-                    client=client,
-                    local_audio_path=chunk["path"],
-                    recognizer_path=recognizer_path,
-                    bucket_name=bucket_name
-                )
-                
-                # Adjust timestamps
-                if chunk_segments:
-                    for seg in chunk_segments:
-                        seg["start"] += chunk["start_offset"]
-                        seg["end"] += chunk["start_offset"]
-                        all_segments.append(seg)
-                    print(f"      Got {len(chunk_segments)} segments.")
-                
-            except Exception as e:
-                print(f"      [!] Error processing chunk {i+1}: {e}")
-                # Optional: Import traceback and print
-            
-            # Cleanup local chunk
-            try:
-                os.remove(chunk["path"])
-            except:
-                pass
+        # Merge in timeline order
+        all_segments = stitcher.segments()
+        if len(chunks) > 1:
+            print(f"  [+] Stitched {len(chunks)} chunks ({overlap:g}s overlap): "
+                  f"{stitcher.duplicates_dropped} duplicate words dropped, "
+                  f"{stitcher.rejoined()} utterances rejoined, {stitcher.speakers_remapped} speaker tags remapped.")
         
         # Cleanup temp dir
         if chunks:
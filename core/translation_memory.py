@@ -0,0 +1,178 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import argparse
+import unicodedata
+from typing import Any, Dict, Optional
+
+# Segments whose durations fall in the same bucket share translations.
+# Duration matters because the prompt caps the word count per segment.
+DURATION_BUCKET_SEC = 1.0
+
+# Rough token estimate (~4 characters per token) used for savings metrics
+CHARS_PER_TOKEN = 4
+
+
+def normalize_text(text: str) -> str:
+    """Case-folds, NFKC-normalizes and collapses whitespace so trivial variants share an entry."""
+    text = unicodedata.normalize("NFKC", text or "").casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def duration_bucket(duration: float) -> int:
+    return int(max(0.0, duration) // DURATION_BUCKET_SEC)
+
+
+class TranslationMemory:
+    """
+    Persistent translation memory for Translator.translate_segments.
+
+    Entries are keyed by (normalized source text, target language, model
+    name, duration bucket) and stored in a single JSON file. Lookups and
+    inserts are thread-safe; `save()` writes atomically. `export_jsonl` /
+    `import_jsonl` move entries between machines or warm the memory from
+    earlier jobs.
+    """
+
+    def __init__(self, path: str = "cache/translation_memory.json"):
+        self.path = path
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+        self._dirty = False
+        self._lock = threading.Lock()
+
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (ValueError, OSError) as e:
+                print(f"⚠️ Ignoring unreadable translation memory {path}: {e}")
+
+    @staticmethod
+    def _key(source: str, target_language: str, model_name: str, bucket: int) -> str:
+        payload = json.dumps([source, target_language, model_name, bucket], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    @classmethod
+    def make_key(cls, text: str, target_language: str, model_name: str, duration: float) -> str:
+        return cls._key(normalize_text(text), target_language, model_name, duration_bucket(duration))
+
+    def get(self, text: str, target_language: str, model_name: str, duration: float) -> Optional[Dict[str, Any]]:
+        """Returns {"text", "emotion"} for a cached translation, or None."""
+        key = self.make_key(text, target_language, model_name, duration)
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            # Both the prompt line and the model output are avoided on a hit
+            self.tokens_saved += (len(text) + len(entry["text"])) // CHARS_PER_TOKEN
+            return {"text": entry["text"], "emotion": entry.get("emotion", "neutral")}
+
+    def put(self, text: str, target_language: str, model_name: str, duration: float,
+            translation: str, emotion: str = "neutral"):
+        if not text or not translation:
+            return
+        key = self.make_key(text, target_language, model_name, duration)
+        with self._lock:
+            self.entries[key] = {
+                "source": normalize_text(text),
+                "target_language": target_language,
+                "model": model_name,
+                "duration_bucket": duration_bucket(duration),
+                "text": translation,
+                "emotion": emotion,
+            }
+            self._dirty = True
+
+    def save(self):
+        """Persists the memory if anything changed since the last save."""
+        with self._lock:
+            if not self._dirty:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+
+    def export_jsonl(self, path: str) -> int:
+        """Writes one JSON entry per line. Returns the number of entries."""
+        with self._lock:
+            entries = list(self.entries.values())
+        with open(path, "w", encoding="utf-8") as f:
+            for entry in entries:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return len(entries)
+
+    def import_jsonl(self, path: str) -> int:
+        """Loads entries written by export_jsonl. Returns the number imported."""
+        count = 0
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                key = self._key(entry["source"], entry["target_language"], entry["model"], entry["duration_bucket"])
+                with self._lock:
+                    self.entries[key] = entry
+                    self._dirty = True
+                count += 1
+        return count
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "tokens_saved": self.tokens_saved,
+                "entries": len(self.entries),
+            }
+
+
+# One instance per file so concurrent jobs in this process share (and don't
+# overwrite) each other's entries
+_shared: Dict[str, TranslationMemory] = {}
+_shared_lock = threading.Lock()
+
+
+def memory_from_env() -> Optional[TranslationMemory]:
+    """
+    Returns the process-wide TranslationMemory for TRANSLATION_MEMORY_PATH.
+    Set it to an empty string to disable the memory.
+    """
+    path = os.getenv("TRANSLATION_MEMORY_PATH", "cache/translation_memory.json")
+    if not path:
+        return None
+    with _shared_lock:
+        if path not in _shared:
+            _shared[path] = TranslationMemory(path)
+        return _shared[path]
+
+
+if __name__ == "__main__":
+    # python -m core.translation_memory export tm.jsonl | import tm.jsonl
+    parser = argparse.ArgumentParser(description="Export or import the translation memory.")
+    parser.add_argument("action", choices=["export", "import"])
+    parser.add_argument("file", help="JSONL file to write or read")
+    args = parser.parse_args()
+
+    memory = memory_from_env()
+    if memory is None:
+        raise SystemExit("Translation memory is disabled (TRANSLATION_MEMORY_PATH is empty).")
+
+    if args.action == "export":
+        print(f"Exported {memory.export_jsonl(args.file)} entries to {args.file}")
+    else:
+        count = memory.import_jsonl(args.file)
+        memory.save()
+        print(f"Imported {count} entries into {memory.path}")
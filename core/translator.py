@@ -1,9 +1,14 @@
 import os
 import json
 import time
-from google import genai
-from typing import List, Dict, Any
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Optional
 from dotenv import load_dotenv
+from core.translation_memory import TranslationMemory, memory_from_env
+from core.telemetry import span, bind, record_retry
+from core import clients
 
 # Load environment variables
 load_dotenv(dotenv_path=os.path.join(os.getcwd(), ".env"))
@@ -24,8 +29,30 @@ SUPPORTED_LANGUAGES = {
     "as": "Assamese",
 }
 
+# ~4 characters per token for prompt text; translated Indic words tokenize densely
+CHARS_PER_TOKEN = 4
+OUTPUT_TOKENS_PER_WORD = 4
+
+RETRYABLE_STATUS_CODES = {429, 500, 503, 504}
+# Other failures (timeouts, connection resets, malformed JSON) are retried after a short fixed pause
+RETRY_DELAY_SEC = 2.0
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def _is_quota_error(error: Exception) -> bool:
+    """True for rate-limit / overload errors (429, 5xx) that call for the shared backoff."""
+    code = getattr(error, "code", None) or getattr(error, "status_code", None)
+    if isinstance(code, int):
+        return code in RETRYABLE_STATUS_CODES
+    message = str(error)
+    return any(marker in message for marker in ("429", "503", "RESOURCE_EXHAUSTED", "UNAVAILABLE", "overloaded"))
+
+
 class Translator:
-    def __init__(self, target_language: str = "hi"):
+    def __init__(self, target_language: str = "hi", memory: Optional[TranslationMemory] = None):
         """
         Initializes the Google Gemini Translator using Vertex AI with GCP credentials.
 
@@ -38,22 +65,14 @@ class Translator:
         Args:
             target_language: Language code (hi, ta, te, kn, ml, etc.)
                              Defaults to Hindi for backward compatibility.
+            memory: Translation memory consulted before calling Gemini. Defaults to
+                    the shared one at TRANSLATION_MEMORY_PATH ("" disables it).
         """
-        # Get GCP configuration from environment
+        # Get GCP configuration from environment (used for logging; the client
+        # itself is built and validated once per process by core.clients)
         gcp_project = os.getenv("GCP_PROJECT_ID")
-        # Use GEMINI_REGION if set, otherwise fallback to us-central1 (Required for Vertex AI models)
-        # CRITICAL: Do NOT set this to 'us' (multi-region) as it causes 404 errors for prediction endpoints.
         gcp_region = os.getenv("GEMINI_REGION", "us-central1")
         gemini_model = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
-        credentials_path = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-
-        # Validate required environment variables
-        if not gcp_project:
-            raise RuntimeError("GCP_PROJECT_ID not found. Please add it to your .env file.")
-        if not credentials_path:
-            raise RuntimeError("GOOGLE_APPLICATION_CREDENTIALS not found. Please add it to your .env file.")
-        if not os.path.exists(credentials_path):
-            raise RuntimeError(f"Service account key file not found at: {credentials_path}")
 
         if target_language not in SUPPORTED_LANGUAGES:
             raise ValueError(f"Unsupported language: {target_language}. Supported: {list(SUPPORTED_LANGUAGES.keys())}")
@@ -61,14 +80,20 @@ class Translator:
         self.target_language = target_language
         self.language_name = SUPPORTED_LANGUAGES[target_language]
 
-        # Initialize Vertex AI client with GCP credentials
-        # The GOOGLE_APPLICATION_CREDENTIALS env var is automatically used by the client
-        self.client = genai.Client(
-            vertexai=True,
-            project=gcp_project,
-            location=gcp_region
-        )
+        # Shared Vertex AI client: reuses its connection pool across jobs
+        self.client = clients.get("gemini")
         self.model_name = gemini_model
+        self.memory = memory if memory is not None else memory_from_env()
+
+        # Batch planning / dispatch
+        self.batch_token_budget = int(os.getenv("TRANSLATE_BATCH_TOKEN_BUDGET", "4000"))
+        self.max_batch_segments = int(os.getenv("TRANSLATE_MAX_BATCH_SEGMENTS", "40"))
+        self.max_in_flight = int(os.getenv("TRANSLATE_MAX_IN_FLIGHT", "4"))
+        # Caps Gemini requests across every translate_segments call on this
+        # instance (e.g. several streaming workers sharing one Translator)
+        self._request_slots = threading.BoundedSemaphore(self.max_in_flight)
+        self._backoff_until = 0.0
+        self._backoff_lock = threading.Lock()
 
         print(f"🌐 Translator initialized for: {self.language_name} ({target_language})")
         print(f"   Using Vertex AI: Project={gcp_project}, Region={gcp_region}, Model={gemini_model}")
@@ -106,15 +131,67 @@ class Translator:
             })
 
         translated_segments_map = {}
+
+        # Fill translation-memory hits first so only misses are sent to the model
+        pending_segments = detailed_segments
+        if self.memory:
+            before = self.memory.stats()
+            pending_segments = []
+            for item in detailed_segments:
+                cached = self.memory.get(item["english_dialogue"], self.target_language,
+                                         self.model_name, item["duration_sec"])
+                if cached:
+                    translated_segments_map[item["id"]] = cached
+                else:
+                    pending_segments.append(item)
+            after = self.memory.stats()
+            print(f"  💾 Translation memory: {after['hits'] - before['hits']} hits, "
+                  f"{len(pending_segments)} to translate, "
+                  f"~{after['tokens_saved'] - before['tokens_saved']} tokens saved")
+        pending_by_id = {item["id"]: item for item in pending_segments}
         
-        # Batch processing: Process in small chunks of 5 to avoid API overload and empty responses
-        BATCH_SIZE = 5
-        
-        for i in range(0, len(detailed_segments), BATCH_SIZE):
-            batch = detailed_segments[i : i + BATCH_SIZE]
-            print(f"  Processing batch {i//BATCH_SIZE + 1} ({len(batch)} segments)...")
-            
-            prompt = f"""You are a professional dubbing translator for video/film content.
+        # Batches are sized by a token budget and dispatched concurrently;
+        # backoff only happens when the API actually pushes back (429/503).
+        batches = self._plan_batches(pending_segments)
+        print(f"  Sending {len(pending_segments)} segments in {len(batches)} batches "
+              f"({self.max_in_flight} in flight)...")
+
+        batch_results: List[Dict[Any, Dict[str, str]]] = [{} for _ in batches]
+        with ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            futures = {
+                executor.submit(bind(self._translate_batch), batch, n + 1, pending_by_id): n
+                for n, batch in enumerate(batches)
+            }
+            for future in as_completed(futures):
+                batch_results[futures[future]] = future.result()
+
+        # Merge in batch order so results never depend on completion order
+        for result in batch_results:
+            translated_segments_map.update(result)
+
+        if self.memory:
+            self.memory.save()
+
+        # Map back to original segments structure using the accumulated map
+        final_segments = []
+        for seg in segments:
+            original_id = seg.get("start")
+            new_seg = seg.copy()
+            if original_id in translated_segments_map:
+                new_seg["transcript"] = translated_segments_map[original_id]["text"]
+                new_seg["emotion"] = translated_segments_map[original_id]["emotion"]
+                print(f"  ✅ [{original_id:.1f}s] Speaker {seg.get('speaker', 0)}: {new_seg['transcript'][:40]}...")
+            else:
+                print(f"  ⚠️ Missing translation for segment at {original_id}s")
+            final_segments.append(new_seg)
+
+        print(f"✅ Translation complete: {len(final_segments)} segments in {self.language_name}")
+        return final_segments
+
+
+    def _build_prompt(self, batch: List[Dict[str, Any]]) -> str:
+        """Builds the Gemini dubbing prompt for one batch of detailed segments."""
+        return f"""You are a professional dubbing translator for video/film content.
 Translate the English dialogues to {self.language_name} and detect emotion.
 
 CRITICAL RULES FOR DUBBING:
@@ -150,12 +227,74 @@ Input Segments (with English dialogue and timing):
 
 Return ONLY the JSON array, no other text."""
 
-            # Retry logic for 503 Service Unavailable / Overload
-            MAX_RETRIES = 3
-            success = False
-            
-            for attempt in range(MAX_RETRIES):
-                try:
+    def _plan_batches(self, items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """
+        Groups segments into batches that fit a token budget (prompt + expected
+        output) instead of a fixed count. Long segments get small batches;
+        short lines are packed together.
+        """
+        base_tokens = _estimate_tokens(self._build_prompt([]))
+        batches: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        current_tokens = base_tokens
+
+        for item in items:
+            input_tokens = _estimate_tokens(json.dumps(item, indent=2, ensure_ascii=False))
+            # Output: translated words (Indic scripts tokenize densely) + JSON overhead
+            output_tokens = item["max_words_allowed"] * OUTPUT_TOKENS_PER_WORD + 30
+            item_tokens = input_tokens + output_tokens
+
+            if current and (current_tokens + item_tokens > self.batch_token_budget
+                            or len(current) >= self.max_batch_segments):
+                batches.append(current)
+                current, current_tokens = [], base_tokens
+
+            current.append(item)
+            current_tokens += item_tokens
+
+        if current:
+            batches.append(current)
+        return batches
+
+    def _wait_for_backoff(self):
+        """Blocks while a shared backoff (set after a 429/503) is in effect."""
+        while True:
+            with self._backoff_lock:
+                remaining = self._backoff_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def _set_backoff(self, seconds: float):
+        with self._backoff_lock:
+            self._backoff_until = max(self._backoff_until, time.monotonic() + seconds)
+
+    def _translate_batch(
+        self,
+        batch: List[Dict[str, Any]],
+        batch_no: int,
+        pending_by_id: Dict[Any, Dict[str, Any]]
+    ) -> Dict[Any, Dict[str, str]]:
+        """
+        Translates one batch with retries. Returns {segment id: {"text", "emotion"}}.
+
+        Rate-limit / overload errors (429, 5xx) put every worker into a shared
+        exponential backoff; empty responses are retried after 1 s and other
+        errors after RETRY_DELAY_SEC, without slowing the other batches. After
+        MAX_RETRIES attempts the batch is given up (its segments stay untranslated).
+        """
+        print(f"  Processing batch {batch_no} ({len(batch)} segments)...")
+        prompt = self._build_prompt(batch)
+
+        # Retry logic for 429 / 503 Service Unavailable / Overload
+        MAX_RETRIES = 4
+        results: Dict[Any, Dict[str, str]] = {}
+
+        for attempt in range(MAX_RETRIES):
+            self._wait_for_backoff()
+            try:
+                with self._request_slots, \
+                        span("gemini.generate_content", batch=batch_no, segments=len(batch), attempt=attempt + 1):
                     response = self.client.models.generate_content(
                         model=self.model_name,
                         contents=prompt,
@@ -167,62 +306,52 @@ Return ONLY the JSON array, no other text."""
                         },
                     )
 
-                    batch_data = response.parsed
-                    if batch_data:
-                        for item in batch_data:
-                            # Handle both object attributes (dot notation) and dictionary keys
-                            if isinstance(item, dict):
-                                item_id = item.get("id")
-                                item_text = item.get("text")
-                                item_emotion = item.get("emotion", "neutral")
-                            else:
-                                item_id = item.id
-                                item_text = item.text
-                                item_emotion = getattr(item, "emotion", "neutral")
-
-                            translated_segments_map[item_id] = {
-                                "text": item_text,
-                                "emotion": item_emotion
-                            }
-                        success = True
-                        break # Success, exit retry loop
-                    else:
-                        print(f"  ⚠️ Warning: Batch {i//BATCH_SIZE + 1} returned None (empty). Raw Response: {response.text}")
-                        # This can happen on transient model errors, so we SHOULD retry
-                        # Fall through to exception-like retry logic
-                        time.sleep(2)
-
-                except Exception as e:
-                    print(f"  ⚠️ Batch {i//BATCH_SIZE + 1} attempt {attempt+1}/{MAX_RETRIES} failed: {e}")
-                
-                # Retry logic for both Exception and None result
-                if not success:
-                    if attempt < MAX_RETRIES - 1:
-                        wait_time = (2 ** attempt) * 5 # 5s, 10s, 20s
-                        print(f"     Retrying in {wait_time}s...")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"  ❌ Batch {i//BATCH_SIZE + 1} permanently failed.")
-
-            if success:
-                time.sleep(2) # Increased delay between batches for safety
-
-        # Map back to original segments structure using the accumulated map
-        final_segments = []
-        for seg in segments:
-            original_id = seg.get("start")
-            new_seg = seg.copy()
-            if original_id in translated_segments_map:
-                new_seg["transcript"] = translated_segments_map[original_id]["text"]
-                new_seg["emotion"] = translated_segments_map[original_id]["emotion"]
-                print(f"  ✅ [{original_id:.1f}s] Speaker {seg.get('speaker', 0)}: {new_seg['transcript'][:40]}...")
-            else:
-                print(f"  ⚠️ Missing translation for segment at {original_id}s")
-            final_segments.append(new_seg)
-
-        print(f"✅ Translation complete: {len(final_segments)} segments in {self.language_name}")
-        return final_segments
-
+                batch_data = response.parsed
+                if batch_data:
+                    for item in batch_data:
+                        # Handle both object attributes (dot notation) and dictionary keys
+                        if isinstance(item, dict):
+                            item_id = item.get("id")
+                            item_text = item.get("text")
+                            item_emotion = item.get("emotion", "neutral")
+                        else:
+                            item_id = item.id
+                            item_text = item.text
+                            item_emotion = getattr(item, "emotion", "neutral")
+
+                        results[item_id] = {
+                            "text": item_text,
+                            "emotion": item_emotion
+                        }
+
+                        source = pending_by_id.get(item_id)
+                        if self.memory and source:
+                            self.memory.put(source["english_dialogue"], self.target_language,
+                                            self.model_name, source["duration_sec"],
+                                            item_text, item_emotion)
+                    return results
+
+                # This can happen on transient model errors, so retry (no quota backoff needed)
+                print(f"  ⚠️ Warning: Batch {batch_no} returned None (empty). Raw Response: {response.text}")
+                wait_time = 1.0
+
+            except Exception as e:
+                print(f"  ⚠️ Batch {batch_no} attempt {attempt+1}/{MAX_RETRIES} failed: {e}")
+                if _is_quota_error(e):
+                    # Exponential backoff with jitter, shared by all in-flight batches
+                    wait_time = (2 ** attempt) * 5 * (1 + random.random() * 0.25)
+                    self._set_backoff(wait_time)
+                else:
+                    # Only this batch failed: retry it without slowing the others
+                    wait_time = RETRY_DELAY_SEC
+
+            if attempt < MAX_RETRIES - 1:
+                record_retry("translator")
+                print(f"     Retrying batch {batch_no} in {wait_time:.1f}s...")
+                time.sleep(wait_time)
+
+        print(f"  ❌ Batch {batch_no} permanently failed.")
+        return results
 
     def translate(self, text: str) -> str:
         """Single text translation (Legacy support)"""
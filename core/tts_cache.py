@@ -0,0 +1,186 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+
+class TTSCache:
+    """
+    Content-addressed on-disk cache for synthesized speech.
+
+    Entries are keyed by a SHA-256 of every parameter that affects the audio
+    (text, voice, model, voice settings, output format), so the same line is
+    only billed once no matter which job or video asks for it. The cache is
+    capped at `max_bytes`; the least recently used entries are evicted first
+    (recency is tracked in memory and persisted through the file mtime, which
+    is bumped on every hit so the order survives restarts).
+    """
+
+    def __init__(self, cache_dir: str = "cache/tts", max_bytes: int = 1024 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # LRU index: key -> size in bytes, oldest first
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._load_index()
+
+    def _load_index(self):
+        """Rebuilds the LRU index from the files already on disk."""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((st.st_mtime, name, st.st_size))
+
+        with self._lock:
+            self._index.clear()
+            self._total_bytes = 0
+            for _, key, size in sorted(entries):
+                self._index[key] = size
+                self._total_bytes += size
+
+    @staticmethod
+    def make_key(text: str, voice_id: str, model_id: str, voice_settings: Dict[str, Any], output_format: str) -> str:
+        """Returns the hex digest identifying one synthesis request."""
+        payload = json.dumps({
+            "text": text,
+            "voice_id": voice_id,
+            "model_id": model_id,
+            "voice_settings": voice_settings,
+            "output_format": output_format,
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        # Two-level fan-out keeps directories small on large caches
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def get(self, key: str, output_path: str) -> Optional[str]:
+        """Copies the cached audio to `output_path` and returns it, or None on a miss."""
+        entry = self._entry_path(key)
+        with self._lock:
+            if key not in self._index or not os.path.exists(entry):
+                self.misses += 1
+                return None
+            # Mark as recently used
+            self._index.move_to_end(key)
+            os.utime(entry, None)
+
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        try:
+            shutil.copyfile(entry, output_path)
+        except OSError:
+            # Evicted by another worker between the lookup and the copy, or unreadable
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return output_path
+
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """Returns the cached audio as bytes, or None on a miss."""
+        entry = self._entry_path(key)
+        with self._lock:
+            if key not in self._index or not os.path.exists(entry):
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            os.utime(entry, None)
+
+        try:
+            with open(entry, "rb") as f:
+                data = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, source_path: str):
+        """Stores a copy of `source_path` under `key` and enforces the size cap."""
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+
+        # Write to a temp name and rename so readers never see a partial file
+        tmp_path = f"{entry}.{threading.get_ident()}.tmp"
+        shutil.copyfile(source_path, tmp_path)
+        os.replace(tmp_path, entry)
+        self._record(key, os.path.getsize(entry))
+
+    def put_bytes(self, key: str, data: bytes):
+        """Stores `data` under `key` and enforces the size cap."""
+        entry = self._entry_path(key)
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+
+        tmp_path = f"{entry}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, entry)
+        self._record(key, len(data))
+
+    def _record(self, key: str, size: int):
+        with self._lock:
+            self._total_bytes += size - self._index.pop(key, 0)
+            self._index[key] = size
+            self._evict()
+
+    def _evict(self):
+        """Removes least recently used entries until the cache fits in max_bytes."""
+        while self._total_bytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(self._entry_path(key))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit/miss counters for reporting."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "entries": len(self._index),
+                "bytes": self._total_bytes,
+            }
+
+
+# One instance per directory, so concurrent jobs in this process share the
+# LRU index and byte total the size cap is enforced against
+_shared: Dict[str, TTSCache] = {}
+_shared_lock = threading.Lock()
+
+
+def cache_from_env() -> Optional[TTSCache]:
+    """
+    Returns the process-wide TTSCache for TTS_CACHE_DIR (capped at
+    TTS_CACHE_MAX_MB, read when the directory is first used).
+    Set TTS_CACHE_DIR to an empty string to disable caching.
+    """
+    cache_dir = os.getenv("TTS_CACHE_DIR", "cache/tts")
+    if not cache_dir:
+        return None
+    key = os.path.abspath(cache_dir)
+    with _shared_lock:
+        if key not in _shared:
+            max_mb = float(os.getenv("TTS_CACHE_MAX_MB", "1024"))
+            _shared[key] = TTSCache(cache_dir=cache_dir, max_bytes=int(max_mb * 1024 * 1024))
+        return _shared[key]
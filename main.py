@@ -1,15 +1,23 @@
 import os
 import time
-import shutil
+import threading
 import uvicorn
 from fastapi import FastAPI, Request, Form, UploadFile, File
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from core.pipeline import process_video
 from core.translator import SUPPORTED_LANGUAGES
+from core.jobs import QueueFullError, manager_from_env
+from core.ingest import ResultIndex, UploadLimitMiddleware, UploadTooLargeError, ingest_upload
+from core.telemetry import render_prometheus
+from core.separator import get_engine
+from core import clients
 
 app = FastAPI()
+# Oversized uploads are refused before FastAPI spools the form to disk
+app.add_middleware(UploadLimitMiddleware)
 
 # Mount static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -22,6 +30,95 @@ templates = Jinja2Templates(directory="templates")
 os.makedirs("input", exist_ok=True)
 os.makedirs("output", exist_ok=True)
 
+def run_dubbing_job(
+    source_lang: str,
+    target_lang: str,
+    video_path: str = "",
+    youtube_url: str = "",
+    upload_time: float = 0.0,
+    input_hash: str = ""
+) -> dict:
+    """
+    Runs on a background worker: downloads the video if needed, then dubs it.
+    Returns the context used to render result.html.
+    """
+    download_time = 0.0
+
+    if youtube_url:
+        # Handle YouTube URL
+        import yt_dlp
+        print(f"Downloading YouTube URL: {youtube_url}")
+        t0 = time.time()
+        
+        ydl_opts = {
+            'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+            'outtmpl': 'input/%(title)s.%(ext)s',
+            'noplaylist': True,
+        }
+        
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(youtube_url, download=True)
+            video_path = ydl.prepare_filename(info)
+        
+        download_time = time.time() - t0
+        print(f"Download finished: {video_path} in {download_time:.2f}s")
+
+    result = process_video(video_path, source_lang, target_lang, input_hash=input_hash or None)
+
+    context = {
+        "upload_time": upload_time,
+        "download_time": download_time,
+        "timings": result["timings"],
+        "transcription": result["transcription"],
+        "output_video": f"/output/{os.path.basename(result['output_video_path'])}",
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        "utilization": result.get("utilization")
+    }
+
+    # Remember the result so an identical upload can short-circuit next time
+    if os.path.exists(result["output_video_path"]):
+        results_index.put(result["input_hash"], source_lang, target_lang,
+                          dict(context, output_video_path=result["output_video_path"]))
+
+    return context
+
+# Finished results keyed by (content hash, source, target)
+results_index = ResultIndex()
+
+# Background workers: /process only enqueues, so the event loop stays free
+jobs = manager_from_env(run_dubbing_job)
+
+@app.on_event("startup")
+def start_workers():
+    jobs.start()
+    # Load the Demucs weights in the background so the first job starts warm
+    get_engine().start(preload=os.getenv("DEMUCS_PRELOAD", "1") == "1")
+    # Build the shared backend clients and open their connections off the
+    # request path, so the first job does not pay auth and TLS setup
+    if os.getenv("CLIENTS_WARMUP", "1") == "1":
+        threading.Thread(target=clients.warm_up, name="clients-warmup", daemon=True).start()
+
+@app.on_event("shutdown")
+def stop_workers():
+    jobs.shutdown()
+
+def wants_json(request: Request) -> bool:
+    return "application/json" in request.headers.get("accept", "")
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    # Refresh job gauges, then export everything in Prometheus text format
+    jobs.stats()
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+@app.get("/health")
+async def health():
+    # Health checks make network calls; keep them off the event loop
+    report = await run_in_threadpool(clients.health)
+    ok = all(r["ok"] for r in report.values())
+    return JSONResponse({"ok": ok, "clients": report}, status_code=200 if ok else 503)
+
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
     return templates.TemplateResponse("index.html", {
@@ -38,7 +135,6 @@ async def process_dubbing(
     youtube_url: str = Form(None)
 ):
     upload_time = 0.0
-    download_time = 0.0
     video_path = ""
     
     # Validation
@@ -49,54 +145,61 @@ async def process_dubbing(
             "languages": SUPPORTED_LANGUAGES
         })
 
+    input_hash = ""
+
     try:
-        if youtube_url:
-            # Handle YouTube URL
-            import yt_dlp
-            print(f"Downloading YouTube URL: {youtube_url}")
+        if not youtube_url and video_file:
+            # Handle File Upload: streamed to input/<sha256><ext>, hashed while writing
             t0 = time.time()
+            print(f"Receiving upload: {video_file.filename}")
             
-            ydl_opts = {
-                'format': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-                'outtmpl': 'input/%(title)s.%(ext)s',
-                'noplaylist': True,
-            }
-            
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(youtube_url, download=True)
-                filename = ydl.prepare_filename(info)
-                video_path = filename
-            
-            download_time = time.time() - t0
-            print(f"Download finished: {video_path} in {download_time:.2f}s")
-            
-        elif video_file:
-            # Handle File Upload
-            t0 = time.time()
-            video_path = f"input/{video_file.filename}"
-            print(f"Saving uploaded file to: {video_path}")
-            
-            with open(video_path, "wb") as buffer:
-                shutil.copyfileobj(video_file.file, buffer)
+            # Inputs of queued and running jobs are never evicted from the store
+            stored = await ingest_upload(video_file, pinned=lambda: jobs.active_values("video_path"))
+            video_path = stored["path"]
+            input_hash = stored["sha256"]
             
             upload_time = time.time() - t0
-            print(f"Upload finished in {upload_time:.2f}s")
+            print(f"Upload finished in {upload_time:.2f}s ({stored['size'] / 1e6:.1f} MB) -> {video_path}")
 
-        # Process Video
-        result = process_video(video_path, source_lang, target_lang)
-        
-        # Prepare context for result page
-        return templates.TemplateResponse("result.html", {
+            # Same content already dubbed for this language pair: serve it directly
+            cached = results_index.get(input_hash, source_lang, target_lang)
+            if cached:
+                print(f"♻️  Reusing previous result for {input_hash[:12]}")
+                if wants_json(request):
+                    return JSONResponse({"status": "done", "result": dict(cached, upload_time=upload_time)})
+                return templates.TemplateResponse("result.html", {
+                    "request": request, **dict(cached, upload_time=upload_time, download_time=0.0)
+                })
+
+        # Queue the job; the download (if any) and dubbing run on a worker
+        job = jobs.submit(
+            source_lang=source_lang,
+            target_lang=target_lang,
+            video_path=video_path,
+            youtube_url=youtube_url or "",
+            upload_time=upload_time,
+            input_hash=input_hash
+        )
+        print(f"Queued job {job.id}")
+
+    except UploadTooLargeError as e:
+        if wants_json(request):
+            return JSONResponse({"error": str(e)}, status_code=413)
+        return templates.TemplateResponse("index.html", {
             "request": request,
-            "upload_time": upload_time,
-            "download_time": download_time,
-            "timings": result["timings"],
-            "transcription": result["transcription"],
-            "output_video": f"/output/{os.path.basename(result['output_video_path'])}",
-            "source_lang": source_lang,
-            "target_lang": target_lang
-        })
-        
+            "error": str(e),
+            "languages": SUPPORTED_LANGUAGES
+        }, status_code=413)
+
+    except QueueFullError as e:
+        if wants_json(request):
+            return JSONResponse({"error": str(e)}, status_code=503)
+        return templates.TemplateResponse("index.html", {
+            "request": request,
+            "error": str(e),
+            "languages": SUPPORTED_LANGUAGES
+        }, status_code=503)
+
     except Exception as e:
         import traceback
         traceback.print_exc()
@@ -106,5 +209,36 @@ async def process_dubbing(
             "languages": SUPPORTED_LANGUAGES
         })
 
+    if wants_json(request):
+        return JSONResponse({"job_id": job.id, "status_url": f"/jobs/{job.id}"}, status_code=202)
+    return RedirectResponse(url=f"/jobs/{job.id}", status_code=303)
+
+@app.get("/jobs/{job_id}", response_class=HTMLResponse)
+async def job_status(request: Request, job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        if wants_json(request):
+            return JSONResponse({"error": "Unknown job id"}, status_code=404)
+        return templates.TemplateResponse("index.html", {
+            "request": request,
+            "error": "Job not found (it may have expired).",
+            "languages": SUPPORTED_LANGUAGES
+        }, status_code=404)
+
+    if wants_json(request):
+        return JSONResponse(job.to_dict())
+
+    if job.status == "done":
+        return templates.TemplateResponse("result.html", {"request": request, **job.result})
+
+    if job.status == "failed":
+        return templates.TemplateResponse("index.html", {
+            "request": request,
+            "error": f"Error processing video: {job.error}",
+            "languages": SUPPORTED_LANGUAGES
+        })
+
+    return templates.TemplateResponse("job.html", {"request": request, "job": job})
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="127.0.0.1", port=5000, reload=True)
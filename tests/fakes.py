@@ -0,0 +1,442 @@
+"""
+Local stand-ins for the external backends: Google Speech-to-Text v2 and
+Cloud Storage, Gemini (google-genai), ElevenLabs and the Demucs engine.
+
+They implement just the surface the pipeline uses, so the whole of
+process_video can run offline (see benchmarks/bench_pipeline.py and the
+tests in this directory).
+Behaviour is deterministic: ASR transcripts are derived from the audio
+duration, translations and speech from the input text, and latency is a
+fixed, configurable delay. Injected failures (`error_rate`) are decided by
+hashing the request and its attempt number with `seed`, so the same run
+fails the same requests regardless of thread scheduling.
+"""
+import io
+import os
+import json
+import time
+import wave
+import shutil
+import hashlib
+import threading
+from datetime import timedelta
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from core.pcm_store import is_pcm, read_meta, sidecar_path, decode_to_pcm
+from core.media_probe import flac_info, opus_info
+from core.separator import SeparationEngine, asr_view_path, ASR_SAMPLE_RATE
+
+
+class FakeAPIError(Exception):
+    """Injected backend failure; `code` is the HTTP-style status the real SDKs expose."""
+
+    def __init__(self, message: str, code: int = 503):
+        super().__init__(f"{code} {message}")
+        self.code = code
+
+
+class FaultInjector:
+    """Fails a fraction `error_rate` of attempts, chosen by hashing (seed, request key, attempt)."""
+
+    def __init__(self, error_rate: float = 0.0, seed: int = 0):
+        self.error_rate = error_rate
+        self.seed = seed
+        self.failures = 0
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def should_fail(self, key: str) -> bool:
+        if self.error_rate <= 0:
+            return False
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+        digest = hashlib.sha256(f"{self.seed}:{key}:{attempt}".encode("utf-8")).digest()
+        failed = int.from_bytes(digest[:8], "big") / 2.0 ** 64 < self.error_rate
+        if failed:
+            with self._lock:
+                self.failures += 1
+        return failed
+
+
+class FakeBlob:
+    def __init__(self, bucket: "FakeBucket", name: str):
+        self.bucket = bucket
+        self.name = name
+        self.chunk_size: Optional[int] = None
+
+    def upload_from_filename(self, filename: str, if_generation_match: Optional[int] = None, **kwargs):
+        with open(filename, "rb") as f:
+            data = f.read()
+        # Like the real client: conditional uploads are retried, others are not
+        self.bucket.client._upload(self.bucket.name, self.name, data, filename,
+                                   self.chunk_size, retry=if_generation_match is not None)
+
+    def delete(self, **kwargs):
+        self.bucket.client._delete(self.bucket.name, self.name)
+
+
+class FakeBucket:
+    def __init__(self, client: "FakeStorageClient", name: str):
+        self.client = client
+        self.name = name
+
+    def blob(self, blob_name: str) -> FakeBlob:
+        return FakeBlob(self, blob_name)
+
+    def exists(self, **kwargs) -> bool:
+        return True
+
+
+class FakeStorageClient:
+    """
+    In-memory GCS stand-in. Tracks uploaded bytes, requests and live objects.
+
+    Each upload request costs `upload_latency` plus its size over
+    `bandwidth_mbps` (if set). A blob with `chunk_size` is uploaded as a
+    resumable upload: one request per part, and a failed part is resent on
+    its own instead of restarting the object.
+    """
+
+    def __init__(self, upload_latency: float = 0.0, bandwidth_mbps: Optional[float] = None,
+                 error_rate: float = 0.0, seed: int = 0, max_retries: int = 3):
+        self.upload_latency = upload_latency
+        self.bandwidth_mbps = bandwidth_mbps
+        self.max_retries = max_retries
+        self.faults = FaultInjector(error_rate, seed)
+        self.objects: Dict[str, bytes] = {}
+        self.local_paths: Dict[str, str] = {}
+        self.bytes_uploaded = 0
+        self.bytes_sent = 0
+        self.uploads = 0
+        self.upload_requests = 0
+        self.retries = 0
+        self.deletes = 0
+        self._lock = threading.Lock()
+
+    def bucket(self, bucket_name: str) -> FakeBucket:
+        return FakeBucket(self, bucket_name)
+
+    def _send(self, size: int):
+        delay = self.upload_latency
+        if self.bandwidth_mbps:
+            delay += size * 8 / (self.bandwidth_mbps * 1e6)
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            self.upload_requests += 1
+            self.bytes_sent += size
+
+    def _upload(self, bucket_name: str, blob_name: str, data: bytes, local_path: str,
+                chunk_size: Optional[int] = None, retry: bool = False):
+        uri = f"gs://{bucket_name}/{blob_name}"
+        step = chunk_size or max(1, len(data))
+        parts = [data[i:i + step] for i in range(0, len(data), step)] or [b""]
+        attempts = 1 + (self.max_retries if retry else 0)
+        for number, part in enumerate(parts):
+            for attempt in range(attempts):
+                self._send(len(part))
+                if not self.faults.should_fail(f"{uri}#{number}"):
+                    break
+                if attempt == attempts - 1:
+                    raise FakeAPIError("upload failed (injected)")
+                with self._lock:
+                    self.retries += 1
+
+        with self._lock:
+            self.objects[uri] = data
+            self.local_paths[uri] = local_path
+            self.bytes_uploaded += len(data)
+            self.uploads += 1
+
+    def _delete(self, bucket_name: str, blob_name: str):
+        uri = f"gs://{bucket_name}/{blob_name}"
+        with self._lock:
+            self.objects.pop(uri, None)
+            self.deletes += 1
+
+    def duration_of(self, uri: str) -> float:
+        """Returns the duration of an uploaded WAV, FLAC or Ogg Opus object (0.0 if unknown)."""
+        with self._lock:
+            data = self.objects.get(uri)
+        if data is None:
+            return 0.0
+        if data[:4] == b"fLaC":
+            info = flac_info(data[:42])
+            return info["duration"] if info else 0.0
+        if data[:4] == b"OggS":
+            info = opus_info(data[:4096], data[-65536:])
+            return info["duration"] if info else 0.0
+        try:
+            with wave.open(io.BytesIO(data), "rb") as wf:
+                return wf.getnframes() / float(wf.getframerate())
+        except (wave.Error, EOFError):
+            return 0.0
+
+
+class FakeOperation:
+    """
+    Long-running operation that completes `latency` seconds after creation.
+    `polls` counts done() calls; result() of a cancelled operation raises,
+    as with a real one.
+    """
+
+    def __init__(self, response, latency: float):
+        self._response = response
+        self._ready_at = time.monotonic() + latency
+        self._cancelled = False
+        self.polls = 0
+
+    def done(self) -> bool:
+        self.polls += 1
+        return self._finished()
+
+    def _finished(self) -> bool:
+        return self._cancelled or time.monotonic() >= self._ready_at
+
+    def cancel(self):
+        self._cancelled = True
+
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def result(self, timeout: Optional[float] = None):
+        remaining = self._ready_at - time.monotonic()
+        if remaining > 0 and not self._cancelled:
+            if timeout is not None and timeout < remaining:
+                time.sleep(timeout)
+                raise TimeoutError("Operation did not complete within the designated timeout.")
+            time.sleep(remaining)
+        if self._cancelled:
+            raise FakeAPIError("Operation was cancelled", code=1)
+        return self._response
+
+
+def _offset(seconds: float) -> timedelta:
+    return timedelta(seconds=seconds)
+
+
+def synthetic_words(duration: float, words_per_phrase: int = 6, word_len: float = 0.4, pause: float = 1.0) -> List[SimpleNamespace]:
+    """
+    Builds a deterministic word list covering `duration` seconds: phrases of
+    `words_per_phrase` words separated by `pause`, alternating speakers 1 and 2.
+    """
+    words = []
+    t = 0.1
+    phrase = 0
+    while t + word_len <= duration:
+        for n in range(words_per_phrase):
+            if t + word_len > duration:
+                break
+            words.append(SimpleNamespace(
+                word=f"w{phrase}_{n}",
+                start_offset=_offset(t),
+                end_offset=_offset(t + word_len),
+                speaker_tag=1 + (phrase % 2),
+                speaker_label=str(1 + (phrase % 2)),
+            ))
+            t += word_len + 0.05
+        t += pause
+        phrase += 1
+    return words
+
+
+class FakeSpeechClient:
+    """
+    Speech v2 stand-in supporting get/create_recognizer and batch_recognize.
+
+    Transcripts are generated from the uploaded audio's duration via
+    `storage_client`, so the same chunk always yields the same words.
+    """
+
+    def __init__(self, storage_client: FakeStorageClient, latency: float = 0.5, error_rate: float = 0.0, seed: int = 0):
+        self.storage_client = storage_client
+        self.latency = latency
+        self.faults = FaultInjector(error_rate, seed)
+        self.requests = 0
+        self.max_in_flight = 0
+        self.operations: List[FakeOperation] = []
+        self._in_flight: List[FakeOperation] = []
+        self._lock = threading.Lock()
+
+    @property
+    def polls(self) -> int:
+        """done() checks made on every batch_recognize operation so far."""
+        with self._lock:
+            return sum(op.polls for op in self.operations)
+
+    def get_recognizer(self, name: str):
+        return SimpleNamespace(name=name)
+
+    def create_recognizer(self, request=None):
+        return FakeOperation(SimpleNamespace(name=getattr(request, "recognizer_id", "")), 0.0)
+
+    def batch_recognize(self, request=None):
+        results = {}
+        for file_meta in request.files:
+            uri = file_meta.uri
+            if self.faults.should_fail(uri):
+                results[uri] = SimpleNamespace(
+                    error=SimpleNamespace(code=14, message="UNAVAILABLE (injected)"),
+                    transcript=SimpleNamespace(results=[]),
+                )
+                continue
+            words = synthetic_words(self.storage_client.duration_of(uri))
+            alternative = SimpleNamespace(transcript=" ".join(w.word for w in words), words=words)
+            results[uri] = SimpleNamespace(
+                error=SimpleNamespace(code=0, message=""),
+                transcript=SimpleNamespace(results=[SimpleNamespace(alternatives=[alternative])] if words else []),
+            )
+
+        operation = FakeOperation(SimpleNamespace(results=results), self.latency)
+        with self._lock:
+            self.requests += 1
+            self.operations.append(operation)
+            self._in_flight = [op for op in self._in_flight if not op._finished()] + [operation]
+            self.max_in_flight = max(self.max_in_flight, len(self._in_flight))
+        return operation
+
+
+class _FakeModels:
+    def __init__(self, client: "FakeGeminiClient"):
+        self.client = client
+
+    def generate_content(self, model: str = "", contents: str = "", config: Optional[Dict[str, Any]] = None):
+        return self.client._generate(contents, config or {})
+
+    def get(self, model: str = ""):
+        return SimpleNamespace(name=model)
+
+
+class FakeGeminiClient:
+    """
+    google-genai stand-in for `models.generate_content` with a JSON schema.
+
+    The dubbing prompt's input segments are parsed back out and "translated"
+    by keeping the first `max_words_allowed` words, so batching, retries and
+    result mapping in core/translator.py all run for real.
+    """
+
+    def __init__(self, latency: float = 0.5, error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.faults = FaultInjector(error_rate, seed)
+        self.models = _FakeModels(self)
+        self.requests = 0
+        self.segments = 0
+        self._lock = threading.Lock()
+
+    def _generate(self, contents: str, config: Dict[str, Any]):
+        with self._lock:
+            self.requests += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if self.faults.should_fail(hashlib.sha256(contents.encode("utf-8")).hexdigest()):
+            raise FakeAPIError("UNAVAILABLE: model overloaded (injected)")
+
+        if (config.get("response_schema") or {}).get("type") == "object":
+            text = contents.split(": ", 1)[-1]
+            return SimpleNamespace(parsed=SimpleNamespace(text=text), text=json.dumps({"text": text}))
+
+        start = contents.find("[", contents.find("Input Segments"))
+        items, _ = json.JSONDecoder().raw_decode(contents, start)
+        parsed = [
+            {
+                "id": item["id"],
+                "speaker": item.get("speaker", 0),
+                "text": " ".join(item["english_dialogue"].split()[:item["max_words_allowed"]]),
+                "emotion": "neutral",
+            }
+            for item in items
+        ]
+        with self._lock:
+            self.segments += len(parsed)
+        return SimpleNamespace(parsed=parsed, text=json.dumps(parsed, ensure_ascii=False))
+
+
+class _FakeTextToSpeech:
+    def __init__(self, client: "FakeElevenLabs"):
+        self.client = client
+
+    def convert(self, text: str = "", voice_id: str = "", model_id: str = "",
+                output_format: str = "pcm_44100", voice_settings=None) -> Iterator[bytes]:
+        return self.client._convert(text, voice_id, output_format)
+
+
+class FakeElevenLabs:
+    """
+    ElevenLabs stand-in for `text_to_speech.convert` with raw PCM output.
+
+    Speech is a tone per voice, `words_per_second` long per word, streamed in
+    `chunk_bytes` pieces after `latency` seconds (time to first byte).
+    """
+
+    def __init__(self, latency: float = 0.3, error_rate: float = 0.0, seed: int = 0,
+                 words_per_second: float = 2.5, chunk_bytes: int = 8192):
+        self.latency = latency
+        self.faults = FaultInjector(error_rate, seed)
+        self.words_per_second = words_per_second
+        self.chunk_bytes = chunk_bytes
+        self.text_to_speech = _FakeTextToSpeech(self)
+        self.models = SimpleNamespace(list=lambda: [SimpleNamespace(model_id="eleven_multilingual_v2")])
+        self.requests = 0
+        self.characters = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def _convert(self, text: str, voice_id: str, output_format: str) -> Iterator[bytes]:
+        if not output_format.startswith("pcm_"):
+            raise ValueError(f"FakeElevenLabs only produces raw PCM (pcm_<rate>), not {output_format}")
+        with self._lock:
+            self.requests += 1
+            self.characters += len(text)
+        if self.faults.should_fail(f"{voice_id}:{text}"):
+            raise FakeAPIError("too_many_requests (injected)", code=429)
+
+        sample_rate = int(output_format.split("_")[1])
+        duration = max(0.3, len(text.split()) / self.words_per_second)
+        frequency = 180 + int(hashlib.sha256(voice_id.encode("utf-8")).hexdigest()[:2], 16)
+        t = np.arange(int(duration * sample_rate), dtype=np.float32) / sample_rate
+        data = (0.2 * np.sin(2 * np.pi * frequency * t) * 32767).astype("<i2").tobytes()
+        return self._stream(data)
+
+    def _stream(self, data: bytes) -> Iterator[bytes]:
+        if self.latency:
+            time.sleep(self.latency)
+        for i in range(0, len(data), self.chunk_bytes):
+            chunk = data[i:i + self.chunk_bytes]
+            with self._lock:
+                self.bytes_sent += len(chunk)
+            yield chunk
+
+
+class FakeSeparationEngine(SeparationEngine):
+    """
+    SeparationEngine that skips Demucs: both stems are copies of the input
+    PCM artifact and the ASR view is resampled by ffmpeg. Install it with
+    core.separator.set_engine. `latency_per_minute` simulates model time.
+    """
+
+    def __init__(self, latency_per_minute: float = 0.0):
+        super().__init__(model_name="fake")
+        self.latency_per_minute = latency_per_minute
+        self.requests = 0
+
+    def _load(self):
+        self.model = self.model_name
+
+    def _separate(self, audio_path: str, vocals_path: str, background_path: str):
+        if not is_pcm(audio_path):
+            raise ValueError(f"FakeSeparationEngine expects a PCM artifact, got {audio_path}")
+        self.requests += 1
+        if self.latency_per_minute:
+            meta = read_meta(audio_path)
+            time.sleep(meta["frames"] / float(meta["sample_rate"]) / 60.0 * self.latency_per_minute)
+
+        os.makedirs(os.path.dirname(vocals_path), exist_ok=True)
+        for stem in (vocals_path, background_path):
+            shutil.copyfile(audio_path, stem)
+            shutil.copyfile(sidecar_path(audio_path), sidecar_path(stem))
+        decode_to_pcm(audio_path, asr_view_path(vocals_path), sample_rate=ASR_SAMPLE_RATE, channels=1)
@@ -0,0 +1,74 @@
+"""
+StageManifest: concurrent jobs sharing one job dir.
+"""
+import threading
+
+from core.checkpoint import StageManifest
+
+
+def write_artifact(path, size: int) -> str:
+    path.write_bytes(b"x" * size)
+    return str(path)
+
+
+def test_concurrent_records_all_survive(tmp_path):
+    job_dir = str(tmp_path / "job")
+    # Each thread has its own manifest object, read before either records
+    # anything, like two jobs (or processes) started on the same input
+    manifests = {lang: StageManifest(job_dir) for lang in ("hi", "es")}
+    barrier = threading.Barrier(len(manifests))
+    errors = []
+
+    def worker(lang):
+        try:
+            barrier.wait()
+            for i in range(20):
+                artifact = write_artifact(tmp_path / f"{lang}_{i}.txt", i + 1)
+                manifests[lang].record(f"translate_{lang}_{i}", {"lang": lang, "i": i}, {"out": artifact})
+        except Exception as e:  # surfaced on the main thread
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(lang,)) for lang in manifests]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    fresh = StageManifest(job_dir)
+    assert sorted(fresh.stages) == sorted(f"translate_{lang}_{i}" for lang in manifests for i in range(20))
+    for lang in manifests:
+        assert fresh.is_valid(f"translate_{lang}_3", {"lang": lang, "i": 3})
+    # No temp files left next to the manifest
+    assert not list((tmp_path / "job").glob("*.tmp"))
+
+
+def test_locked_reloads_and_nests(tmp_path):
+    job_dir = str(tmp_path / "job")
+    first, second = StageManifest(job_dir), StageManifest(job_dir)
+    artifact = write_artifact(tmp_path / "audio.f32", 16)
+
+    with first.locked():
+        first.record("extract_audio", {"v": 1}, {"audio": artifact})
+    assert not second.is_valid("extract_audio", {"v": 1})
+
+    # Shared lock, then a language lock; the shared lock is re-entrant
+    # for the thread holding it (record() takes the manifest lock inside)
+    with second.locked(), second.locked("hi"), second.locked():
+        assert second.is_valid("extract_audio", {"v": 1})
+        second.record("synthesize_hi", {"v": 1}, {"audio": artifact})
+
+    assert first.is_valid("extract_audio", {"v": 1})
+    first.reload()
+    assert first.artifacts("synthesize_hi") == {"audio": artifact}
+
+
+def test_record_changed_artifact_invalidates(tmp_path):
+    manifest = StageManifest(str(tmp_path / "job"))
+    artifact = write_artifact(tmp_path / "out.txt", 4)
+    manifest.record("merge", {"v": 1}, {"video": artifact})
+
+    assert manifest.is_valid("merge", {"v": 1})
+    assert not manifest.is_valid("merge", {"v": 2})
+    write_artifact(tmp_path / "out.txt", 5)
+    assert not manifest.is_valid("merge", {"v": 1})
@@ -0,0 +1,147 @@
+"""
+split_audio_into_chunks: chunk windows, overlap and trailing-chunk pruning.
+
+PCM artifact inputs are sliced in-process (no ffmpeg). Other inputs go
+through the single-pass ffmpeg decoder; those tests are skipped when
+ffmpeg is not on PATH.
+"""
+import os
+import shutil
+import subprocess
+import wave
+
+import numpy as np
+import pytest
+
+from core.chunking import split_audio_into_chunks
+from core.pcm_store import write_pcm
+
+SAMPLE_RATE = 16000
+
+needs_ffmpeg = pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not on PATH")
+
+# 10 s chunks with 2 s overlap (step 8 s)
+WINDOWS = [
+    # The last chunk ends at the input's end
+    (25.0, [(0.0, 10.0), (8.0, 10.0), (16.0, 9.0)]),
+    # A third chunk at 16 s would lie entirely inside the second one: pruned
+    (18.0, [(0.0, 10.0), (8.0, 10.0)]),
+    # Shorter than one chunk
+    (4.0, [(0.0, 4.0)]),
+]
+
+
+def ramp(seconds: float) -> np.ndarray:
+    """16-bit samples that are all distinct (mod 2**16), so any misplaced frame shows."""
+    return (np.arange(int(seconds * SAMPLE_RATE)) % 65536 - 32768).astype("<i2")
+
+
+def write_wav(path: str, samples: np.ndarray) -> str:
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(SAMPLE_RATE)
+        wf.writeframes(samples.tobytes())
+    return path
+
+
+def read_wav(path: str) -> np.ndarray:
+    with wave.open(path, "rb") as wf:
+        assert (wf.getnchannels(), wf.getsampwidth(), wf.getframerate()) == (1, 2, SAMPLE_RATE)
+        return np.frombuffer(wf.readframes(wf.getnframes()), dtype="<i2")
+
+
+def decode(path: str) -> np.ndarray:
+    """Any chunk format back to 16 kHz mono 16-bit samples."""
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", path, "-ar", str(SAMPLE_RATE), "-ac", "1", "-f", "s16le", "-"],
+        stdout=subprocess.PIPE, check=True,
+    )
+    return np.frombuffer(result.stdout, dtype="<i2")
+
+
+def check_windows(chunks, source: np.ndarray, expected, chunk_dir: str):
+    assert [(chunk["start_offset"], chunk["duration"]) for chunk in chunks] == expected
+    for chunk in chunks:
+        start = int(chunk["start_offset"] * SAMPLE_RATE)
+        frames = int(chunk["duration"] * SAMPLE_RATE)
+        np.testing.assert_array_equal(read_wav(chunk["path"]), source[start:start + frames])
+    # Consecutive chunks share exactly `overlap` seconds of audio
+    for previous, current in zip(chunks, chunks[1:]):
+        assert previous["start_offset"] + previous["duration"] - current["start_offset"] == 2.0
+        np.testing.assert_array_equal(read_wav(previous["path"])[-2 * SAMPLE_RATE:],
+                                      read_wav(current["path"])[:2 * SAMPLE_RATE])
+    # Pruned chunks leave no file behind
+    assert sorted(os.listdir(chunk_dir)) == sorted(os.path.basename(c["path"]) for c in chunks)
+
+
+@pytest.mark.parametrize("seconds, expected", WINDOWS)
+def test_split_pcm_artifact_windows(tmp_path, seconds, expected):
+    source = ramp(seconds)
+    write_pcm(str(tmp_path / "input.s16"), source, SAMPLE_RATE)
+
+    chunks = split_audio_into_chunks(str(tmp_path / "input.s16"), chunk_duration=10.0, overlap=2.0,
+                                     temp_dir=str(tmp_path / "chunks"), encoding="wav")
+
+    check_windows(chunks, source, expected, str(tmp_path / "chunks"))
+
+
+def test_split_pcm_artifact_float_input(tmp_path):
+    samples = np.linspace(-1.5, 1.5, 3 * SAMPLE_RATE, dtype=np.float32)
+    write_pcm(str(tmp_path / "input.f32"), samples, SAMPLE_RATE)
+
+    chunks = split_audio_into_chunks(str(tmp_path / "input.f32"), chunk_duration=10.0, temp_dir=str(tmp_path / "chunks"))
+
+    assert len(chunks) == 1
+    pcm = read_wav(chunks[0]["path"])
+    # Converted to 16-bit and clipped to full scale
+    assert (pcm.min(), pcm.max()) == (-32767, 32767)
+    np.testing.assert_array_equal(pcm, (np.clip(samples, -1.0, 1.0) * 32767.0).astype("<i2"))
+
+
+@pytest.mark.parametrize("overlap", [-1.0, 10.0, 12.0])
+def test_split_rejects_bad_overlap(tmp_path, overlap):
+    write_pcm(str(tmp_path / "input.s16"), ramp(1.0), SAMPLE_RATE)
+    with pytest.raises(ValueError):
+        split_audio_into_chunks(str(tmp_path / "input.s16"), chunk_duration=10.0, overlap=overlap,
+                                temp_dir=str(tmp_path / "chunks"))
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("seconds, expected", WINDOWS)
+def test_split_ffmpeg_windows(tmp_path, seconds, expected):
+    # A WAV input is not a PCM artifact: it goes through the streaming decoder,
+    # which routes each decoded block into every chunk it overlaps
+    source = ramp(seconds)
+    write_wav(str(tmp_path / "input.wav"), source)
+
+    chunks = split_audio_into_chunks(str(tmp_path / "input.wav"), chunk_duration=10.0, overlap=2.0,
+                                     temp_dir=str(tmp_path / "chunks"), encoding="wav")
+
+    check_windows(chunks, source, expected, str(tmp_path / "chunks"))
+
+
+@needs_ffmpeg
+@pytest.mark.parametrize("encoding, extension", [("flac", ".flac"), ("opus", ".opus")])
+@pytest.mark.parametrize("source_ext", [".wav", ".s16"])
+def test_split_compressed_chunks(tmp_path, encoding, extension, source_ext):
+    source = ramp(25.0)
+    path = str(tmp_path / f"input{source_ext}")
+    if source_ext == ".wav":
+        write_wav(path, source)
+    else:
+        write_pcm(path, source, SAMPLE_RATE)
+
+    chunks = split_audio_into_chunks(path, chunk_duration=10.0, overlap=2.0,
+                                     temp_dir=str(tmp_path / "chunks"), encoding=encoding)
+
+    assert [(chunk["start_offset"], chunk["duration"]) for chunk in chunks] == WINDOWS[0][1]
+    for chunk in chunks:
+        assert chunk["path"].endswith(extension)
+        decoded = decode(chunk["path"])
+        if encoding == "flac":
+            # Lossless: exactly the chunk's slice
+            start = int(chunk["start_offset"] * SAMPLE_RATE)
+            np.testing.assert_array_equal(decoded, source[start:start + int(chunk["duration"] * SAMPLE_RATE)])
+        else:
+            assert abs(len(decoded) / SAMPLE_RATE - chunk["duration"]) < 0.05
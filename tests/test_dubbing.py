@@ -0,0 +1,83 @@
+"""
+Placement of synthesized clips for coalesced segments: the pauses the
+coalescer bridged stay silent in the dub.
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("dotenv")
+
+from core.dubbing import _split_at_pauses, _spoken_spans, synthesize_segment
+
+SAMPLE_RATE = 44100
+
+
+def tone(seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE), dtype=np.float32) / SAMPLE_RATE
+    return 0.3 * np.sin(2 * np.pi * 220 * t, dtype=np.float32)
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+
+
+class StubTTS:
+    """Returns the same clip for every request (the synthesize_pcm surface only)."""
+
+    def __init__(self, samples: np.ndarray):
+        self.samples = samples
+
+    def synthesize_pcm(self, **kwargs) -> np.ndarray:
+        return self.samples
+
+
+MERGED = {
+    "start": 1.0, "end": 6.0, "speaker": 0, "transcript": "a b c d",
+    "words": [
+        {"word": "a", "start": 1.0, "end": 1.5},
+        {"word": "b", "start": 1.6, "end": 2.0},
+        {"word": "c", "start": 3.0, "end": 3.5},
+        {"word": "d", "start": 5.5, "end": 6.0},
+    ],
+}
+
+
+def test_spoken_spans_follow_bridged_pauses():
+    assert _spoken_spans(MERGED) == [(1.0, 2.0), (3.0, 3.5), (5.5, 6.0)]
+    # No words, or no pause over PAUSE_SPLIT: the whole segment
+    assert _spoken_spans({"start": 2.0, "end": 4.0}) == [(2.0, 4.0)]
+    assert _spoken_spans(dict(MERGED, words=MERGED["words"][:2])) == [(1.0, 2.0)]
+
+
+def test_split_cuts_inside_the_silences():
+    clip = np.concatenate([tone(1.0), silence(0.3), tone(0.4), silence(0.3), tone(0.6)])[:, None]
+
+    pieces = _split_at_pauses(clip, SAMPLE_RATE, [1.0, 0.5, 0.5])
+
+    assert len(pieces) == 3
+    assert sum(len(piece) for piece in pieces) == len(clip)
+    cuts = np.cumsum([len(piece) for piece in pieces])[:-1] / SAMPLE_RATE
+    assert 1.0 <= cuts[0] <= 1.3
+    assert 1.7 <= cuts[1] <= 2.0
+    assert _split_at_pauses(clip[:SAMPLE_RATE // 20], SAMPLE_RATE, [1.0, 1.0]) is None
+
+
+def test_merged_segment_is_placed_per_span():
+    clip = np.concatenate([tone(1.0), silence(0.3), tone(0.4), silence(0.3), tone(0.4)])[:, None]
+
+    clips = synthesize_segment(StubTTS(clip), MERGED, "hi")
+
+    assert [c["start"] for c in clips] == [1.0, 3.0, 5.5]
+    # Nothing is placed in the bridged pauses (2.0-3.0 s and 3.5-5.5 s) beyond the
+    # tail of silence each piece carries
+    for c, end in zip(clips, [2.0, 3.5, 6.0]):
+        assert c["start"] + len(c["samples"]) / SAMPLE_RATE <= end + 0.35
+
+
+def test_unmerged_segment_is_one_clip():
+    seg = {"start": 2.0, "end": 3.0, "speaker": 0, "transcript": "a"}
+
+    clips = synthesize_segment(StubTTS(tone(0.8)[:, None]), seg, "hi")
+
+    assert len(clips) == 1 and clips[0]["start"] == 2.0
+    assert synthesize_segment(StubTTS(tone(0.8)[:, None]), dict(seg, transcript=" "), "hi") == []
@@ -0,0 +1,58 @@
+"""
+The in-process mix timeline (no ffmpeg: the encode step is not exercised).
+"""
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from core.mixer import BACKGROUND_GAIN, DIALOGUE_GAIN, MIX_SCALE, SAMPLE_RATE, TimelineMixer
+from core.pcm_store import write_pcm
+
+
+def make_inputs(tmp_path, seconds: float = 3.0, count: int = 30):
+    rng = np.random.default_rng(0)
+    background = (rng.random((int(seconds * SAMPLE_RATE), 2)) - 0.5).astype(np.float32)
+    path = write_pcm(str(tmp_path / "background.f32"), background, SAMPLE_RATE)
+    clips = [
+        {"samples": (rng.random((SAMPLE_RATE // 2, 1)) - 0.5).astype(np.float32), "start": i * 0.1}
+        for i in range(count)
+    ]
+    return path, background, clips
+
+
+def test_mix_does_not_depend_on_add_order(tmp_path):
+    path, _, clips = make_inputs(tmp_path)
+    timelines = []
+    for seed in range(3):
+        order = list(clips)
+        random.Random(seed).shuffle(order)
+        mixer = TimelineMixer(path)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(mixer.add, order))
+        timelines.append(mixer.timeline.copy())
+
+    assert mixer.clips == len(clips)
+    for timeline in timelines[1:]:
+        np.testing.assert_array_equal(timeline, timelines[0])
+
+
+def test_mix_matches_reference_sum(tmp_path):
+    path, background, clips = make_inputs(tmp_path)
+    # A clip past the end of the background is ignored; one crossing it is cut
+    clips += [{"samples": np.ones((100, 1), np.float32), "start": 10.0},
+              {"samples": np.ones((SAMPLE_RATE, 1), np.float32), "start": 2.5}]
+    mixer = TimelineMixer(path)
+    for clip in clips:
+        mixer.add(clip)
+
+    expected = background.astype(np.float64) * BACKGROUND_GAIN
+    for clip in clips:
+        start = int(round(clip["start"] * SAMPLE_RATE))
+        end = min(start + len(clip["samples"]), len(expected))
+        if start < end:
+            expected[start:end] += clip["samples"][:end - start] * DIALOGUE_GAIN
+
+    assert mixer.clips == len(clips) - 1
+    assert mixer.timeline.shape == background.shape
+    np.testing.assert_allclose(mixer.timeline / MIX_SCALE, expected, atol=1e-6)
@@ -0,0 +1,125 @@
+"""
+ChunkStitcher: merging the words of overlapping ASR chunks into one timeline.
+"""
+import pytest
+
+from core.stitching import ChunkStitcher, words_to_segments
+
+# 10 s chunks overlapping by 2 s: [0, 10), [8, 18), [16, 26)
+CHUNKS = [
+    {"start_offset": 0.0, "duration": 10.0},
+    {"start_offset": 8.0, "duration": 10.0},
+    {"start_offset": 16.0, "duration": 10.0},
+]
+
+
+def seg(speaker, *words):
+    """A chunk segment; `words` are (word, start, end) tuples."""
+    return {"speaker": speaker, "words": [{"word": w, "start": s, "end": e} for w, s, e in words]}
+
+
+def speech(lo, hi, prefix, step=0.3):
+    """Continuous words (no pause long enough to cut in) from `lo` to `hi`."""
+    words, t, i = [], lo, 0
+    while t < hi:
+        words.append((f"{prefix}{i}", round(t, 3), round(t + step - 0.02, 3)))
+        t += step
+        i += 1
+    return words
+
+
+def merged_words(stitcher):
+    return [w["word"] for s in stitcher.segments() for w in s["words"]]
+
+
+def test_overlap_words_are_kept_once_in_order():
+    phrase = [(f"w{i}", 6.0 + i * 0.5, 6.4 + i * 0.5) for i in range(13)]  # 6.0 s - 12.4 s
+    # The earlier chunk hears the phrase cut off at its end; the later one
+    # hears it whole, with slightly different timings and its own speaker tag
+    first = [seg(1, ("a", 1.0, 1.4)), seg(1, *[(w, s, min(e, 10.0)) for w, s, e in phrase if s < 10.0])]
+    second = [seg(2, *[(w, s + 0.02, e + 0.02) for w, s, e in phrase if e > 8.0])]
+    stitcher = ChunkStitcher(CHUNKS[:2])
+
+    # Chunks may arrive in any order; nothing is final before chunk 0
+    stitcher.add(1, second)
+    assert stitcher.pop_ready() == []
+    stitcher.add(0, first)
+
+    segments = stitcher.segments()
+    assert [s["transcript"] for s in segments] == ["a", " ".join(w for w, _, _ in phrase)]
+    # The utterance cut by the chunk boundary is one segment again, under the running speaker id
+    assert [s["speaker"] for s in segments] == [1, 1]
+    assert stitcher.rejoined() == 1
+    assert 8.0 < stitcher.cuts[0] < 10.0
+
+
+@pytest.mark.parametrize("shift", [0.1, -0.1])
+def test_word_straddling_the_cut_is_kept_once(shift):
+    # No pause in the overlap, so the cut falls mid-speech and the later chunk's
+    # timings put the word at the cut on the other side of it than the earlier chunk's
+    words = speech(7.0, 11.0, "d")
+    first = [w for w in words if w[1] < 10.0]
+    second = [(w, s + shift, e + shift) for w, s, e in words if e > 8.0]
+    stitcher = ChunkStitcher(CHUNKS[:2])
+    stitcher.add(0, [seg(1, *first)])
+    stitcher.add(1, [seg(1, *second)])
+
+    assert merged_words(stitcher) == [w for w, _, _ in words]
+
+
+def test_empty_overlap_loses_and_repeats_nothing():
+    # Silence in the overlap: neither chunk has words there
+    stitcher = ChunkStitcher(CHUNKS[:2])
+    stitcher.add(0, [seg(1, ("a", 1.0, 1.4), ("b", 6.0, 6.5))])
+    stitcher.add(1, [seg(1, ("c", 12.0, 12.4))])
+    assert merged_words(stitcher) == ["a", "b", "c"]
+    assert stitcher.cuts == [8.0]
+
+    # The later chunk heard nothing at all (silence or a failed chunk): the earlier one is kept whole
+    stitcher = ChunkStitcher(CHUNKS[:2])
+    stitcher.add(0, [seg(1, ("a", 1.0, 1.4), ("b", 8.5, 9.0))])
+    stitcher.add(1, [])
+    assert merged_words(stitcher) == ["a", "b"]
+    assert stitcher.cuts == [10.0]
+
+
+def test_speaker_ids_continue_across_chunks():
+    overlap = [("b1", 8.2, 8.6), ("b2", 8.7, 9.1), ("b3", 9.2, 9.6)]
+    stitcher = ChunkStitcher(CHUNKS)
+    # Chunk 0: A (1), C (3), then B (2) speaking in the overlap
+    stitcher.add(0, [seg(1, ("a1", 1.0, 1.4)), seg(3, ("c1", 3.0, 3.4)), seg(2, *overlap)])
+    # Chunk 1 restarts its tags: B is now 1, and a voice silent in the overlap is 2
+    stitcher.add(1, [seg(1, *overlap), seg(2, ("x1", 12.0, 12.4))])
+
+    speakers = [(s["speaker"], s["transcript"]) for s in stitcher.segments()]
+    # B keeps its id by vote over the overlap; the silent voice takes the most
+    # recently heard free id instead of a new one
+    assert speakers == [(1, "a1"), (3, "c1"), (2, "b1 b2 b3"), (3, "x1")]
+    assert stitcher.speakers_remapped == 2
+
+
+def test_pop_ready_returns_each_final_segment_once():
+    stitcher = ChunkStitcher(CHUNKS)
+    stitcher.add(0, [seg(1, ("a", 1.0, 1.4)), seg(2, ("b", 5.0, 5.4))])
+    # Segments starting before chunk 1's window are final, except the last one,
+    # which chunk 1 may still continue
+    assert [s["transcript"] for s in stitcher.pop_ready()] == ["a"]
+    stitcher.add(1, [seg(2, ("c", 13.0, 13.4))])
+    stitcher.add(2, [seg(2, ("d", 20.0, 20.4))])
+    ready = stitcher.pop_ready()
+    assert [s["transcript"] for s in ready] == ["b", "c", "d"]
+    assert stitcher.pop_ready() == []
+    assert [s["transcript"] for s in stitcher.segments()] == ["a", "b", "c", "d"]
+
+
+def test_words_to_segments_splits_on_speaker_and_pause():
+    words = [
+        {"word": "a", "start": 0.0, "end": 0.4, "speaker": 1},
+        {"word": "b", "start": 0.5, "end": 0.9, "speaker": 1},
+        {"word": "c", "start": 2.0, "end": 2.4, "speaker": 1},  # pause > PAUSE_SPLIT
+        {"word": "d", "start": 2.5, "end": 2.9, "speaker": 2},  # speaker change
+    ]
+    segments = words_to_segments(words)
+    assert [(s["speaker"], s["transcript"], s["start"], s["end"]) for s in segments] == [
+        (1, "a b", 0.0, 0.9), (1, "c", 2.0, 2.4), (2, "d", 2.5, 2.9)
+    ]
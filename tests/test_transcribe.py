@@ -0,0 +1,58 @@
+"""
+Chunked ASR against the offline backends in tests/fakes.py.
+
+The input is a 16 kHz mono PCM artifact and chunks are written as WAV, so
+neither ffmpeg nor the cloud services are needed. The Google SDK must still
+be importable (core.transcribe builds real request types).
+"""
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("google.cloud.speech_v2")
+
+from core.pcm_store import write_pcm
+from core.transcribe import transcribe_audio
+from tests.fakes import FakeSpeechClient, FakeStorageClient
+
+SAMPLE_RATE = 16000
+
+
+def write_silence(path: str, seconds: float) -> str:
+    return write_pcm(path, np.zeros((int(seconds * SAMPLE_RATE), 1), dtype="<i2"), SAMPLE_RATE)
+
+
+def test_transcribe_audio_with_fakes(tmp_path):
+    # 600 s in 240 s chunks with 5 s overlap: chunks start at 0, 235 and 470
+    audio_path = write_silence(str(tmp_path / "input.s16"), 600)
+    storage = FakeStorageClient()
+    speech = FakeSpeechClient(storage, latency=0.2)
+    streamed = []
+
+    segments = transcribe_audio(
+        audio_path, client=speech, storage_client=storage, max_in_flight=2,
+        on_chunk=lambda index, ready: streamed.extend(ready), upload_format="wav", overlap=5.0,
+        project_id="test-project"
+    )
+
+    assert speech.requests == 3
+    assert segments
+    # One timeline: ordered, no word reported twice across a chunk overlap
+    starts = [seg["start"] for seg in segments]
+    assert starts == sorted(starts)
+    words = [(w["word"], w["start"]) for seg in segments for w in seg["words"]]
+    assert len(words) == len(set(words))
+    assert segments[-1]["end"] <= 600.0
+    # Streamed segments are final: each one is in the result, in the same order
+    assert streamed == segments[:len(streamed)]
+
+    # Never more BatchRecognize operations running than allowed (but more than one)
+    assert speech.max_in_flight == 2
+
+    # Every uploaded chunk is deleted from the bucket and from disk
+    assert storage.uploads == 3
+    assert storage.deletes == 3
+    assert storage.objects == {}
+    assert storage.local_paths and not any(os.path.exists(path) for path in storage.local_paths.values())